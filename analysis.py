@@ -8,6 +8,18 @@ __version__ = "1.1"
 
 import numpy as np
 from fractions import Fraction
+from collections import OrderedDict
+
+# Maximum number of elements of the temporary arrays of isResonanceBatch(). The pairs are treated by blocks to stay below this size.
+MAX_ELEMENTS = 2**24
+
+# Number of results of get_possible_resonances() kept in memory
+RESONANCES_CACHE_SIZE = 1024
+
+# For each denominator limit, the table of fractions used to find the possible resonances (see _farey_table())
+_FAREY_TABLES = {}
+# The last results of get_possible_resonances(), the most recently used at the end
+_RESONANCES_CACHE = OrderedDict()
 
 def get_x_s(mass):
   """with the mass of the planet in solar mass, 
@@ -22,11 +34,63 @@ def get_x_s(mass):
   
   return x_s
 
+def _farey_table(denominator_limit, upper):
+  """Return the table of all the irreducible fractions p/q with q <= denominator_limit and 0 <= p/q <= upper, sorted by 
+  value. The table is computed once for each denominator_limit, and extended if a greater upper value is needed.
+  
+  Return : 
+  a tuple (numerators, denominators, midpoints) of arrays, where midpoints are the values in the middle of two 
+  consecutive fractions. The closest fraction to a value x is then at the index np.searchsorted(midpoints, x)
+  """
+  
+  upper = int(np.ceil(upper))
+  
+  if ((denominator_limit in _FAREY_TABLES) and (_FAREY_TABLES[denominator_limit][0] >= upper)):
+    return _FAREY_TABLES[denominator_limit][1:]
+  
+  # We build the table for twice the value needed, to avoid building it again for a slightly bigger value
+  upper = max(2 * upper, 4)
+  (numerators, denominators) = np.meshgrid(np.arange(upper * denominator_limit + 1), np.arange(1, denominator_limit + 1))
+  keep = (np.gcd(numerators, denominators) == 1) & (numerators <= upper * denominators)
+  numerators = numerators[keep]
+  denominators = denominators[keep]
+  
+  values = numerators / denominators.astype(float)
+  order = np.argsort(values)
+  numerators = numerators[order]
+  denominators = denominators[order]
+  values = values[order]
+  midpoints = (values[1:] + values[:-1]) / 2.
+  
+  _FAREY_TABLES[denominator_limit] = (upper, numerators, denominators, midpoints)
+  
+  return (numerators, denominators, midpoints)
+
+def _sample_periods(periodRatios, uncertainty, sampling):
+  """Return the period ratios to be tested around each given period ratio (see get_possible_resonances()), as an array 
+  of shape (nb_ratios, sampling)"""
+  
+  periodRatios = np.asarray(periodRatios, dtype=float)
+  
+  periodMin = periodRatios * (1 - uncertainty)
+  periodMax = periodRatios * (1 + uncertainty)
+  
+  # We do not want period ratios less than 1 (this only happens for coorbitals I think)
+  periodMin = np.where(periodMin < 1., 1., periodMin)
+  
+  deltaPeriod = (periodMax - periodMin) / sampling
+  
+  return periodMin[..., np.newaxis] + deltaPeriod[..., np.newaxis] * np.arange(sampling)
+
 def get_possible_resonances(periodRatio, uncertainty=0.05, denominator_limit=12, numerator_limit=20, sampling=10):
   """Give a list of 'Fraction' objects that correspond to possible Mean Motion Resonances for a given period ratio. 
   Optional argument are the uncertainty that will determine the range of perio ratios to test around the given value. 
   The denominator and numerator limit above which all the resonances will be skipped
   
+  The closest fraction of each sampled period ratio is found in a precomputed table (see _farey_table()), and the 
+  result is kept in a cache (the last RESONANCES_CACHE_SIZE sets of fractions), since close period ratios usually 
+  give the same fractions. To get the resonances of a whole array of period ratios, see get_resonance_candidates()
+  
   Parameter :
   periodRatio : [float] the periodRatio between the two considered parameters
   
@@ -41,39 +105,68 @@ def get_possible_resonances(periodRatio, uncertainty=0.05, denominator_limit=12,
   list of 'Fraction' objects, each one representing a Mean Motion Resonance to be tested  
   """
   
-  periodMin = periodRatio * (1 - uncertainty)
-  periodMax = periodRatio * (1 + uncertainty)
+  periods = _sample_periods(periodRatio, uncertainty, sampling)
+  (numerators, denominators, midpoints) = _farey_table(denominator_limit, periods.max())
   
-  # We do not want period ratios less than 1 (this only happens for coorbitals I think)
-  if (periodMin < 1.):
-    periodMin = 1.
+  # The result only depends on the set of the closest fractions
+  indexes = tuple(np.unique(np.searchsorted(midpoints, periods)))
+  key = (denominator_limit, numerator_limit, indexes)
   
-  periodWidth = periodMax - periodMin
-  deltaPeriod = periodWidth/sampling
+  if (key in _RESONANCES_CACHE):
+    resonances = _RESONANCES_CACHE.pop(key)
+  else:
+    # We sort the resonances to get the more interesting first (3:2 before 32:27 for instance)
+    tmp = [(numerators[i], Fraction(int(numerators[i]), int(denominators[i]))) for i in indexes]
+    tmp.sort()
+    resonances = [element[1] for element in tmp if element[0] < numerator_limit]
+    
+    if (len(_RESONANCES_CACHE) >= RESONANCES_CACHE_SIZE):
+      _RESONANCES_CACHE.popitem(last=False)
   
+  # The last used item is put at the end of the cache, so that the oldest one is removed first
+  _RESONANCES_CACHE[key] = resonances
   
-  periods = [periodMin + deltaPeriod * i for i in range(sampling)]
-
-  resonances = []
-  for period_i in periods:
-    fraction = Fraction(period_i).limit_denominator(denominator_limit)
-    resonances.append(fraction)
+  return list(resonances)
 
-  # We exclude all values that appears several time to only keep one occurence of each value
-  resonances = list(set(resonances))
-
-  # We sort the resonances to get the more interesting first (3:2 before 32:27 for instance)
-  tmp = [(res.numerator, res) for res in resonances]
-  tmp.sort()
-  resonances = [element[1] for element in tmp if element[1].numerator < numerator_limit]
+def get_resonance_candidates(periodRatios, uncertainty=0.05, denominator_limit=12, numerator_limit=20, sampling=10):
+  """Give the possible Mean Motion Resonances for a whole array of period ratios at once (see get_possible_resonances() 
+  for the meaning of the parameters).
+  
+  Parameter :
+  periodRatios : an array of period ratios (for instance for each output of the simulation)
+  
+  Return :
+  a tuple (resonances, candidates) where resonances is the list of 'Fraction' objects that are possible for at least 
+  one period ratio (sorted as in get_possible_resonances()), and candidates is a boolean array of shape 
+  periodRatios.shape + (len(resonances),) : candidates[k, j] is True if resonances[j] is a possible resonance for periodRatios[k]
+  
+  Example :
+  (resonances, candidates) = get_resonance_candidates(period_outer / period_inner)
+  (pairs, is_resonance, std) = isResonanceBatch(resonances, g, n, M)
+  """
+  
+  periods = _sample_periods(periodRatios, uncertainty, sampling)
+  (numerators, denominators, midpoints) = _farey_table(denominator_limit, periods.max())
   
-  #~ print(uncertainty)
-  #~ print(periodMin)
-  #~ print(periodMax)
-  #~ print(resonances)
-  #~ exit()
+  indexes = np.searchsorted(midpoints, periods)
   
-  return resonances
+  # The fractions possible for at least one ratio, sorted by numerator then value (the table is sorted by value)
+  columns = np.unique(indexes)
+  columns = columns[numerators[columns] < numerator_limit]
+  columns = columns[np.argsort(numerators[columns], kind='mergesort')]
+  
+  # For each fraction of the table, its column in 'candidates' (-1 if it is not a possible resonance)
+  position = np.full(len(numerators), -1, dtype=int)
+  position[columns] = np.arange(len(columns))
+  
+  indexes = indexes.reshape(-1, sampling)
+  (rows, samples) = np.nonzero(position[indexes] >= 0)
+  candidates = np.zeros((len(indexes), len(columns)), dtype=bool)
+  candidates[rows, position[indexes[rows, samples]]] = True
+  candidates = candidates.reshape(periods.shape[:-1] + (len(columns),))
+  resonances = [Fraction(int(numerators[i]), int(denominators[i])) for i in columns]
+  
+  return (resonances, candidates)
 
 def isResonance(res, g_inner, n_inner, M_inner, g_outer, n_outer, M_outer, nb_points=50, angle_center_value=0, std_threshold=20.):
   """Given a resonance as a Fraction object, and g, n M for inner and
@@ -141,3 +234,360 @@ def isResonance(res, g_inner, n_inner, M_inner, g_outer, n_outer, M_outer, nb_po
     return True
   else:
     return False
+
+def _wrap_angles(phi, angle_center_value=0.):
+  """Return the angles (in degrees) congruent to 'phi' that are between angle_center_value-180 and angle_center_value+180, 
+  the same way as isResonance() does"""
+  
+  angle_min = angle_center_value - 180.
+  angle_max = angle_center_value + 180.
+  
+  phi = phi % 360.
+  phi[phi < angle_min] += 360.
+  phi[phi > angle_max] -= 360.
+  
+  return phi
+
+def get_pairs(nb_bodies, pairs="adjacent"):
+  """Return the indexes of the pairs of bodies we want to test, as an array of shape (nb_pairs, 2) with the index of the 
+  inner body then the index of the outer body. The bodies must be sorted from the inner one to the outer one.
+  
+  Parameters :
+  nb_bodies : the number of bodies
+  pairs="adjacent" : "adjacent" for the pairs of neighbours (0, 1), (1, 2)... or "all" for all the pairs (i, j) with i < j
+  """
+  
+  if (pairs == "adjacent"):
+    inner = np.arange(nb_bodies - 1)
+    outer = inner + 1
+  elif (pairs == "all"):
+    (inner, outer) = np.triu_indices(nb_bodies, 1)
+  else:
+    raise ValueError("pairs must be 'adjacent' or 'all' (and not '%s')" % pairs)
+  
+  return np.column_stack((inner, outer))
+
+def isResonanceBatch(resonances, g, n, M, pairs="adjacent", nb_points=None, angle_center_value=0, std_threshold=20.):
+  """Test several resonances for several pairs of planets and several time windows at once. This is the same test as 
+  isResonance() : for each resonance (p+q):p, the q+1 resonant angles are computed, and there is a resonance if the 
+  standard deviation of one of them is below the threshold.
+  
+  Parameters : 
+  resonances : a list of Fraction objects (for instance [Fraction(3,2), Fraction(5,3)]), see get_possible_resonances()
+  g, n, M : 2D arrays of shape (nb_times, nb_bodies) of g, n, M (in degrees). The bodies must be sorted from the inner one to the outer one.
+  
+  Optional parameters :
+  pairs : ["adjacent"] the pairs of bodies to test. "adjacent", "all" (see get_pairs()) or an array of shape (nb_pairs, 2) 
+          with the indexes of the inner and outer bodies of each pair
+  nb_points : [None] the number of points of each time window. The windows do not overlap, and are aligned on the end 
+              of the arrays (the first points are not used if nb_times is not a multiple of nb_points). By default, only one 
+              window with all the points.
+  angle_center_value : [0.] (in degrees) see isResonance()
+  std_threshold : [20.] in degrees, see isResonance()
+  
+  Return : 
+  a tuple (pairs, is_resonance, standard_deviation) where pairs is the array (nb_pairs, 2) of the indexes of the bodies 
+  of each pair, and is_resonance and standard_deviation are arrays of shape (nb_windows, nb_pairs, nb_resonances), with 
+  the minimum standard deviation of the resonant angles of each resonance (in degrees).
+  
+  Example :
+  (pairs, is_resonance, std) = isResonanceBatch([Fraction(3,2)], g, n, M, nb_points=50)
+  # is_resonance[w, k, 0] is True if the pair 'pairs[k]' is in 3:2 resonance during the window 'w'
+  """
+  
+  g = np.asarray(g, dtype=float)
+  n = np.asarray(n, dtype=float)
+  M = np.asarray(M, dtype=float)
+  
+  (nb_times, nb_bodies) = g.shape
+  
+  if isinstance(pairs, str):
+    pairs = get_pairs(nb_bodies, pairs)
+  else:
+    pairs = np.asarray(pairs, dtype=int).reshape(-1, 2)
+  
+  if (nb_points == None):
+    nb_points = nb_times
+  nb_windows = nb_times // nb_points
+  start = nb_times - nb_windows * nb_points
+  
+  # Longitudes of pericenter and mean longitudes, of shape (nb_windows, nb_bodies, nb_points)
+  long_of_peri = (g + n)[start:]
+  mean_longitude = M[start:] + long_of_peri
+  long_of_peri = long_of_peri.reshape(nb_windows, nb_points, nb_bodies).transpose(0, 2, 1)
+  mean_longitude = mean_longitude.reshape(nb_windows, nb_points, nb_bodies).transpose(0, 2, 1)
+  
+  # For each resonance (p+q):p, the coefficients of the resonant angles. The resonances don't have the same number of 
+  # angles (q+1), so the angles that do not exist are masked.
+  inner_period_nb = np.array([res.numerator for res in resonances], dtype=float)
+  outer_period_nb = np.array([res.denominator for res in resonances], dtype=float)
+  order = inner_period_nb - outer_period_nb
+  index = np.arange(int(order.max()) + 1, dtype=float)
+  exists = index[np.newaxis, :] <= order[:, np.newaxis]
+  
+  # Shapes (nb_resonances, nb_angles, 1) that broadcast with (nb_windows, nb_pairs, 1, 1, nb_points)
+  coeff_outer = inner_period_nb[:, np.newaxis, np.newaxis]
+  coeff_inner = outer_period_nb[:, np.newaxis, np.newaxis]
+  coeff_peri_inner = index[np.newaxis, :, np.newaxis]
+  coeff_peri_outer = (order[:, np.newaxis] - index[np.newaxis, :])[:, :, np.newaxis]
+  
+  standard_deviation = np.empty((nb_windows, len(pairs), len(resonances)))
+  
+  # We treat the pairs by blocks, to limit the size of the temporary arrays
+  block_size = max(1, MAX_ELEMENTS // max(1, nb_windows * len(resonances) * len(index) * nb_points))
+  for first in range(0, len(pairs), block_size):
+    (inner, outer) = pairs[first:first+block_size].T
+    
+    lambda_inner = mean_longitude[:, inner, np.newaxis, np.newaxis, :]
+    lambda_outer = mean_longitude[:, outer, np.newaxis, np.newaxis, :]
+    peri_inner = long_of_peri[:, inner, np.newaxis, np.newaxis, :]
+    peri_outer = long_of_peri[:, outer, np.newaxis, np.newaxis, :]
+    
+    phi = coeff_outer * lambda_outer - coeff_inner * lambda_inner - coeff_peri_inner * peri_inner - coeff_peri_outer * peri_outer
+    phi = _wrap_angles(phi, angle_center_value)
+    
+    std = phi.std(-1)
+    std[..., ~exists] = np.inf
+    standard_deviation[:, first:first+block_size] = std.min(-1)
+  
+  is_resonance = standard_deviation < std_threshold
+  
+  return (pairs, is_resonance, standard_deviation)
+
+def get_resonant_angles(res, g_inner, n_inner, M_inner, g_outer, n_outer, M_outer):
+  """Return the q+1 resonant angles of a resonance (p+q):p, as in isResonance(), but without congruence
+  
+  Parameters : 
+  res : a Fraction object (for instance Fraction(3,2))
+  g_inner, n_inner, M_inner : arrays of g, n, M for the inner planet (in degrees)
+  g_outer, n_outer, M_outer : arrays of g, n, M for the outer planet (in degrees)
+  
+  Return : 
+  an array of shape (nb_points, q+1) with the resonant angles (in degrees)
+  """
+  
+  q = res.numerator - res.denominator
+  
+  long_of_peri_inner = np.asarray(g_inner) + np.asarray(n_inner)
+  mean_longitude_inner = np.asarray(M_inner) + long_of_peri_inner
+  
+  long_of_peri_outer = np.asarray(g_outer) + np.asarray(n_outer)
+  mean_longitude_outer = np.asarray(M_outer) + long_of_peri_outer
+  
+  temp_value = res.numerator * mean_longitude_outer - res.denominator * mean_longitude_inner
+  i = np.arange(q+1)
+  
+  return temp_value[..., np.newaxis] - i * long_of_peri_inner[..., np.newaxis] - (q - i) * long_of_peri_outer[..., np.newaxis]
+
+class LibrationAnalyzer(object):
+  """class that follow resonant angles with a sliding window, to find when they librate. The data are given by blocks 
+  (see update()), so that the whole history never has to be in memory.
+  
+  For each window, we compute the circular mean and the circular standard deviation sqrt(-2 ln(R)) of the angles, 
+  R being the length of their mean unit vector. Contrary to the standard deviation used by isResonance(), it does not 
+  depend on the value around which the angles are centered. The sums of the unit vectors of the window are running 
+  sums : each new point is added and the point that leaves the window (kept in a ring buffer of 'window' points) is 
+  subtracted, so that each new point costs O(1), whatever the size of the window and of the blocks.
+  
+  The angles are given by series (a pair of planets for instance), each series having one or several angles (the q+1 
+  resonant angles of a resonance). A series librates if at least one of its angles has a standard deviation below the threshold.
+  
+  Parameters : 
+  window=50 : the number of points of the sliding window
+  std_threshold=20. : in degrees, the value of the circular standard deviation below which an angle librates
+  
+  Attributes : 
+  self.mean, self.std : the circular mean and standard deviation (in degrees) of the last window, of shape (nb_series, nb_angles)
+  self.isLibrating : boolean array (nb_series) with the state of each series in the last window
+  self.events : the list of all the events (series, "entry" or "exit", time) in the order of the time
+  
+  Example : 
+  analyzer = LibrationAnalyzer(window=50)
+  for (inner, outer) in zip(iter_aei("PLANET1.aei"), iter_aei("PLANET2.aei")):
+    angles = get_resonant_angles(Fraction(3,2), inner['g'], inner['n'], inner['l'], outer['g'], outer['n'], outer['l'])
+    analyzer.update(inner['time'], angles[:, np.newaxis, :])
+  print(analyzer.intervals(0))
+  """
+  
+  def __init__(self, window=50, std_threshold=20.):
+    """Initialisation of the object"""
+    
+    self.window = window
+    self.std_threshold = std_threshold
+    
+    self.mean = None
+    self.std = None
+    self.isLibrating = None
+    self.events = []
+    
+    # The number of points given so far, and the unit vectors of the last 'window' points, the point number 'i' being 
+    # in the row i % window
+    self.__nb_points = 0
+    self.__ring_cos = None
+    self.__ring_sin = None
+    # The sums of the unit vectors of the last 'window' points
+    self.__sum_cos = None
+    self.__sum_sin = None
+    # For each series, the time it started to librate (NaN if it does not librate)
+    self.__entry = None
+    # The closed intervals of libration of each series
+    self.__intervals = {}
+  
+  def update(self, times, angles):
+    """Add new points and return the events they caused
+    
+    Parameters : 
+    times : array of the times of the new points
+    angles : array of shape (nb_points, nb_series, nb_angles) of the angles (in degrees) of each series at each time
+    
+    Return : 
+    the list of the new events (series, "entry" or "exit", time), the time being the one of the last point of the 
+    first window where the series librates (entry) or does not librate anymore (exit)
+    """
+    
+    times = np.asarray(times, dtype=float)
+    angles = np.radians(np.asarray(angles, dtype=float))
+    cos_angles = np.cos(angles)
+    sin_angles = np.sin(angles)
+    
+    if (self.__ring_cos is None):
+      self.isLibrating = np.zeros(angles.shape[1], dtype=bool)
+      self.__entry = np.full(angles.shape[1], np.nan)
+      self.__ring_cos = np.zeros((self.window,) + angles.shape[1:])
+      self.__ring_sin = np.zeros((self.window,) + angles.shape[1:])
+      self.__sum_cos = np.zeros(angles.shape[1:])
+      self.__sum_sin = np.zeros(angles.shape[1:])
+    
+    nb_new = len(times)
+    if (nb_new == 0):
+      return []
+    
+    # The points that leave the window when each new point is added : the first ones are in the ring buffer (none 
+    # before the first window is full), the next ones are new points
+    nb_from_ring = min(nb_new, self.window)
+    leaving = np.arange(self.__nb_points - self.window, self.__nb_points - self.window + nb_from_ring)
+    rows = leaving[leaving >= 0] % self.window
+    leaving_cos = np.zeros(cos_angles.shape)
+    leaving_sin = np.zeros(sin_angles.shape)
+    leaving_cos[nb_from_ring-len(rows):nb_from_ring] = self.__ring_cos[rows]
+    leaving_sin[nb_from_ring-len(rows):nb_from_ring] = self.__ring_sin[rows]
+    if (nb_new > self.window):
+      leaving_cos[self.window:] = cos_angles[:nb_new-self.window]
+      leaving_sin[self.window:] = sin_angles[:nb_new-self.window]
+    
+    # The sum of the unit vectors of the window that ends at each new point
+    sum_cos = self.__sum_cos + np.cumsum(cos_angles - leaving_cos, axis=0)
+    sum_sin = self.__sum_sin + np.cumsum(sin_angles - leaving_sin, axis=0)
+    self.__sum_cos = sum_cos[-1]
+    self.__sum_sin = sum_sin[-1]
+    
+    # The last new points replace the oldest ones in the ring buffer
+    rows = np.arange(self.__nb_points + nb_new - nb_from_ring, self.__nb_points + nb_new) % self.window
+    self.__ring_cos[rows] = cos_angles[nb_new-nb_from_ring:]
+    self.__ring_sin[rows] = sin_angles[nb_new-nb_from_ring:]
+    
+    # Only the windows that are full are used
+    first = max(0, self.window - 1 - self.__nb_points)
+    self.__nb_points += nb_new
+    if (first >= nb_new):
+      return []
+    sum_cos = sum_cos[first:]
+    sum_sin = sum_sin[first:]
+    
+    length = np.sqrt(sum_cos**2 + sum_sin**2) / self.window
+    std = np.degrees(np.sqrt(-2. * np.log(np.clip(length, 1e-300, 1.))))
+    
+    self.mean = np.degrees(np.arctan2(sum_sin[-1], sum_cos[-1]))
+    self.std = std[-1]
+    
+    librating = (std < self.std_threshold).any(-1)
+    window_times = times[first:]
+    
+    # We search the changes of state, starting from the state of the last window
+    states = np.concatenate((self.isLibrating[np.newaxis, :], librating))
+    (rows, series) = np.nonzero(states[1:] != states[:-1])
+    
+    new_events = []
+    for index in np.lexsort((series, rows)):
+      (row, serie) = (rows[index], series[index])
+      time = window_times[row]
+      if librating[row, serie]:
+        self.__entry[serie] = time
+        new_events.append((serie, "entry", time))
+      else:
+        self.__intervals.setdefault(serie, []).append((self.__entry[serie], time))
+        self.__entry[serie] = np.nan
+        new_events.append((serie, "exit", time))
+    
+    self.isLibrating = librating[-1]
+    self.events.extend(new_events)
+    
+    return new_events
+  
+  def intervals(self, serie):
+    """Return the list of the intervals (entry, exit) of time where the series librates. If it still librates, the exit is None
+    
+    Parameters : 
+    serie : the index of the series
+    """
+    
+    intervals = list(self.__intervals.get(serie, []))
+    if ((self.__entry is not None) and not(np.isnan(self.__entry[serie]))):
+      intervals.append((self.__entry[serie], None))
+    
+    return intervals
+
+def find_librations(res, inner_file, outer_file, window=50, std_threshold=20., chunk_size=65536, format_sortie=None):
+  """Find the intervals of time where two planets are in a given resonance, reading their .aei files by blocks 
+  (see LibrationAnalyzer). 
+  
+  Parameters : 
+  res : a Fraction object (for instance Fraction(3,2))
+  inner_file, outer_file : the .aei files of the inner and outer planets. The field 'l' must be the mean anomaly.
+  window=50 : the number of points of the sliding window
+  std_threshold=20. : in degrees, see LibrationAnalyzer
+  chunk_size=65536 : the number of lines read at once in each file
+  format_sortie=None : the output format of element.in (see mercury_utilities.read_aei())
+  
+  Return : 
+  the list of the intervals (entry, exit) of time where the planets are in resonance. If they are still in resonance 
+  at the end, the exit is None
+  """
+  
+  # mercury_utilities is only needed here, we do not want to import it (and all the modules it needs) with analysis
+  from mercury_utilities import iter_aei
+  
+  analyzer = LibrationAnalyzer(window=window, std_threshold=std_threshold)
+  
+  # If one of the planets disappear, its file is shorter and we stop at the end of this file
+  for (inner, outer) in zip(iter_aei(inner_file, chunk_size, format_sortie=format_sortie), 
+                            iter_aei(outer_file, chunk_size, format_sortie=format_sortie)):
+    nb_points = min(len(inner), len(outer))
+    (inner, outer) = (inner[:nb_points], outer[:nb_points])
+    angles = get_resonant_angles(res, inner['g'], inner['n'], inner['l'], outer['g'], outer['n'], outer['l'])
+    analyzer.update(inner['time'], angles[:, np.newaxis, :])
+  
+  return analyzer.intervals(0)
+
+if __name__ == '__main__':
+  # We check that LibrationAnalyzer gives the same events when the points are given in one block or in small blocks 
+  # (down to one point, shorter than a window), for a resonant angle that librates around 180 degrees between two circulating phases
+  random = np.random.RandomState(0)
+  times = np.arange(3000.)
+  angles = random.uniform(-180., 180., (len(times), 2, 1))
+  angles[1000:2000, 0, 0] = 170. + random.normal(0., 5., 1000)
+  angles[2500:, 1, 0] = random.normal(0., 5., 500)
+  
+  for (window, block) in ((20, 1), (20, 7), (50, 37), (50, 100)):
+    whole = LibrationAnalyzer(window=window)
+    whole.update(times, angles)
+    
+    chunked = LibrationAnalyzer(window=window)
+    for start in range(0, len(times), block):
+      chunked.update(times[start:start+block], angles[start:start+block])
+    
+    isSame = ((chunked.events == whole.events) and np.allclose(chunked.std, whole.std) and 
+              np.allclose(chunked.mean, whole.mean))
+    print("window=%d, blocks of %d points : %d events, same as in one block : %s" % (window, block, len(whole.events), isSame))
+    if not(isSame):
+      raise AssertionError("The events depend on the size of the blocks")
@@ -17,6 +17,7 @@ import time
 import commands
 import subprocess
 import math
+import random
 import pdb
 
 
@@ -572,81 +573,172 @@ def significativeRound(real,roundNumber):
   else:
     return -truncatedNumber
 
-def colorList(nb_colors, exclude=['ffffff']):
+# Parameters of the colors of colorList(), in the HCL space (CIE L*C*h) : the angle (degrees) between the hues of two 
+# consecutive colors (the golden angle, so that the hues never repeat and stay well spread for any number of colors), 
+# the chromas and the groups of lightnesses. The lightness alternate between the values of a group. When a full cycle 
+# of hues (COLOR_CYCLE consecutive hues) gives no new color, the next group is added, all the lightnesses being used 
+# with the first chroma before the second chroma is used, and so on.
+GOLDEN_ANGLE = 360. * (1. - 1. / ((1. + math.sqrt(5.)) / 2.))
+COLOR_CHROMA = (45., 30., 15.)
+COLOR_LIGHTNESS = ((70., 55., 85.), (62.5, 47.5, 77.5), (40., 90., 32.5))
+COLOR_CYCLE = 360
+
+# Number of bisections done to find the largest chroma of a color that is in the sRGB gamut (see gamutColor())
+GAMUT_STEPS = 10
+
+# Step between two colors of the sRGB cube (as 24 bits integers), used when all the groups of colorList() are 
+# exhausted. It is odd, so that every color of the cube is reached once.
+CUBE_STEP = 0x9e3779
+
+# The lists of colors already generated by colorList(), for each set of parameters
+_COLORS_CACHE = {}
+
+def colorList(nb_colors, exclude=['ffffff'], seed=0):
   """Function that return a list of colors given the number of different colors we want. 
-  It is still a simple version of the function that may contain bugs, especially for large values of colors. 
-  The color 'white' is prohibited here, but not 'black'
+  The hues are taken with a constant step (the golden angle) in a perceptual color space (HCL), so that each new color 
+  is as far as possible from the previous ones, and the lightness alternate between several values. When more colors 
+  are needed, other lightnesses then lower chromas are used (see COLOR_LIGHTNESS and COLOR_CHROMA), and at last 
+  the remaining colors of the sRGB cube. The result is always the same for the same parameters (the lists are kept in 
+  memory).
   
   Parameter
   nb_colors : The number of different colors we want.
   exclude=['ffffff'] : The colors we do not want in our list
+  seed=0 : An integer that choose the hue of the first color. Two different seeds give two different lists.
   
   Return 
   A list of colors, with the desired number of elements
   """
-  from math import ceil
-  from random import shuffle
   
-  excludeColors = list(exclude)
+  excludeColors = frozenset([color.lower() for color in exclude])
+  
+  key = (nb_colors, excludeColors, seed)
+  if (key in _COLORS_CACHE):
+    return list(_COLORS_CACHE[key])
   
-  # We add the length of the excludedColors array. Maybe some of them will not be generated in our case with the individual 
-  # colors taken into account, but we want, at least, to generate enough colors. 
-  individual_colors = int(ceil((nb_colors + len(exclude))**0.33)) 
+  # The generator is only used to choose the first hue, so that the list depends on the seed only
+  hue = random.Random(seed).uniform(0., 360.)
   
-  colors = [0, 255, 127]
-  iteration = 0
-  # We search for all individual values (for R, G, B) that we need to define at least the number of colors we want.
-  while (len(colors) < individual_colors):
-    step = 255 / (2**(iteration + 1))
+  # The (lightness, chroma) of each group, in the order they are used
+  groups = [[(lightness, chroma) for lightness in lightnesses] 
+            for chroma in COLOR_CHROMA for lightnesses in COLOR_LIGHTNESS]
+  
+  HEXcolors = []
+  generated = set(excludeColors)
+  rings = groups.pop(0)
+  index = 0
+  misses = 0
+  while ((len(HEXcolors) < nb_colors) and (misses < COLOR_CYCLE or groups)):
+    if (misses >= COLOR_CYCLE):
+      rings = rings + groups.pop(0)
+      misses = 0
     
-    iteration += 1
+    (lightness, chroma) = rings[index % len(rings)]
+    colorTemp = gamutColor(hue, chroma, lightness)
+    
+    # Different hues can give the same color once rounded, we skip them
+    if (colorTemp not in generated):
+      HEXcolors.append(colorTemp)
+      generated.add(colorTemp)
+      misses = 0
+    else:
+      misses += 1
+    
+    hue = (hue + GOLDEN_ANGLE) % 360.
+    index += 1
+  
+  # All the groups are exhausted, the other colors of the sRGB cube are taken
+  if (len(HEXcolors) < nb_colors):
+    value = 0
+    nb_visited = 0
+    while ((len(HEXcolors) < nb_colors) and (nb_visited < 2**24)):
+      colorTemp = "%06x" % value
+      if (colorTemp not in generated):
+        HEXcolors.append(colorTemp)
+        generated.add(colorTemp)
+      value = (value + CUBE_STEP) % 2**24
+      nb_visited += 1
+    
+    if (len(HEXcolors) < nb_colors):
+      raise ValueError("There are only %d different colors" % len(HEXcolors))
+  
+  _COLORS_CACHE[key] = tuple(HEXcolors)
+  
+  return HEXcolors
 
-    #For the current iteration, the number of subdivision will be a power of 2
-    nb_el = 2**iteration
+def _hclToRGB(hue, chroma, lightness):
+  """given a color in the HCL space (see hclColor()), return its sRGB components. They are between 0 and 1 if the 
+  color is in the sRGB gamut."""
+  
+  # HCL -> L*a*b*
+  a = chroma * math.cos(math.radians(hue))
+  b = chroma * math.sin(math.radians(hue))
+  
+  # L*a*b* -> XYZ
+  def inverse(t):
+    if (t > 6. / 29.):
+      return t**3
+    return 3. * (6. / 29.)**2 * (t - 4. / 29.)
+  
+  fy = (lightness + 16.) / 116.
+  X = 0.95047 * inverse(fy + a / 500.)
+  Y = 1.00000 * inverse(fy)
+  Z = 1.08883 * inverse(fy - b / 200.)
+  
+  # XYZ -> sRGB
+  linear = (3.2406 * X - 1.5372 * Y - 0.4986 * Z, 
+            -0.9689 * X + 1.8758 * Y + 0.0415 * Z, 
+            0.0557 * X - 0.2040 * Y + 1.0570 * Z)
+  
+  components = []
+  for value in linear:
+    if (value <= 0.0031308):
+      components.append(12.92 * value)
+    else:
+      components.append(1.055 * value**(1. / 2.4) - 0.055)
+  
+  return components
 
-    # We start at half the step
-    temp = step/2
-    for i in range(nb_el):
-      colors.append(temp)
-      temp += step
+def hclColor(hue, chroma, lightness):
+  """given a color in the HCL space (CIE L*C*h, with the D65 white), return the nearest sRGB color as a string of 
+  6 numbers in hexadecimal. The components of a color outside of the sRGB gamut are clipped (see gamutColor()).
   
-  # If the total number of colors is low, no need to have 127 that is in fact only needed for the algorithm.
-  if (nb_colors <=6):
-    colors.remove(127)
+  Parameter
+  hue : the hue, in degrees
+  chroma : the chroma (0 for a grey, around 100 for the most saturated colors)
+  lightness : the lightness, between 0 (black) and 100 (white)
+  """
   
+  color = ""
+  for value in _hclToRGB(hue, chroma, lightness):
+    color += hexColor(int(round(min(max(value, 0.), 1.) * 255)))
   
+  return color
+
+def gamutColor(hue, chroma, lightness):
+  """same as hclColor(), but if the color is outside of the sRGB gamut, its chroma is reduced until it is inside. 
+  The hue and the lightness are kept, whereas clipping the components can give the same color for different hues.
   
-  HEXcolors = []
-  nb = 0
+  Parameter
+  hue : the hue, in degrees
+  chroma : the maximum chroma
+  lightness : the lightness, between 0 (black) and 100 (white)
+  """
   
-  if (nb_colors == 3):
-    for colorTemp in ['ff0000', '00ff00', '0000ff']:
-      if (colorTemp not in excludeColors):
-        HEXcolors.append(colorTemp)
-        nb += 1
-    if (nb == 3):
-      return HEXcolors
+  def isInGamut(chroma):
+    return all([(-1e-9 <= value <= 1. + 1e-9) for value in _hclToRGB(hue, chroma, lightness)])
   
+  if not(isInGamut(chroma)):
+    (low, high) = (0., chroma)
+    for step in range(GAMUT_STEPS):
+      middle = (low + high) / 2.
+      if isInGamut(middle):
+        low = middle
+      else:
+        high = middle
+    chroma = low
   
-  HEXcolors = []
-  nb = 0
-  
-  for i in range(len(colors)):
-    subcolors = colors[0:i+1]
-    for R in subcolors:
-      for G in subcolors:
-        for B in subcolors:
-          colorTemp = hexColor(R)+hexColor(G)+hexColor(B)
-          if (colorTemp not in excludeColors):
-            HEXcolors.append(colorTemp)
-            excludeColors.append(colorTemp)
-            
-            nb += 1
-          
-          if (nb == nb_colors):
-            return HEXcolors
-  
-  pdb.set_trace()
+  return hclColor(hue, chroma, lightness)
 
 def hexColor(integer):
   """given a number between 0 and 255, return the hexadecimal value as a two character string
@@ -727,6 +819,13 @@ if __name__=='__main__':
   affiche_cadre_texte(text+'rab')
   affiche_cadre_texte("Partie Principale")
 
+  # Test de colorList, for a number of colors larger than what the first lightnesses can give
+  nb_colors = 5000
+  colors = colorList(nb_colors)
+  print("colorList(%d) gives %d different colors" % (nb_colors, len(set(colors))))
+  if ((len(colors) != nb_colors) or (len(set(colors)) != nb_colors) or ('ffffff' in colors)):
+    raise AssertionError("colorList do not give %d different colors" % nb_colors)
+  
   # Test de significativeRound
   liste = [1.23875486757865, 1.2487598986e18, 1.8975896457e-30, -1.76458764, 0.00003487586, 0.983297103893]
   rounding=4
@@ -11,12 +11,40 @@ __credits__ = """Based on the work of Pierre gay, in particuliar his get_module
 All you have to do is to define wich sourcefile is the main sourcefile. The module will get binaries only for theses sources (there can be severals)
 """
 import os
+import re
 import string
 import subprocess # To launch various process, get outputs et errors, returnCode and so on.
+import hashlib # To identify the content of the source files in the cache
+import json # To store the procedures found in a source file
+from collections import deque
 import pdb # To debug
 from svg import *
 import autiwa
 
+# Folder, in the working directory, where the procedures and calls found in each source file are stored (see readUnits())
+CACHE_FOLDER = ".fortran_cache"
+
+# Version of the results stored in the cache. It must be changed each time scanSource() changes, to invalidate the cache
+CACHE_VERSION = 1
+
+# Regular expressions applied to each line (in lower case, without comment, continuation lines merged) by scanSource() :
+# the beginning of a program, subroutine or function (with its prefixes and type), its end, the 'external' statements, 
+# the interface blocks (whose procedures are only declared) and the calls.
+UNIT_REGEXP = re.compile(r"""^(?:(?:recursive|pure|elemental|impure)\s+)*
+  (?:(?:integer|real|logical|complex|character|double\s*precision|type\s*\(\s*\w+\s*\))(?:\s*\([^)]*\)|\s*\*\s*\d+)?\s+)?
+  (?:(?:recursive|pure|elemental|impure)\s+)*
+  (?P<kind>program|subroutine|function)\s+(?P<name>\w+)\s*(?:\((?P<arguments>[^)]*)\))?""", re.VERBOSE)
+END_REGEXP = re.compile(r"^end\s*(?:(?P<kind>program|subroutine|function|module)(?:\s+\w+)?)?\s*$")
+EXTERNAL_REGEXP = re.compile(r"^external\s*(?:::)?\s*(?P<names>[\w\s,]+)$")
+INTERFACE_REGEXP = re.compile(r"^(?:abstract\s+)?interface\b")
+END_INTERFACE_REGEXP = re.compile(r"^end\s*interface\b")
+CALL_REGEXP = re.compile(r"\bcall\s+(\w+)")
+
+# Part of a line before the comment (a '!' that is not in a string), and the strings, emptied so that their content is 
+# not taken for code
+CODE_REGEXP = re.compile(r"""^(?:[^'"!]|'[^']*'|"[^"]*")*""")
+STRING_REGEXP = re.compile(r"'[^']*'|\"[^\"]*\"")
+
 class SubroutineSource(object):
   """Define an object linked to a fortran 90 source code that will
   store dependencies, including modules included, used or included
@@ -55,13 +83,21 @@ class SubroutineSource(object):
   findExternal = {}
   
   
-  def __init__(self, name, source):
+  def __init__(self, name, source=None, used=None, arguments=None, externals=None):
     """Will check everything that is included in the source code
-    and initialize the object"""
+    and initialize the object. Either the source code is given (a list of lines), or the results of its scan 
+    (see scanSource()) : the procedures called, the arguments and the names declared as 'external'"""
     
     self.name = name
     
-    (self.used, self.external, self.arguments) = self.__getCalls(source)
+    if (source != None):
+      (self.used, self.external, self.arguments) = self.__getCalls(source)
+    else:
+      self.used = list(used or [])
+      self.external = {}
+      self.arguments = list(arguments or [])
+      for external in (externals or []):
+        SubroutineSource.findExternal[self.name+"."+external.upper()] = self
 
     self.source = source
 
@@ -73,7 +109,7 @@ class SubroutineSource(object):
     """class function that gives a dictionnary of colors for each sourceFile defined so far
     """
     
-    cls.subroutine_colors = dict(zip(cls.findSubroutine.keys(), autiwa.colorList(len(cls.findSubroutine))))
+    cls.subroutine_colors = dict(zip(sorted(cls.findSubroutine.keys()), autiwa.colorList(len(cls.findSubroutine))))
     
     #~ pdb.set_trace()
     return 0
@@ -254,13 +290,17 @@ class FunctionSource(object):
 
   
   
-  def __init__(self, name, source):
+  def __init__(self, name, source=None, used=None):
     """Will check everything that is included in the source code
-    and initialize the object"""
+    and initialize the object. Either the source code is given (a list of lines), or the procedures called (see 
+    scanSource())"""
     
     self.name = name
     
-    self.used = self.__getCalls(source)
+    if (source != None):
+      self.used = self.__getCalls(source)
+    else:
+      self.used = list(used or [])
     
     self.source = source
 
@@ -396,13 +436,17 @@ class ProgramSource(object):
 
   
   
-  def __init__(self, name, source):
+  def __init__(self, name, source=None, used=None):
     """Will check everything that is included in the source code
-    and initialize the object"""
+    and initialize the object. Either the source code is given (a list of lines), or the procedures called (see 
+    scanSource())"""
     
     self.name = name
     
-    self.used = self.__getCalls(source)
+    if (source != None):
+      self.used = self.__getCalls(source)
+    else:
+      self.used = list(used or [])
 
     self.source = source
 
@@ -451,8 +495,25 @@ class ProgramSource(object):
 
     return 0
 
-  def writeTree(self,filename,excluded=[], direction="leftright"):
-    """write the architecture in a .svg file"""
+  def writeTree(self,filename,excluded=[], direction="leftright", layout="tree"):
+    """write the architecture in a .svg file
+    
+    Parameters :
+    filename : the name of the .svg file
+    excluded=[] : a list of names of the subroutines we do not want in the diagram
+    direction="leftright" : "leftright" or "topbottom"
+    layout="tree" : "tree" to draw the subroutines called under each subroutine (a subroutine called several times is 
+                    drawn several times), or "dag" to draw each subroutine once, in layers (see svg.createGraph()). 
+                    The latter is the one to use for large programs.
+    """
+    
+    if (layout == "dag"):
+      SubroutineSource.setColors()
+      (nodes, edges) = self.__getGraph(excluded=excluded)
+      createGraph(filename, nodes, edges, direction=direction)
+      return
+    elif (layout != "tree"):
+      raise ValueError("the 'layout' you typed do not exist. You must choose between: \n_ 'tree'\n_ 'dag'")
     
     if (direction == "topbottom"):
       constructArch = self.__getArchitectureTopBottom
@@ -469,6 +530,36 @@ class ProgramSource(object):
     
     createSVG(filename, *architecture)
  
+  def __getGraph(self, excluded=[]):
+    """Return the call graph of the program, as needed by svg.createGraph() : the list of the nodes (name, text, color) 
+    and the list of the edges (caller, subroutine called). Each subroutine appear once. The subroutines that are not 
+    defined in the sources read (intrinsic or external ones) are ignored.
+    
+    Parameter:
+    excluded=[] : a list of names of the subroutines we do not want in the graph"""
+    
+    nodes = [(self.name, self.name, 'ffffff')]
+    edges = []
+    visited = set()
+    
+    callers = deque([(self.name, self.used)])
+    while callers:
+      (caller, used) = callers.popleft()
+      for name in used:
+        if ((name in excluded) or not(name in SubroutineSource.findSubroutine)):
+          continue
+        edges.append((caller, name))
+        if not(name in visited):
+          visited.add(name)
+          subroutine = SubroutineSource.findSubroutine[name]
+          # Theses lines are here only for the case where several routines 
+          # have the same name pour one subroutine given in parameter (the name of the 'external'). 
+          text = name.split(".")[-1]
+          nodes.append((name, text, SubroutineSource.subroutine_colors[name]))
+          callers.append((name, subroutine.used))
+    
+    return (nodes, edges)
+  
   def __getArchitectureLeftRight(self, architecture, excluded=[], x=0, y=0):
     """Retrieve the architecture of the program
     
@@ -582,131 +673,179 @@ class FortranSource(object):
 
     FortranSource.findSource['self.filename'] = self
 
-  def __getWords(self,line):
-    """method that return a list of words from a line of code
-    """
-
-    l=string.expandtabs(string.lower(line),1)
-    words=string.split(string.lstrip(l))
-    
-    return words
-
   def __readSource(self):
-    """returns a tuple containing the list of defined subroutines and 
-    the list of used subroutines of a fortran source file
+    """returns a tuple containing the list of programs, subroutines and functions defined in the fortran source file. 
+    The file is scanned once (see scanSource()), and the result is stored in the cache (see readUnits())
     
     Return 
-    defined : a list of subroutine defined in the fortran source code
-    used : a list of subroutine that are used by the code
-    included : a list of things included in the code
+    program : a list of 'ProgramSource' objects
+    subroutine : a list of 'SubroutineSource' objects
+    function : a list of 'FunctionSource' objects
     """
 
-    f=open(self.filename,'r')
-    lines_raw = f.readlines()
-    f.close()
-
     program=[]
     subroutine=[]
     function=[]
 
-    # We merge all the lines that are in fact continuated lines with the '&' symbol
-    line = lines_raw[0][:-1]
-    lines = [line]
-    i = 1
-    while (i < len(lines_raw)):
-      previous_line = line
-      line = lines_raw[i].replace('\n', '') # We delete the '\n' character
-
-      # If the previous line was empty, no need to check for continuating line.
-      if (previous_line == ""):
-        lines.append(line)
-        i += 1
-        continue
-      
-      if (previous_line[-1] == '&'):
-        lines[-1] = lines[-1][:-1] + line # We suppress the "&" symbol and merge the two lines
+    for unit in readUnits(self.filename):
+      if (unit["kind"] == "program"):
+        program.append(ProgramSource(name=unit["name"], used=unit["calls"]))
+      elif (unit["kind"] == "subroutine"):
+        subroutine.append(SubroutineSource(name=unit["name"], used=unit["calls"], arguments=unit["arguments"], 
+                                           externals=unit["externals"]))
       else:
-        lines.append(line)
-      i += 1
-      
+        function.append(FunctionSource(name=unit["name"], used=unit["calls"]))
 
-    line_index = 0
-    nb_lines = len(lines)
-    while line_index < nb_lines:
-      lsave = lines[line_index]
+    return (program, subroutine, function)
 
-      words = self.__getWords(lsave)
-      
-      if len(words) > 1:
-        if words[0] == 'program':
-          name_program = string.split(words[1],',')[0]
-
-          program_source = [lsave]
-          
-          # We extract the code of the entire program
-          isInsideProgram = True
-          while isInsideProgram:
-            line_index += 1
-            try:
-              lsave = lines[line_index]
-            except:
-              pdb.set_trace()
-            words = self.__getWords(lsave)
-            program_source.append(lsave)
-            
-            if ((len(words) >= 1) and (words[0] == "contains")):
-              isInsideProgram = False
-            elif ((len(words) > 2) and (words[0] == "end" and words[1] == "program" and words[2] == name_program)):
-              isInsideProgram = False
-            else:
-              isInsideProgram = True
-
-          #~ if (name_program == "mercury"):
-            #~ pdb.set_trace()  
-
-          program.append(ProgramSource(name=name_program, source=program_source))
-          
-          
-        if (words[0] == 'subroutine'):
-          name_subroutine = string.split(words[1],'(')[0]
-
-          # We extract the source code of the subroutine
-          subroutine_source = [lsave]
-          isInsideSubroutine = True
-          while ((line_index < nb_lines-1) and ((len(words) <= 2) or (words[0] != "end" and words[1] != "subroutine" and words[2] != name_subroutine))):
-            line_index += 1
-            lsave = lines[line_index]
-            words = self.__getWords(lsave)
-            subroutine_source.append(lsave)
-
-            if ((len(words) > 2) and (words[0] == "end" and words[1] == "subroutine" and words[2] == name_subroutine)):
-              isInsideSubroutine = False
-            else:
-              isInsideSubroutine = True
-
-          subroutine.append(SubroutineSource(name=name_subroutine, source=subroutine_source))
-
-        if (words[0] == 'function'):
-          name_function = string.split(words[1],',')[0]
-          
-          function_source = [lsave]
-          isInsideFunction = True
-          while ((len(words) <= 2) or (words[0] != "end" and words[1] != "function" and words[2] != name_function)):
-            line_index += 1
-            lsave = lines[line_index]
-            words = self.__getWords(lsave)
-            function_source.append(lsave)
-
-            if ((len(words) > 2) and (words[0] == "end" and words[1] == "function" and words[2] == name_function)):
-              isInsideFunction = False
-            else:
-              isInsideFunction = True
-
-          function.append(FunctionSource(name=name_function, source=function_source))
-          
-      line_index += 1
+def getLogicalLines(text, isFixedForm=False):
+  """function that return the instructions of a fortran source code, one per line : in lower case, without the 
+  comments nor the content of the strings, and with the continuation lines merged (with a '&' at the end of the line, or in the 6th column for the 
+  fixed form)
+  
+  Parameters :
+  text : the source code (a string)
+  isFixedForm=False : True for fortran 77 sources (.f, .for), where the lines beginning with 'c' or '*' are comments
+  """
+  
+  lines = []
+  isContinued = False
+  for line in text.lower().expandtabs(6).split("\n"):
+    if isFixedForm:
+      if (line[:1] in ("c", "*", "!")):
+        continue
+      if ((len(line) > 5) and (line[5] not in " 0") and lines):
+        lines[-1] += " " + CODE_REGEXP.match(line[6:]).group().strip()
+        continue
+    
+    code = CODE_REGEXP.match(line).group().strip()
+    if not(code):
+      continue
+    
+    if isContinued:
+      lines[-1] += " " + code.lstrip("&").lstrip()
+    else:
+      lines.append(code)
+    
+    isContinued = lines[-1].endswith("&")
+    if isContinued:
+      lines[-1] = lines[-1][:-1].rstrip()
+  
+  return [STRING_REGEXP.sub("''", line) for line in lines]
 
-    return (program, subroutine, function)
+def scanSource(text, isFixedForm=False):
+  """function that find, in one pass, the programs, subroutines and functions of a fortran source code, and the 
+  procedures called by each of them. The procedures contained in another one (after 'contains') are separate units, 
+  and the procedures only declared in an interface block are ignored.
+  
+  Parameters :
+  text : the source code (a string)
+  isFixedForm=False : True for fortran 77 sources (see getLogicalLines())
+  
+  Return : a list of dictionnaries, one per unit, with the keys "kind" ('program', 'subroutine' or 'function'), 
+  "name", "arguments", "calls" (the procedures called, without duplicates) and "externals" (the names declared as 'external')
+  """
+  
+  units = []
+  # The units in which the current line is. The modules are stacked too (as None), to match their 'end'
+  stack = []
+  interface_depth = 0
+  
+  for line in getLogicalLines(text, isFixedForm=isFixedForm):
+    if interface_depth:
+      if END_INTERFACE_REGEXP.match(line):
+        interface_depth -= 1
+      elif INTERFACE_REGEXP.match(line):
+        interface_depth += 1
+      continue
+    
+    if INTERFACE_REGEXP.match(line):
+      interface_depth += 1
+      continue
+    
+    match = END_REGEXP.match(line)
+    if match:
+      if stack:
+        stack.pop()
+      continue
+    
+    words = line.split()
+    if ((words[0] == "module") and (len(words) == 2) and (words[1] != "procedure")):
+      stack.append(None)
+      continue
+    
+    match = UNIT_REGEXP.match(line)
+    if match:
+      if match.group("arguments"):
+        arguments = match.group("arguments").replace(" ", "").split(",")
+      else:
+        arguments = []
+      unit = {"kind":match.group("kind"), "name":match.group("name"), "arguments":arguments, 
+              "calls":[], "externals":[]}
+      units.append(unit)
+      stack.append(unit)
+      continue
+    
+    if not(stack) or (stack[-1] == None):
+      continue
+    
+    match = EXTERNAL_REGEXP.match(line)
+    if match:
+      stack[-1]["externals"].extend([name.strip() for name in match.group("names").split(",") if name.strip()])
+      continue
+    
+    for name in CALL_REGEXP.findall(line):
+      if not(name in stack[-1]["calls"]):
+        stack[-1]["calls"].append(name)
+  
+  return units
+
+def readUnits(filename, cache=CACHE_FOLDER):
+  """function that return the programs, subroutines and functions of a fortran source file (see scanSource()). 
+  The results are stored in a cache folder, in a file named after the hash of the source code, so that the file is 
+  only scanned again if its content changed.
+  
+  Parameters :
+  filename : the name of the fortran source file
+  cache=".fortran_cache" : the folder of the cache. If None, the cache is not used.
+  """
+  
+  f = open(filename, 'rb')
+  data = f.read()
+  f.close()
+  text = data.decode("latin-1")
+  
+  isFixedForm = (os.path.splitext(filename)[1].lower() in (".f", ".for"))
+  
+  if (cache == None):
+    return scanSource(text, isFixedForm=isFixedForm)
+  
+  key = hashlib.sha1(("%d %d\n" % (CACHE_VERSION, isFixedForm)).encode() + data).hexdigest()
+  cache_file = os.path.join(cache, key+".json")
+  
+  if os.path.isfile(cache_file):
+    f = open(cache_file, 'r')
+    try:
+      units = json.load(f)
+    except ValueError:
+      # The file is corrupted, we scan the source again
+      units = None
+    f.close()
+    if (units != None):
+      return units
+  
+  units = scanSource(text, isFixedForm=isFixedForm)
+  
+  if not(os.path.isdir(cache)):
+    os.makedirs(cache)
+  
+  # The file is renamed at the end, so that a file being written is never read
+  f = open(cache_file+".tmp", 'w')
+  json.dump(units, f)
+  f.close()
+  os.rename(cache_file+".tmp", cache_file)
+  
+  return units
 
 def lister(scheme):
   """list all the files corresponding to the given expression (might 
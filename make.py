@@ -11,14 +11,39 @@ __credits__ = """Based on the work of Pierre gay, in particuliar his get_module
 All you have to do is to define wich sourcefile is the main sourcefile. The module will get binaries only for theses sources (there can be severals)
 """
 import os, sys
+import re
 import string
 import subprocess # To launch various process, get outputs et errors, returnCode and so on.
 import difflib # To compare two strings
+import hashlib # To identify the content of the files in the build cache
+import json # To store the index of the build cache
+import shutil # To copy the files in and out of the build cache
+import tempfile # To store the files in the build cache atomically
+import threading # To compile several files at the same time
+import time # To measure the duration of the compilations
+from collections import deque # To visit the graph of the dependencies
+try:
+  import queue # To send the files to compile to the threads, and get the results
+except ImportError:
+  import Queue as queue
 import pdb # To debug
 from svg import *
 import autiwa
 
-def make_binaries(sources_filename, mains, debug=False, gdb=False, profiling=False):
+# Default folder of the build cache (see BuildCache), in the working directory
+BUILD_CACHE = ".make_cache"
+
+# Regular expression that find, in a fortran source file, the modules used ('use name'), the modules defined ('module name') 
+# and the included files ('include "file"' or '#include "file"'). Only one group is defined for each match.
+SCAN_REGEXP = re.compile(r"""^[ \t]*(?:
+  use\b[ \t]*(?:::[ \t]*)?(?P<use>\w+)
+  |module[ \t]+(?P<module>\w+)
+  |include[ \t]+['"]?(?P<include>[^'"\s]+)
+  |\#include[ \t]+"?(?P<cpp_include>[^"\s]+)
+  )""", re.MULTILINE | re.VERBOSE | re.IGNORECASE)
+
+def make_binaries(sources_filename, mains, debug=False, gdb=False, profiling=False, nb_workers=1, cache=BUILD_CACHE, 
+                  report=True, trace=None):
   """function that will compile every needed sourceFile and get a 
   binary for the defined source files
   
@@ -31,6 +56,15 @@ def make_binaries(sources_filename, mains, debug=False, gdb=False, profiling=Fal
   gdb=False : If set to True, will add a compilation option to run the program under the GNU debugger gdb. 
   profiling=False : If set to True, will change compilation options to profile the binary files (using gprof). 
                     As a consequence, this will deactivate all optimization options. 
+  nb_workers=1 : The number of source files compiled at the same time (like 'make -j N'). Independent modules are 
+                 compiled in parallel, following the dependencies between modules (see compile_sources())
+  cache=".make_cache" : The folder of the build cache (see BuildCache). A file is compiled only if its content, the 
+                        compilation options or the interfaces of the modules it uses changed. If None, a file is 
+                        compiled if it is newer than its object file, and the programs are always compiled.
+  report=True : If True, display at the end the duration of each compilation and the critical path of the build 
+                (see print_build_report())
+  trace=None : The name of a file where the compilations are written as a Chrome trace (see write_build_trace()), 
+               that can be opened in chrome://tracing. Nothing is written by default.
   
   Examples : 
   make_binaries(sources_filename, {"mercury6_2.for":"mercury", "element6.for":"element", "close6.for":"close"})
@@ -51,6 +85,12 @@ def make_binaries(sources_filename, mains, debug=False, gdb=False, profiling=Fal
   else:
     raise TypeError("'mains' must be a dict or a list")
   
+  # The cache is set first, the results of the scans of the source files are stored in it
+  if (cache != None):
+    sourceFile.setCache(BuildCache(cache))
+  else:
+    sourceFile.setCache(None)
+  
   # We define the objects for each source file.
   sources = []
   main_source = []
@@ -61,14 +101,247 @@ def make_binaries(sources_filename, mains, debug=False, gdb=False, profiling=Fal
       source = sourceFile(filename)
     sources.append(source)
   
+  # The results of the scans are kept for the next time
+  sourceFile.saveScanIndex()
+  
   sourceFile.setDebug(debug)
   sourceFile.setGDB(gdb)
   sourceFile.setProfiling(profiling)
   
   # We compile the programs (dependencies are automatically compiled if needed.
-  for source in sources:
-    if (not(source.isCompiled) and source.isProgram):
-      print source.compile()
+  programs = [source for source in sources if source.isProgram]
+  compile_sources(programs, nb_workers=nb_workers)
+  
+  if report:
+    print_build_report(programs)
+  
+  if (trace != None):
+    write_build_trace(programs, trace)
+
+def get_all_sources(source):
+  """function that return the set of all the 'sourceFile' objects needed to compile a source file : itself and, 
+  recursively, all the source files that define the modules it uses"""
+  
+  sources = set([source])
+  to_visit = [source]
+  while to_visit:
+    for dependency in to_visit.pop().getModuleSources():
+      if dependency not in sources:
+        sources.add(dependency)
+        to_visit.append(dependency)
+  
+  return sources
+
+def _compile_worker(jobs, results):
+  """function run by each thread of compile_sources(). It compiles the source files of the queue 'jobs' and put the 
+  results (source, returnCode, process_stdout, process_stderr) in the queue 'results'. It stops when it gets None"""
+  
+  while True:
+    source = jobs.get()
+    if (source == None):
+      break
+    
+    results.put((source,) + source.run())
+
+def get_prerequisites(programs):
+  """function that return, for each source file needed by the given programs, the set of the source files that must be 
+  compiled before. A module need the .mod of the modules it uses, but a program also need all the object files, for 
+  the link.
+  
+  Parameters : 
+  programs : a list of 'sourceFile' objects
+  
+  Return : a dictionnary whose keys are 'sourceFile' objects and values are sets of 'sourceFile' objects
+  """
+  
+  prerequisites = {}
+  for program in programs:
+    program.resolve()
+    for source in get_all_sources(program):
+      if (source.isProgram):
+        prerequisites[source] = get_all_sources(source) - set([source])
+      else:
+        prerequisites[source] = set(source.getModuleSources())
+  
+  return prerequisites
+
+def compile_sources(programs, nb_workers=1):
+  """function that compile the given programs and all the modules they need. The source files are compiled as soon as 
+  the modules they use are compiled, with at most 'nb_workers' compilations at the same time. A module only waits for 
+  the modules it uses, and a program (the link) waits for all the object files it needs.
+  
+  If a compilation fails, we wait for the compilations in progress, then exit (see sourceFile.ended())
+  
+  Parameters : 
+  programs : a list of 'sourceFile' objects (the programs we want to get)
+  nb_workers=1 : the maximum number of compilations at the same time
+  """
+  
+  # For each source file, the source files that must be compiled before.
+  prerequisites = get_prerequisites(programs)
+  
+  jobs = queue.Queue()
+  results = queue.Queue()
+  workers = []
+  for i in range(nb_workers):
+    worker = threading.Thread(target=_compile_worker, args=(jobs, results))
+    worker.daemon = True
+    worker.start()
+    workers.append(worker)
+  
+  waiting = set(prerequisites.keys())
+  done = set()
+  failed = False
+  nb_running = 0
+  while True:
+    # We launch all the compilations whose prerequisites are done. The files that do not need to be compiled are done 
+    # at once, and that may allow other files to be launched.
+    launched = True
+    while (launched and not(failed)):
+      launched = False
+      for source in sorted(waiting, key=lambda source: source.filename):
+        if (prerequisites[source] <= done):
+          waiting.remove(source)
+          launched = True
+          if (not(source.isCompiled) and source.needsCompilation()):
+            print("Compiling "+source.filename+"...")
+            jobs.put(source)
+            nb_running += 1
+          else:
+            source.isCompiled = True
+            done.add(source)
+    
+    if (nb_running == 0):
+      break
+    
+    (source, returnCode, process_stdout, process_stderr) = results.get()
+    nb_running -= 1
+    
+    if source.ended(returnCode, process_stderr):
+      done.add(source)
+      if process_stderr:
+        print(process_stderr)
+    else:
+      failed = True
+  
+  for worker in workers:
+    jobs.put(None)
+  
+  # The workers end after the sentinel, once their current compilation is finished
+  for worker in workers:
+    worker.join()
+  
+  if failed:
+    sys.exit(1)
+
+def get_critical_path(programs):
+  """function that return the critical path of the last build of the given programs : the chain of compilations, 
+  following the dependencies, whose total duration is the longest. No build can be faster than this chain, whatever the 
+  number of workers. The files that were not compiled count for 0.
+  
+  Parameters : 
+  programs : a list of 'sourceFile' objects, already compiled
+  
+  Return : a tuple (duration, path) where path is the list of the 'sourceFile' objects of the chain, the first to be 
+  compiled first
+  """
+  
+  prerequisites = get_prerequisites(programs)
+  
+  # For each source file, the duration of the longest chain that ends with it, and the previous file in this chain.
+  # The files are visited after all their prerequisites.
+  finish = {}
+  previous = {}
+  to_visit = sorted(prerequisites.keys(), key=lambda source: source.filename)
+  while to_visit:
+    remaining = []
+    for source in to_visit:
+      if not(prerequisites[source] <= set(finish.keys())):
+        remaining.append(source)
+        continue
+      
+      previous[source] = None
+      start = 0.
+      for prerequisite in prerequisites[source]:
+        if (finish[prerequisite] > start):
+          start = finish[prerequisite]
+          previous[source] = prerequisite
+      
+      finish[source] = start + (source.wallTime or 0.)
+    to_visit = remaining
+  
+  if not(finish):
+    return (0., [])
+  
+  last = max(finish.keys(), key=lambda source: finish[source])
+  path = []
+  source = last
+  while (source != None):
+    path.insert(0, source)
+    source = previous[source]
+  
+  return (finish[last], path)
+
+def print_build_report(programs):
+  """function that display the duration of each compilation of the last build of the given programs (the longest 
+  first), and the critical path of the build (see get_critical_path()). The ratio between the total duration of the 
+  compilations and the duration of the critical path is the maximum speedup we can expect from parallel compilation.
+  
+  Parameters : 
+  programs : a list of 'sourceFile' objects, already compiled
+  """
+  
+  compiled = [source for source in get_prerequisites(programs) if (source.wallTime != None)]
+  if not(compiled):
+    print("Nothing was compiled")
+    return
+  
+  compiled.sort(key=lambda source: source.wallTime, reverse=True)
+  total = sum([source.wallTime for source in compiled])
+  (critical_time, critical_path) = get_critical_path(programs)
+  
+  print("Compilation times:")
+  for source in compiled:
+    print("  %8.2fs %5.1f%%  %s (return code %d, %d bytes of output)" % (source.wallTime, 100. * source.wallTime / total, 
+                                                                       source.filename, source.returnCode, source.outputSize))
+  print("Total: %.2fs for %d files" % (total, len(compiled)))
+  
+  print("Critical path: %.2fs" % critical_time)
+  for source in critical_path:
+    if (source.wallTime != None):
+      print("  %8.2fs  %s" % (source.wallTime, source.filename))
+  if (critical_time > 0):
+    print("Maximum speedup with parallel compilation: %.1f" % (total / critical_time))
+
+def write_build_trace(programs, filename):
+  """function that write the compilations of the last build of the given programs in a file, in the trace event format 
+  of Chrome (to be opened in chrome://tracing or https://ui.perfetto.dev). There is one line per worker.
+  
+  Parameters : 
+  programs : a list of 'sourceFile' objects, already compiled
+  filename : the name of the JSON file
+  """
+  
+  compiled = [source for source in get_prerequisites(programs) if (source.wallTime != None)]
+  if not(compiled):
+    return
+  
+  origin = min([source.startTime for source in compiled])
+  workers = sorted(set([source.worker for source in compiled]))
+  
+  events = []
+  for source in compiled:
+    if source.isProgram:
+      category = "link"
+    else:
+      category = "compile"
+    events.append({"name":source.filename, "cat":category, "ph":"X", "pid":0, "tid":workers.index(source.worker), 
+                   "ts":(source.startTime - origin) * 1e6, "dur":source.wallTime * 1e6, 
+                   "args":{"returnCode":source.returnCode, "outputSize":source.outputSize}})
+  
+  f = open(filename, 'w')
+  json.dump({"traceEvents":events, "displayTimeUnit":"ms"}, f, indent=1)
+  f.close()
 
 def run(command):
   """run a command that will be a string.
@@ -218,6 +491,221 @@ def clean(exts):
   else:
     return returnCode
 
+def hash_file(filename):
+  """function that return the sha1 hash (as an hexadecimal string) of the content of a file"""
+  
+  sha1 = hashlib.sha1()
+  f = open(filename, 'rb')
+  block = f.read(65536)
+  while block:
+    sha1.update(block)
+    block = f.read(65536)
+  f.close()
+  
+  return sha1.hexdigest()
+
+def find_included_file(name, folder):
+  """function that return the path of an included file, or None if it is not found (a system header for instance). 
+  As the compiler does, the file is searched in the folder of the file that include it, then in the working directory. 
+  The names of the fortran includes are stored in lower case (see sourceFile.__getModules()), so the case is ignored 
+  if there is no exact match.
+  
+  Parameters : 
+  name : the name of the file, as written in the include statement
+  folder : the folder of the file that include it
+  """
+  
+  for directory in [folder, os.curdir]:
+    path = os.path.join(directory, name)
+    if os.path.isfile(path):
+      return os.path.normpath(path)
+    
+    (subfolder, basename) = os.path.split(path)
+    if os.path.isdir(subfolder or os.curdir):
+      for candidate in sorted(os.listdir(subfolder or os.curdir)):
+        if ((candidate.lower() == basename.lower()) and os.path.isfile(os.path.join(subfolder, candidate))):
+          return os.path.normpath(os.path.join(subfolder, candidate))
+  
+  return None
+
+def get_included_files(filename, included):
+  """function that return the files included in a source file, recursively : the files included by an included file 
+  are also returned. The files that are not found are ignored (see find_included_file()).
+  
+  Parameters : 
+  filename : the name of the source file
+  included : the list of the names included in the source file (see sourceFile.included)
+  
+  Return : the list of the paths of the included files, each of them appearing once
+  """
+  
+  files = []
+  to_visit = [(os.path.dirname(filename), name) for name in included]
+  while to_visit:
+    (folder, name) = to_visit.pop(0)
+    path = find_included_file(name, folder)
+    if ((path == None) or (path in files)):
+      continue
+    files.append(path)
+    
+    f = open(path, 'r')
+    text = f.read()
+    f.close()
+    
+    for match in SCAN_REGEXP.finditer(text):
+      if (match.group("include") != None):
+        to_visit.append((os.path.dirname(path), match.group("include")))
+      elif (match.group("cpp_include") != None):
+        to_visit.append((os.path.dirname(path), match.group("cpp_include")))
+  
+  return files
+
+class BuildCache(object):
+  """class that store the products of the compilations (object files, .mod files and binaries) in a folder, indexed 
+  by a hash of everything that can change the result of the compilation : the content of the source file and of the 
+  files it includes, the compiler and its options, the interfaces (.mod files) of the modules used and, for a program, 
+  the object files linked. 
+  
+  A source file is thus not compiled again if nothing changed, even if it was touched. A module is not compiled again 
+  either if the implementation of a module it uses changed but not its interface (the .mod file is the same). And after 
+  a switch between two branches, the products are restored from the cache instead of being compiled again.
+  
+  Parameters : 
+  folder=BUILD_CACHE : the folder of the cache (created if needed)
+  
+  Attributes : 
+  self.index : dictionnary that give, for each source filename, the key of the products currently in the working directory
+  """
+  
+  # Name of the file of the index, in the folder of the cache
+  INDEX = "index.json"
+  
+  # Name of the file where the results of the scans of the source files are stored, in the folder of the cache (see 
+  # sourceFile.loadScanIndex())
+  SCAN_INDEX = "scan.json"
+  
+  def __init__(self, folder=BUILD_CACHE):
+    """initialisation of the object"""
+    
+    self.folder = folder
+    
+    if not(os.path.isdir(self.folder)):
+      os.makedirs(self.folder)
+    
+    index_file = os.path.join(self.folder, BuildCache.INDEX)
+    if os.path.isfile(index_file):
+      f = open(index_file, 'r')
+      self.index = json.load(f)
+      f.close()
+    else:
+      self.index = {}
+  
+  def getKey(self, source):
+    """method that return the key of a source file, that is a hash of everything that can change the result of its 
+    compilation. The modules it uses (and the object files, for a program) must have been compiled before.
+    
+    Parameter : 
+    source : a 'sourceFile' object
+    """
+    
+    sha1 = hashlib.sha1()
+    sha1.update((sourceFile.COMPILATOR+"\n"+sourceFile.getOptions()+"\n").encode())
+    sha1.update(hash_file(source.filename).encode())
+    
+    # The content of the included files, and of the files they include
+    for included_file in get_included_files(source.filename, source.included):
+      sha1.update((included_file+":"+hash_file(included_file)+"\n").encode())
+    
+    # The interfaces of the used modules
+    for module in sorted(source.used):
+      sha1.update((module+":"+hash_file(module+".mod")+"\n").encode())
+    
+    # A program also depends on all the object files that are linked
+    if source.isProgram:
+      sha1.update(" ".join(source.dependencies).encode())
+      for object_file in sorted(source.dependencies):
+        sha1.update((object_file+":"+hash_file(object_file)+"\n").encode())
+    
+    return sha1.hexdigest()
+  
+  def isUpToDate(self, source, key):
+    """method that return True if the products of the source file in the working directory correspond to the key
+    
+    Parameters : 
+    source : a 'sourceFile' object
+    key : the key of the source file (see getKey())
+    """
+    
+    if (self.index.get(source.filename) != key):
+      return False
+    
+    for product in source.getProducts():
+      if not(os.path.isfile(product)):
+        return False
+    
+    return True
+  
+  def restore(self, source, key):
+    """method that copy the products of the source file, if they are stored in the cache for this key, in the working directory
+    
+    Parameters : 
+    source : a 'sourceFile' object
+    key : the key of the source file (see getKey())
+    
+    Return : True if the products were restored, False if they are not in the cache
+    """
+    
+    folder = os.path.join(self.folder, key)
+    if not(os.path.isdir(folder)):
+      return False
+    
+    for product in source.getProducts():
+      if not(os.path.isfile(os.path.join(folder, product))):
+        return False
+    
+    for product in source.getProducts():
+      shutil.copy2(os.path.join(folder, product), product)
+    
+    self.__setIndex(source, key)
+    
+    return True
+  
+  def store(self, source, key):
+    """method that copy the products of the source file, that was just compiled, in the cache
+    
+    Parameters : 
+    source : a 'sourceFile' object
+    key : the key of the source file (see getKey())
+    """
+    
+    folder = os.path.join(self.folder, key)
+    
+    if not(os.path.isdir(folder)):
+      # The products are copied in a temporary folder that is then renamed, so that the cache never contain an 
+      # incomplete entry
+      temporary = tempfile.mkdtemp(dir=self.folder)
+      for product in source.getProducts():
+        if os.path.isfile(product):
+          shutil.copy2(product, os.path.join(temporary, product))
+      try:
+        os.rename(temporary, folder)
+      except OSError:
+        # Another build stored the same entry in the meantime
+        shutil.rmtree(temporary)
+    
+    self.__setIndex(source, key)
+  
+  def __setIndex(self, source, key):
+    """method that store in the index the key of the products of a source file, and write the index"""
+    
+    self.index[source.filename] = key
+    
+    index_file = os.path.join(self.folder, BuildCache.INDEX)
+    f = open(index_file+".tmp", 'w')
+    json.dump(self.index, f, indent=1, sort_keys=True)
+    f.close()
+    os.rename(index_file+".tmp", index_file)
+
 class sourceFile(object):
   """Define an object linked to a fortran 90 source code that will
   store dependencies, including modules included, used or included
@@ -280,6 +768,12 @@ class sourceFile(object):
   #-finit-real=zero : initialise tous les réels à 0
   # farfadet spatial m'a conseillé -O2 au lieu de -O3 mais je ne comprends pas encore pourquoi.
 
+  # The 'BuildCache' object used to avoid compilations (None to use the dates of the files instead)
+  cache = None
+  
+  # The results of the scans of the source files (see __getModules()). They are stored in the folder of the cache
+  scanIndex = None
+  
   # Boolean that say if we want to activate debug or not
   isDebug = False
   isGDB = False
@@ -302,6 +796,14 @@ class sourceFile(object):
     
     
     self.isCompiled = False
+    self.isResolved = False
+    
+    # Measures of the compilation (see run()). They stay None if the file is not compiled
+    self.startTime = None
+    self.wallTime = None
+    self.returnCode = None
+    self.outputSize = None
+    self.worker = None
     
     if (not(self.isProgram)):
       # If the source file is newer than the object file, we need to compile it
@@ -353,7 +855,7 @@ class sourceFile(object):
     """class function that gives a dictionnary of colors for each sourceFile defined so far
     """
     try:
-      cls.mod_colors = dict(zip(cls.findSource.keys(), autiwa.colorList(len(cls.findSource))))
+      cls.mod_colors = dict(zip(sorted(cls.findSource.keys()), autiwa.colorList(len(cls.findSource))))
     except:
       pdb.set_trace()
     return 0
@@ -368,6 +870,19 @@ class sourceFile(object):
     
     cls.OPTIONS = options
   
+  @classmethod
+  def setCache(cls, cache):
+    """method that set the build cache.
+    
+    Parameter:
+    cache : a 'BuildCache' object, or None to decide if a file must be compiled with the dates of the files
+    """
+    
+    cls.cache = cache
+    
+    # The results of the scans are those of the new cache
+    cls.scanIndex = None
+  
   @classmethod
   def setCompilator(cls, compilator):
     """method that set the 'COMPILATOR' value. 
@@ -378,47 +893,105 @@ class sourceFile(object):
     
     cls.COMPILATOR = compilator
   
+  @classmethod
+  def loadScanIndex(cls, filename=None):
+    """method that load the results of the previous scans of the source files (see __getModules()). It is done 
+    automatically when the first source file is scanned.
+    
+    Parameter:
+    filename=None : the file of the index. By default, the file BuildCache.SCAN_INDEX in the folder of the cache. 
+                    Without cache, nothing is read and all the files are scanned.
+    """
+    
+    if ((filename == None) and (cls.cache != None)):
+      filename = os.path.join(cls.cache.folder, BuildCache.SCAN_INDEX)
+    
+    cls.scanIndex = {}
+    if ((filename != None) and os.path.isfile(filename)):
+      f = open(filename, 'r')
+      try:
+        cls.scanIndex = json.load(f)
+      except ValueError:
+        # The index is corrupted, all the files will be scanned again
+        pass
+      f.close()
+  
+  @classmethod
+  def saveScanIndex(cls, filename=None):
+    """method that write the results of the scans of the source files, so that only the files modified since are scanned 
+    the next time.
+    
+    Parameter:
+    filename=None : the file of the index. By default, the file BuildCache.SCAN_INDEX in the folder of the cache. 
+                    Without cache, nothing is written.
+    """
+    
+    if (cls.scanIndex == None):
+      return
+    
+    if (filename == None):
+      if (cls.cache == None):
+        return
+      filename = os.path.join(cls.cache.folder, BuildCache.SCAN_INDEX)
+    
+    folder = os.path.dirname(filename)
+    if (folder and not(os.path.isdir(folder))):
+      os.makedirs(folder)
+    
+    f = open(filename+".tmp", 'w')
+    json.dump(cls.scanIndex, f, indent=1, sort_keys=True)
+    f.close()
+    os.rename(filename+".tmp", filename)
+  
   def __getModules(self):
     """returns a tuple containing the list of defined modules and 
     the list of used modules of a fortran source file
     
+    The result is stored in sourceFile.scanIndex, with the size and the date of the file. The file is only read 
+    again if one of them changed.
+    
     Return 
     defined : a list of procedures defined in the fortran source code
     used : a list of modules that are used by the code
     included : a list of things included in the code
     """
-
+    
+    if (sourceFile.scanIndex == None):
+      sourceFile.loadScanIndex()
+    
+    path = os.path.abspath(self.filename)
+    stat = os.stat(path)
+    
+    entry = sourceFile.scanIndex.get(path)
+    if ((entry != None) and (entry["mtime"] == stat.st_mtime) and (entry["size"] == stat.st_size)):
+      return (entry["defined"], entry["used"], entry["included"])
+    
     f=open(self.filename,'r')
-    lines = f.readlines()
+    text = f.read()
     f.close()
-
+    
     defined=[]
     used=[]
     included=[]
-
-    for lsave in lines:
-      l=string.expandtabs(string.lower(lsave)[:-1],1)
-      words=string.split(string.lstrip(l))
-      if len(words) > 0:
-        if words[0] == 'use':
-          used.append(string.split(words[1],',')[0])
-        if words[0] == 'module':
-          if len (words) == 2 or words[1] != "procedure":
-            defined.append(words[1])
-        if words[0] == 'include':
-          newstring = string.replace(words[1],'\'','')
-          newstring = string.replace(newstring,'\"','')
-          included.append(newstring)
-      l=string.expandtabs(lsave[:-1],1)
-      words=string.split(string.lstrip(l))
-      if len(words) > 0:
-        if words[0] == '#include':
-          newstring = string.replace(words[1],'\"','')
-          included.append(newstring)
-
-# We delete all dependencies that are present several number of times.
-    used = list(set(used))
-
+    
+    # All the statements are found in one pass on the file
+    for match in SCAN_REGEXP.finditer(text):
+      if (match.group("use") != None):
+        used.append(match.group("use").lower())
+      elif (match.group("module") != None):
+        if (match.group("module").lower() != "procedure"):
+          defined.append(match.group("module").lower())
+      elif (match.group("include") != None):
+        included.append(match.group("include").lower())
+      else:
+        included.append(match.group("cpp_include"))
+    
+    # We delete all dependencies that are present several number of times.
+    used = sorted(set(used))
+    
+    sourceFile.scanIndex[path] = {"mtime":stat.st_mtime, "size":stat.st_size, 
+                                  "defined":defined, "used":used, "included":included}
+    
     return defined,used,included
   
   def __getFirstOrderDependence(self):
@@ -443,8 +1016,25 @@ class sourceFile(object):
     
     self.isProgram = boolean
   
-  def writeArchitecture(self,filename,excluded=[], direction="leftright"):
-    """write the architecture in a .svg file"""
+  def writeArchitecture(self,filename,excluded=[], direction="leftright", layout="tree"):
+    """write the architecture in a .svg file
+    
+    Parameters :
+    filename : the name of the .svg file
+    excluded=[] : a list of names of the modules we do not want in the diagram
+    direction="leftright" : "leftright" or "topbottom" (see the documentation of the class)
+    layout="tree" : "tree" to draw the dependencies of each module under it (a module used by several others is drawn 
+                    several times), or "dag" to draw each module once, in layers (see svg.createGraph()). The 
+                    latter is the one to use for large programs.
+    """
+    
+    if (layout == "dag"):
+      self.setModColors()
+      (nodes, edges) = self.__getGraph(excluded=excluded)
+      createGraph(filename, nodes, edges, direction=direction)
+      return
+    elif (layout != "tree"):
+      raise ValueError("the 'layout' you typed do not exist. You must choose between: \n_ 'tree'\n_ 'dag'")
     
     if (direction == "topbottom"):
       constructArch = self.__getArchitectureTopBottom
@@ -461,6 +1051,32 @@ class sourceFile(object):
     
     createSVG(filename, *architecture)
 
+  def __getGraph(self, excluded=[]):
+    """Return the graph of the dependencies of the current source file, as needed by svg.createGraph() : the list of 
+    the nodes (filename, name, color) and the list of the edges (filename, filename of a used module). Each source file 
+    appear once.
+    
+    Parameter:
+    excluded=[] : a list of names of the modules we do not want in the graph"""
+    
+    nodes = []
+    edges = []
+    visited = set([self.filename])
+    to_visit = deque([self])
+    while to_visit:
+      source = to_visit.popleft()
+      nodes.append((source.filename, source.name, sourceFile.mod_colors[source.filename]))
+      for mod in source.used:
+        if (mod in excluded):
+          continue
+        dependency = sourceFile.findModule[mod]
+        edges.append((source.filename, dependency.filename))
+        if not(dependency.filename in visited):
+          visited.add(dependency.filename)
+          to_visit.append(dependency)
+    
+    return (nodes, edges)
+  
   def __getArchitectureTopBottom(self, architecture, excluded=[], x=0, y=0):
     """Retrieve the architecture of the program
     
@@ -599,8 +1215,69 @@ class sourceFile(object):
 
     return (architecture, parent_x, parent_y, tree_width)
 
-  def compile(self, parent_dependencies=[]):
-    """method that check dependencies and try to compile
+  @classmethod
+  def getOptions(cls):
+    """method that return the compilation options, given the debug, gdb and profiling parameters of the class"""
+    
+    options = cls.OPTIONS
+    if (cls.isDebug):
+      options += " "+cls.DEBUG
+    
+    if (cls.isGDB or cls.isProfiling):
+      options += " "+cls.GDB
+    
+    if (cls.isProfiling):
+      # We deactivate all other options except GDB => not True anymore
+      options += " "+" -pg"
+    
+    return options
+  
+  def getCommand(self):
+    """method that return the command that compile the current source file (into an object file for a module, or a 
+    binary for a program). The dependencies must be resolved first (see resolve())"""
+    
+    if not(self.isProgram):
+      commande = sourceFile.COMPILATOR+" "+sourceFile.getOptions()+" -c "+self.filename
+    else:
+      commande = sourceFile.COMPILATOR+" "+sourceFile.getOptions()+" -o "+self.name+" "+self.filename+" "+" ".join(self.dependencies)
+    
+    return commande
+  
+  def getProducts(self):
+    """method that return the list of the files produced by the compilation of the current source file : the binary 
+    for a program, the object file and the .mod files of the modules defined otherwise"""
+    
+    if self.isProgram:
+      return [self.name]
+    
+    return [os.path.splitext(self.filename)[0]+".o"] + [module+".mod" for module in self.defined]
+  
+  def needsCompilation(self):
+    """method that return True if the current source file must be compiled. Without build cache, this is decided from 
+    the dates of the files (see resolve()). With a build cache, the modules used must have been compiled before : the 
+    file is not compiled if its products are up to date, or if they can be restored from the cache."""
+    
+    if (sourceFile.cache == None):
+      return self.toBeCompiled
+    
+    self.cacheKey = sourceFile.cache.getKey(self)
+    if sourceFile.cache.isUpToDate(self, self.cacheKey):
+      return False
+    
+    if sourceFile.cache.restore(self, self.cacheKey):
+      print("Restoring "+self.filename+" from the cache...")
+      return False
+    
+    return True
+  
+  def getModuleSources(self):
+    """method that return the list of the 'sourceFile' objects that define the modules used by the current source file"""
+    
+    return [sourceFile.findModule[module] for module in self.used]
+  
+  def resolve(self, parent_dependencies=[]):
+    """method that search, recursively, all the dependencies of the current source file, and determine if it must be 
+    compiled (if it has to, or if one of the modules it uses has to). Nothing is compiled.
     
     Parameter : 
     parent_dependencies=[] : list that store all the parent dependencies of the current file, namely, all the module 
@@ -609,90 +1286,123 @@ class sourceFile(object):
     Beware, there MUST NOT be inter dependant modules.
     """
     
-    parent_dependencies.append(self.name)
+    if self.isResolved:
+      return
     
-    if not(self.isCompiled):
-      # We only store, for the moment, the first order dependencies.
-      self.dependencies = self.__getFirstOrderDependence()
+    parent_dependencies = list(parent_dependencies) + [self.name]
+    
+    # We store links towards all the object sourceFile that defined the modules we are interested in.
+    module_sources = self.getModuleSources()
+    
+    # For each object, we check if there is loop call of modules. If that's the case, return an error
+    for source in module_sources:
+      if source.name in parent_dependencies:
+        error_message = "The module '"+self.name+"' try to use the module '"+source.name+"' that already "+ \
+                        "use the module '"+self.name+"'. So there is an infinite loop that is not correct."
+        raise NameError(error_message)
+    
+    # We only store, for the moment, the first order dependencies.
+    self.dependencies = self.__getFirstOrderDependence()
+    
+    for source in module_sources:
+      source.resolve(parent_dependencies)
       
-      # We store links towards all the object sourceFile that defined the modules we are interested in.
-      module_sources = []
-      for module in self.used:
-        module_sources.append(sourceFile.findModule[module])
-        
-      # For each object, we check if there is loop call of modules. If that's the case, return an error
-      for name in self.used:
-        if name in parent_dependencies:
-          error_message = "The module '"+self.name+"' try to use the module '"+name+"' that already "+ \
-                          "use the module '"+self.name+"'. So there is an infinite loop that is not correct."
-          raise NameError(error_message)
+      # We compile the current file if any of the dependencies has to be compiled
+      if source.toBeCompiled:
+        self.toBeCompiled = True
       
+      # Now that the dependencies of the used module are known, we complete the dependencies list
+      self.dependencies.extend(source.dependencies)
+    
+    # We delete all dependencies that are present several number of times.
+    self.dependencies = list(set(self.dependencies))
+    
+    self.isResolved = True
+  
+  def run(self):
+    """method that launch the compilation of the current source file, and wait for its end. The dependencies must have 
+    been compiled before. The duration of the compilation, its return code and the size of its outputs are stored in 
+    self.wallTime, self.returnCode and self.outputSize.
+    
+    Return : a tuple (returnCode, process_stdout, process_stderr)
+    """
+    
+    commande = self.getCommand()
+    if self.isProgram:
+      print(commande)
+    
+    self.worker = threading.current_thread().name
+    self.startTime = time.time()
+    process = subprocess.Popen(commande, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
+    (process_stdout, process_stderr) = process.communicate()
+    returnCode = process.poll()
+    self.wallTime = time.time() - self.startTime
+    self.returnCode = returnCode
+    self.outputSize = len(process_stdout) + len(process_stderr)
+    
+    return (returnCode, process_stdout, process_stderr)
+  
+  def ended(self, returnCode, process_stderr):
+    """method that set the current source file as compiled and, if the compilation failed, write the errors in a log file
+    
+    Parameters : 
+    returnCode : the return code of the compiler
+    process_stderr : the error output of the compiler
+    
+    Return : True if the compilation succeeded, False otherwise
+    """
+    
+    self.isCompiled = True
+    
+    # If returnCode is not 0, then there was a problem
+    if (returnCode==0):
+      if (sourceFile.cache != None):
+        sourceFile.cache.store(self, self.cacheKey)
+      return True
+    
+    logname = "compiling_"+self.filename+".log"
+    
+    # We write compilation errors in the following file.
+    f = open(logname,'w')
+    f.write(process_stderr)
+    f.close()
+    
+    print("Compilation error, see '"+logname+"'")
+    
+    return False
+  
+  def compile(self, parent_dependencies=[]):
+    """method that check dependencies and try to compile. The dependencies are compiled one after the other, before 
+    the current file (see compile_sources() to compile independent files at the same time)
+    
+    Parameter : 
+    parent_dependencies=[] : list that store all the parent dependencies of the current file, namely, all the module 
+    that MUST NOT be used inside the current module, else we will have an infinite loop.
+    
+    Beware, there MUST NOT be inter dependant modules.
+    """
+    
+    self.resolve(parent_dependencies)
+    
+    if not(self.isCompiled):
       # For each object, we compile it if it's not already the case.
-      for source in module_sources:
-        # We must launch source.compile() even if the file will not be compilated, just to get the right dependencies.
+      for source in self.getModuleSources():
         if not(source.isCompiled):
-          # the list() is here to ensure not to have a pointer and share the list. If not, the list of parent_dependencies will 
-          # not be correct and contains all the previous parent dependencies. 
-          source.compile(list(parent_dependencies)) 
-          
-          # We compile the current file if any of the dependencies has been effectively compiled
-          if source.toBeCompiled:
-            self.toBeCompiled = True
-          
-      # We complete the dependencies list now that all used modules
-      # have been compiled, they must have a complete list of 
-      # their own dependencies.
-      for source in module_sources:
-        self.dependencies.extend(source.dependencies)
-        
-      # We delete all dependencies that are present several number of times.
-      self.dependencies = list(set(self.dependencies))
+          source.compile()
       
-      if self.toBeCompiled:
+      if self.needsCompilation():
         # Now that all the dependencies have been compiled, we compile 
         # the current source file.
-        options = sourceFile.OPTIONS
-        if (sourceFile.isDebug):
-          options += " "+sourceFile.DEBUG
-        
-        if (sourceFile.isGDB or sourceFile.isProfiling):
-          options += " "+sourceFile.GDB
-        
-        if (sourceFile.isProfiling):
-          # We deactivate all other options except GDB => not True anymore
-          options += " "+" -pg"
-          
-        if not(self.isProgram):
-          commande = sourceFile.COMPILATOR+" "+options+" -c "+self.filename
-        else:
-          commande = sourceFile.COMPILATOR+" "+options+" -o "+self.name+" "+self.filename+" "+" ".join(self.dependencies)
-          print(commande)
-        
-        process = subprocess.Popen(commande, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-
-        (process_stdout, process_stderr) = process.communicate()
-        
         print("Compiling "+self.filename+"...")
-        returnCode = process.poll()
-      
-        self.isCompiled = True
-      
-        # If returnCode is not 0, then there was a problem
-        if (returnCode==0):
-          return process_stderr
-        else:        
-          logname = "compiling_"+self.filename+".log"
-
-          # We write compilation errors in the following file.
-          f = open(logname,'w')
-          f.write(process_stderr)
-          f.close()
-          
-          print("Compilation error, see '"+logname+"'")
+        (returnCode, process_stdout, process_stderr) = self.run()
+        
+        if not(self.ended(returnCode, process_stderr)):
           sys.exit(1)
         
-      self.isCompiled = True
+        return process_stderr
       
+      self.isCompiled = True
+  
   def __str__(self):
     """overload the str method. As a consequence, you can print the object via print name_instance
 
@@ -718,8 +1428,13 @@ if __name__ == '__main__':
 
   sources_filename = lister("*.f90")
   
+  # The number of files compiled at the same time can be given with '-j N'
+  nb_workers = 1
+  if ("-j" in sys.argv):
+    nb_workers = int(sys.argv[sys.argv.index("-j") + 1])
+  
   # We create the binaries
-  make_binaries(["maintest.f90"])
+  make_binaries(sources_filename, ["maintest.f90"], nb_workers=nb_workers)
 
 
 # LOG
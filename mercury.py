@@ -10,10 +10,40 @@ __version__ = "2.2.2"
 from autiwa import AutiwaObject  # We only import what interests us.
 from simulations_utilities import number_fill
 import os
+import re
+import numpy as np
+import orbital_elements
+from constants import G0
 import pdb # usefull to debug with pdb.set_trace()
 
 AN = 365.25  # nombre de jours dans un an, c'est plus simple ensuite pour calculer T
 
+def openOutput(target, filename):
+  """function that open a parameter file for writing
+  
+  Parameters :
+  target : None (the file is created in the current working directory), a directory (the file is created in it), 
+           the path of the file, or a file object (returned as is)
+  filename : the default name of the file, used when 'target' is None or a directory
+  
+  Return : a file object
+  """
+  
+  if (target == None):
+    return open(filename, 'w')
+  elif hasattr(target, "write"):
+    return target
+  elif os.path.isdir(target):
+    return open(os.path.join(target, filename), 'w')
+  else:
+    return open(target, 'w')
+
+def closeOutput(output, target):
+  """function that close a file opened by openOutput(), except if the file object was given by the user"""
+  
+  if not(hasattr(target, "write")):
+    output.close()
+
 class Body(AutiwaObject):
   """
   class that define a planet and his characteristics. This is a meta class, used by BodyAst, BodyCom and BodyCart
@@ -371,6 +401,318 @@ class BodyCart(Body):
     
     (self.x, self.y, self.z, self.vx, self.vy, self.vz, self.sx, self.sy, self.sz) = map(float, elements)
 
+class BodyView(object):
+  """Mixin class for bodies that are stored in a 'BodyTable'. The object do not store anything, every attribute 
+  (name, m, a, x, sx, ...) is read from and written in the columns of the table, so that an object behave exactly 
+  like a 'BodyAst', 'BodyCom' or 'BodyCart' (print, format(), get_info(), ...) without duplicating the data.
+  
+  Views are created by 'BodyTable', you should not create them yourself.
+  """
+  
+  def __init__(self, table, index):
+    """We do not call Body.__init__ because it would increment the counters of bodies"""
+    
+    object.__setattr__(self, "_table", table)
+    object.__setattr__(self, "_index", index)
+  
+  def __getattr__(self, name):
+    """called only when the attribute is not found in the class, i.e for all the properties of the body"""
+    
+    if (name in ("_table", "_index")):
+      raise AttributeError(name)
+    
+    return self._table.get(self._index, name)
+  
+  def __setattr__(self, name, value):
+    """The properties of the body are written in the table"""
+    
+    self._table.set(self._index, name, value)
+
+class BodyAstView(BodyView, BodyAst):
+  """A 'BodyAst' whose data are stored in a 'BodyTable'"""
+
+class BodyComView(BodyView, BodyCom):
+  """A 'BodyCom' whose data are stored in a 'BodyTable'"""
+
+class BodyCartView(BodyView, BodyCart):
+  """A 'BodyCart' whose data are stored in a 'BodyTable'"""
+
+class BodyTable(object):
+  """class that store bodies of the same type (big or small) and the same style (Asteroidal, Cometary or Cartesian) 
+  in columns, one numpy array per property. This is much faster than a list of 'Body' objects when there is a lot 
+  of bodies (debris disks for instance). 
+  
+  The table behave like a list of bodies : len(), iteration, indexing and append() are possible. The objects 
+  returned are views (see 'BodyView') that read and write directly in the columns.
+  
+  Parameters :
+  type : either "big" or "small"
+  style="Asteroidal" : (Asteroidal, Cometary, Cartesian) the style of coordinates
+  names=None : list of the names of the bodies. If none is given, default names are generated, like for 'Body' objects
+  **columns : numpy arrays (or lists, or floats) for each property (a, e, I, g, n, M for Asteroidal, q, e, I, g, n, T 
+              for Cometary, x, y, z, vx, vy, vz for Cartesian, and sx, sy, sz, m, r, d, a1, a2, a3, ep for all the styles).
+              Coordinates and spins are 0 by default. Optional parameters (m, r, d, a1, a2, a3, ep) are stored as NaN 
+              when they are not defined (i.e None for 'Body' objects)
+  
+  Example :
+  disk = BodyTable("small", a=np.linspace(1, 2, 100000), e=0.01, I=0.5)
+  """
+  
+  COORDINATES = {"Asteroidal":("a", "e", "I", "g", "n", "M"), 
+                 "Cometary":("q", "e", "I", "g", "n", "T"), 
+                 "Cartesian":("x", "y", "z", "vx", "vy", "vz")}
+  SPINS = ("sx", "sy", "sz")
+  OPTIONALS = ("m", "r", "d", "a1", "a2", "a3", "ep")
+  VIEWS = {"Asteroidal":BodyAstView, "Cometary":BodyComView, "Cartesian":BodyCartView}
+  
+  def __init__(self, type, style="Asteroidal", names=None, **columns):
+    """Initialisation of the object"""
+    
+    if (type not in ("big", "small")):
+      raise TypeError("the current type does not exist, you must specify either 'big' or 'small'")
+    if (style not in BodyTable.COORDINATES):
+      raise ValueError("the style of coordinate do not match with anything : "+str(style))
+    
+    self.type = type
+    self.style = style
+    self.fields = BodyTable.COORDINATES[style] + BodyTable.SPINS + BodyTable.OPTIONALS
+    
+    for key in columns:
+      if (key not in self.fields):
+        raise ValueError("'"+key+"' is not a property of a body in "+style+" coordinates")
+    
+    # We get the number of bodies from the names or the longest column
+    if (names is not None):
+      nb_bodies = len(names)
+    else:
+      nb_bodies = max([np.size(value) for value in columns.values()] + [0])
+    
+    self.columns = {}
+    for field in self.fields:
+      if (field in BodyTable.OPTIONALS):
+        default = np.nan
+      else:
+        default = 0.
+      value = columns.get(field, default)
+      if (value is None):
+        value = np.nan
+      self.columns[field] = np.array(np.broadcast_to(np.asarray(value, dtype=np.float64), (nb_bodies,)))
+    
+    # Only small bodies can have an epoch
+    if (self.type == "big"):
+      self.columns["ep"][:] = np.nan
+    
+    if (names is None):
+      names = self.__defaultNames(nb_bodies)
+    self.names = list(names)
+  
+  def __defaultNames(self, nb_bodies):
+    """Return 'nb_bodies' default names, following the counters of the 'Body' class, as if we had created 
+    'nb_bodies' objects of type 'Body'"""
+    
+    if (self.type == "small"):
+      start = Body.NB_SMALL
+      Body.NB_SMALL += nb_bodies
+      prefix = Body.SMALL_PREFIX
+    else:
+      start = Body.NB_BIG
+      Body.NB_BIG += nb_bodies
+      prefix = Body.BIG_PREFIX
+    
+    # More than 4 digits are needed beyond 9999 bodies
+    fill = max(4, len(str(start + nb_bodies)))
+    
+    return [prefix+number_fill(index, fill) for index in range(start + 1, start + nb_bodies + 1)]
+  
+  @classmethod
+  def fromBodies(cls, bodies, type=None):
+    """Create a table from a list of 'BodyAst', 'BodyCom' or 'BodyCart' objects. They must all have the same type 
+    and style.
+    
+    Parameters :
+    bodies : a list of 'Body' objects
+    type=None : the type of the bodies, only needed if 'bodies' is empty
+    """
+    
+    if (len(bodies) == 0):
+      if (type == None):
+        raise ValueError("The type of the bodies must be given for an empty list")
+      return cls(type)
+    
+    type = bodies[0].type
+    style = bodies[0].style
+    for body in bodies:
+      if ((body.style != style) or (body.type != type)):
+        raise ValueError("style of this object:"+str(body)+" is different from the expected one ("+style+")")
+    
+    table = cls(type, style, names=[body.name for body in bodies])
+    for field in table.fields:
+      column = [getattr(body, field) for body in bodies]
+      table.columns[field] = np.array([np.nan if (value == None) else value for value in column], dtype=np.float64)
+    
+    return table
+  
+  def __len__(self):
+    return len(self.names)
+  
+  def __getitem__(self, index):
+    """Return a view of the body 'index' (negative indexes are allowed)"""
+    
+    if (index < 0):
+      index += len(self)
+    if not(0 <= index < len(self)):
+      raise IndexError("body index out of range")
+    
+    return BodyTable.VIEWS[self.style](self, index)
+  
+  def __iter__(self):
+    for index in range(len(self)):
+      yield BodyTable.VIEWS[self.style](self, index)
+  
+  def get(self, index, name):
+    """Return the property 'name' of the body 'index', as it would be stored in a 'Body' object (i.e None for an 
+    undefined optional parameter)"""
+    
+    if (name == "name"):
+      return self.names[index]
+    elif (name in ("type", "style")):
+      return getattr(self, name)
+    elif (name == "isEPOCH"):
+      return not(np.isnan(self.columns["ep"][index]))
+    elif (name in self.columns):
+      value = float(self.columns[name][index])
+      if ((name in BodyTable.OPTIONALS) and np.isnan(value)):
+        return None
+      return value
+    else:
+      raise AttributeError("'"+self.style+"' bodies have no attribute '"+name+"'")
+  
+  def set(self, index, name, value):
+    """Set the property 'name' of the body 'index'"""
+    
+    if (name == "name"):
+      self.names[index] = value
+    elif (name == "isEPOCH"):
+      # The epoch is defined if and only if 'ep' is not NaN, this flag is always deduced from 'ep'
+      pass
+    elif (name in ("type", "style")):
+      if (value != getattr(self, name)):
+        raise ValueError("The "+name+" of a body in a table can not be changed")
+    elif (name in self.columns):
+      if (value == None):
+        value = np.nan
+      self.columns[name][index] = value
+    else:
+      raise AttributeError("'"+self.style+"' bodies have no attribute '"+name+"'")
+  
+  def append(self, *bodies):
+    """Add one or several 'Body' objects at the end of the table. They must have the same type and style than the table"""
+    
+    if (len(bodies) == 0):
+      return
+    
+    new = BodyTable.fromBodies(list(bodies))
+    if ((new.type != self.type) or ((new.style != self.style) and (len(self) > 0))):
+      raise ValueError("The bodies must be of type '"+self.type+"' and style '"+self.style+"'")
+    
+    if (len(self) == 0):
+      self.style = new.style
+      self.fields = new.fields
+      self.columns = new.columns
+    else:
+      for field in self.fields:
+        self.columns[field] = np.concatenate((self.columns[field], new.columns[field]))
+    self.names.extend(new.names)
+  
+  def format(self):
+    """method that return a formatted output of all the bodies of the table, usefull to write them in a file 
+    (either big.in or small.in). The result is the same as the concatenation of the format() of each body of the 
+    table, but each column is converted in one pass. As all the values are stored as floats, they are written as 
+    floats ('0.0' for a body created with an integer 0, where the format() of the 'Body' object would give '0'). 
+    mercury read the numbers in free format, so both are the same for it.
+    
+    return : a string that represent the properties of the bodies and that fit requirements for mercury
+    """
+    
+    if (len(self) == 0):
+      return ""
+    
+    # First line : the name and the optional parameters that are defined
+    first_lines = list(self.names)
+    for (field, key) in zip(BodyTable.OPTIONALS, ("m", "r", "d", "a1", "a2", "a3", "Ep")):
+      column = self.columns[field]
+      isDefined = ~np.isnan(column)
+      if not(isDefined.any()):
+        continue
+      
+      prefix = " "+key+"="
+      first_lines = [line + prefix + value if defined else line 
+                     for (line, value, defined) in zip(first_lines, map(str, column.tolist()), isDefined.tolist())]
+    
+    # The coordinates and the spin are on one line, except for cartesian coordinates (position, velocity and spin on 3 lines)
+    if (self.style == "Cartesian"):
+      groups = ((0, 3), (3, 6), (6, 9))
+    else:
+      groups = ((0, 9),)
+    
+    values = zip(*[map(str, self.columns[field].tolist()) for field in BodyTable.COORDINATES[self.style] + BodyTable.SPINS])
+    
+    texte = []
+    for (line, row) in zip(first_lines, values):
+      texte.append(line)
+      texte.append("\n")
+      for (start, stop) in groups:
+        texte.append(" ".join(row[start:stop]))
+        texte.append("\n")
+    
+    return "".join(texte)
+  
+  def convert(self, style, m_star=1.0, epoch=0.):
+    """Return a new table with the coordinates of the bodies converted in another style. All the bodies are 
+    converted at the same time (see orbital_elements.convert()).
+    
+    Parameters :
+    style : (Asteroidal, Cometary, Cartesian) the style of coordinates wanted
+    m_star=1.0 : the mass of the central body (in solar mass)
+    epoch=0. : the epoch of the coordinates (in days). For small bodies, their own epoch is used if it is defined
+    
+    Return : a 'BodyTable' object (the table itself if it is already in the right style)
+    """
+    
+    if (style == self.style):
+      return self
+    
+    mu = G0 * (m_star + np.nan_to_num(self.columns["m"]))
+    epochs = np.where(np.isnan(self.columns["ep"]), epoch, self.columns["ep"])
+    
+    values = orbital_elements.convert([self.columns[field] for field in BodyTable.COORDINATES[self.style]], 
+                                      self.style, style, mu, epochs)
+    
+    columns = dict(zip(BodyTable.COORDINATES[style], values))
+    for field in BodyTable.SPINS + BodyTable.OPTIONALS:
+      columns[field] = self.columns[field].copy()
+    
+    return BodyTable(self.type, style, names=list(self.names), **columns)
+  
+  def isValid(self):
+    """Test (in a vectorized way) if the bodies of the table are valid. All the columns must have the same length 
+    and if an epoch is defined, all the small bodies must have the same epoch.
+    
+    Return : True if the table is valid, False otherwise
+    """
+    
+    for field in self.fields:
+      if (len(self.columns[field]) != len(self.names)):
+        return False
+    
+    ep = self.columns["ep"]
+    isEPOCH = ~np.isnan(ep)
+    if isEPOCH.any():
+      if not(isEPOCH.all() and (ep == ep[0]).all()):
+        return False
+    
+    return True
+
 class PlanetarySystem(AutiwaObject):
   """
   class that define a planetary system, i.e orbitals elements of each member of the system. For each parameters we can give a list of values that represent the planets or a tuple that give the minimum and maximum values for random generation of the parameters. In addition, you may set the nb_planets parameter. If none is given it will be assumed to be the length of the longest list. If no list is given, you must give in addition the number of planets by setting nb_planets. The nb_planets is defined in init only. By set_X, you can only set list that have the same size. 
@@ -442,7 +784,7 @@ class PlanetarySystem(AutiwaObject):
           isEPOCH = True
       
       if isEPOCH:
-        ep = self.small[0]
+        ep = self.small[0].ep
         for body in self.small:
           if (body.ep != ep):
             return False
@@ -512,12 +854,256 @@ class PlanetarySystem(AutiwaObject):
       else:
         Warning("The type of "+str(body)+" is incorrect")
 
+class ArrayPlanetarySystem(PlanetarySystem):
+  """
+  class that define a planetary system whose bodies are stored in columns (see 'BodyTable'). It can be used everywhere 
+  a 'PlanetarySystem' is expected ('Big', 'Small', ...). self.big and self.small are 'BodyTable' objects, that behave 
+  like lists of bodies, but the validity test and the bulk operations are vectorized.
+  
+  Parameters
+  big=None : a 'BodyTable' object of type "big" (an empty table in Asteroidal coordinates by default)
+  small=None : a 'BodyTable' object of type "small" (an empty table in Asteroidal coordinates by default)
+  m_star : the mass of the central body in solar mass
+  epoch : epoch of start of integration in days
+  
+  Example :
+  disk = BodyTable("small", a=np.random.uniform(1., 10., 100000), m=0.)
+  system = ArrayPlanetarySystem(big=BodyTable.fromBodies(planets), small=disk)
+  """
+  
+  def __init__(self, big=None, small=None, m_star=1.0, epoch=0):
+    """Initialisation of the object"""
+    
+    AutiwaObject.__init__(self)
+    
+    if (big == None):
+      big = BodyTable("big")
+    if (small == None):
+      small = BodyTable("small")
+    
+    if ((big.type != "big") or (small.type != "small")):
+      raise TypeError("'big' and 'small' must be 'BodyTable' objects of type 'big' and 'small' respectively")
+    
+    self.big = big
+    self.small = small
+    
+    if not(self.__nonzero__()):
+      Warning("The system is not valid")
+    
+    self.m_star = m_star
+    self.epoch = epoch
+  
+  @classmethod
+  def fromSystem(cls, system):
+    """Return an 'ArrayPlanetarySystem' equivalent to the 'PlanetarySystem' given in parameter"""
+    
+    return cls(big=BodyTable.fromBodies(system.big, type="big"), 
+               small=BodyTable.fromBodies(system.small, type="small"), 
+               m_star=system.m_star, epoch=system.epoch)
+  
+  @property
+  def BigStyle(self):
+    return self.big.style
+  
+  @property
+  def SmallStyle(self):
+    return self.small.style
+  
+  def __nonzero__(self):
+    """method that test if the planetary system is valid. This method is called when you use bool(instance)
+    
+    Parameters : None
+    
+    Return : True if the system is valid. Return False if not. 
+    """
+    
+    return (self.big.isValid() and self.small.isValid())
+  
+  __bool__ = __nonzero__
+
+def convertBodies(bodies, style, m_star=1.0, epoch=0.):
+  """function that convert the coordinates of bodies in a given style. The bodies can have different styles, each 
+  style is converted in bulk.
+  
+  Parameters :
+  bodies : a list of 'Body' objects (of the same type), or a 'BodyTable' object
+  style : (Asteroidal, Cometary, Cartesian) the style of coordinates wanted
+  m_star=1.0 : the mass of the central body (in solar mass)
+  epoch=0. : the epoch of the coordinates (in days). For small bodies, their own epoch is used if it is defined
+  
+  Return : a 'BodyTable' object, in the same order than 'bodies' ('bodies' itself if there is nothing to convert)
+  """
+  
+  if isinstance(bodies, BodyTable):
+    return bodies.convert(style, m_star=m_star, epoch=epoch)
+  
+  # The 'Body' objects are kept when they are already in the right style, so that they are written exactly as 
+  # before (a table store all the values as floats, an integer 0 would be written '0.0')
+  if (len([body for body in bodies if (body.style != style)]) == 0):
+    return bodies
+  
+  # We separate the bodies by style
+  indexes = {}
+  for (index, body) in enumerate(bodies):
+    indexes.setdefault(body.style, []).append(index)
+  
+  converted = BodyTable(bodies[0].type, style, names=[None] * len(bodies))
+  for (body_style, index) in indexes.items():
+    table = BodyTable.fromBodies([bodies[i] for i in index]).convert(style, m_star=m_star, epoch=epoch)
+    for field in converted.fields:
+      converted.columns[field][index] = table.columns[field]
+    for (i, name) in zip(index, table.names):
+      converted.names[i] = name
+  
+  return converted
+
+def formatBodies(bodies):
+  """function that return the formatted output of a list of bodies, as written in big.in or small.in
+  
+  Parameters :
+  bodies : a list of 'Body' objects, or a 'BodyTable' object (in that case, the bodies are formatted column by column)
+  
+  Return : a string, equal to the concatenation of the format() of each body
+  """
+  
+  if isinstance(bodies, BodyTable):
+    return bodies.format()
+  else:
+    return "".join([body.format() for body in bodies])
+
+class BodyReader(object):
+  """class that read a 'big.in' or a 'small.in' file in a single pass, without loading the whole file in memory. 
+  The header (style and epoch) is read when the object is created, then the bodies are read one by one when we 
+  iterate over the object.
+  
+  Parameters :
+  filename : the name of the file to read ('big.in' or 'small.in')
+  type : the type of the bodies, either "big" or "small". Only 'big.in' has an epoch in its header
+  
+  Attributes :
+  self.style : the style of coordinates (Asteroidal, Cometary or Cartesian)
+  self.epoch : the epoch of the big bodies (in days), None for small bodies
+  
+  Example :
+  reader = BodyReader("small.in", "small")
+  for body in reader.bodies():
+    print(body)
+  """
+  
+  # Optional parameters of the first line of a body, as 'm=1e-3'
+  KEYWORD = re.compile(r"(\w+)=(\S+)")
+  # Position of each keyword in the list of optional parameters
+  OPTIONAL_INDEX = dict([(key, index) for (index, key) in enumerate(BodyTable.OPTIONALS)])
+  # Number of values (coordinates and spin) that follow the first line of each body
+  NB_VALUES = 9
+  CLASSES = {"Asteroidal":BodyAst, "Cometary":BodyCom, "Cartesian":BodyCart}
+  
+  def __init__(self, filename, type):
+    """We open the file and read the header"""
+    
+    if (type not in ("big", "small")):
+      raise TypeError("the current type does not exist, you must specify either 'big' or 'small'")
+    
+    self.filename = filename
+    self.type = type
+    self.__input = open(filename, 'r')
+    self.__lines = self.__dataLines()
+    
+    self.style = self.__headerValue("style")
+    if (self.style not in BodyReader.CLASSES):
+      raise ValueError("the style of coordinate do not match with anything : "+self.style)
+    
+    if (self.type == "big"):
+      self.epoch = float(self.__headerValue("epoch"))
+    else:
+      self.epoch = None
+  
+  def __dataLines(self):
+    """generator that yield the lines of the file that are neither comments nor empty"""
+    
+    for line in self.__input:
+      if ((line[0] != ")") and line.strip()):
+        yield line
+    self.__input.close()
+  
+  def __headerValue(self, name):
+    """Read the next line of the file, that must be of the form 'name (comments) = value' and return 'value'"""
+    
+    try:
+      line = next(self.__lines)
+    except StopIteration:
+      raise TypeError("'"+name+"' parameter expected at the end of '"+self.filename+"'")
+    
+    (key, sep, value) = line.partition("=")
+    if (key.count(name) == 0):
+      raise TypeError("'"+name+"' parameter expected at this line")
+    
+    return value.split()[0]
+  
+  def __iter__(self):
+    """generator that yield, for each body, a tuple (name, optionals, values) where 'optionals' is the list of the 
+    optional parameters (m, r, d, a1, a2, a3, ep, None if not defined) and 'values' the list of the 9 coordinates 
+    and spin components. The values of a body can be split over several lines."""
+    
+    for line in self.__lines:
+      tokens = line.split(None, 1)
+      name = tokens[0]
+      optionals = [None] * len(BodyTable.OPTIONALS)
+      if (len(tokens) > 1):
+        for (key, value) in BodyReader.KEYWORD.findall(tokens[1]):
+          index = BodyReader.OPTIONAL_INDEX.get(key.lower())
+          if (index != None):
+            optionals[index] = float(value)
+      
+      # We append lines until we have the 9 values
+      values = []
+      while (len(values) < BodyReader.NB_VALUES):
+        try:
+          values.extend([float(value) for value in next(self.__lines).split()])
+        except StopIteration:
+          raise ValueError("'"+self.filename+"' ends before all the coordinates of '"+name+"' are read")
+      
+      yield (name, optionals, values)
+  
+  def bodies(self):
+    """generator that yield the bodies of the file, as 'BodyAst', 'BodyCom' or 'BodyCart' objects"""
+    
+    body_class = BodyReader.CLASSES[self.style]
+    for (name, (m, r, d, a1, a2, a3, ep), values) in self:
+      (sx, sy, sz) = values[6:9]
+      yield body_class(self.type, *values[0:6], sx=sx, sy=sy, sz=sz, name=name, m=m, r=r, d=d, a1=a1, a2=a2, a3=a3, ep=ep)
+  
+  def table(self):
+    """Read all the bodies of the file and return them in a 'BodyTable' object. No 'Body' object is created."""
+    
+    names = []
+    optionals = []
+    values = []
+    for (name, optional, value) in self:
+      names.append(name)
+      optionals.append(optional)
+      values.append(value)
+    
+    columns = {}
+    fields = BodyTable.COORDINATES[self.style] + BodyTable.SPINS
+    if (len(names) > 0):
+      values = np.array(values, dtype=np.float64)
+      optionals = np.array(optionals, dtype=np.float64) # None are converted into NaN
+      for (index, field) in enumerate(fields):
+        columns[field] = values[:, index]
+      for (index, field) in enumerate(BodyTable.OPTIONALS):
+        columns[field] = optionals[:, index]
+    
+    return BodyTable(self.type, self.style, names=names, **columns)
+
 class Big(object):
   """class that define an object equivalent to big.in, a parameter file of a mercury simulation. 
   If nothing is given, an empty object and planetary system is created.
   
   Parameters:
   system : an object of type 'PlanetarySystem'
+  style=None : (Asteroidal, Cometary, Cartesian) the style of coordinates of the file. By default, the style of the 
+               big bodies is used. Else, the bodies are converted in bulk (even if they have different styles)
   """
   
   BIG_START = ")O+_06 Big-body initial data  (WARNING: Do not delete this line!!)\n" + \
@@ -525,9 +1111,11 @@ class Big(object):
         ")---------------------------------------------------------------------\n"
   BIG_INT = ")---------------------------------------------------------------------\n"
   
-  def __init__(self, system=None):
+  def __init__(self, system=None, style=None):
+    
+    self.style = style
     
-    if (type(system) == PlanetarySystem):
+    if isinstance(system, PlanetarySystem):
       self.system = system
     elif (system == None):
       self.system = PlanetarySystem()
@@ -536,102 +1124,60 @@ class Big(object):
       
     
     
-  def write(self):
-    """write all the data in a file named 'big.in' in the current working directory"""
+  def write(self, target=None):
+    """write all the data in a file named 'big.in' in the current working directory
+    
+    Parameters :
+    target=None : where to write the file. Either a directory (the file 'big.in' is written in it), a filename or a 
+                  file object (that is not closed). By default, 'big.in' is written in the current working directory
+    """
     
     #########################
     #on crée le fichier et We write the header
     #########################
-    bigin = open('big.in','w')
+    bigin = openOutput(target, 'big.in')
 
-    #on recopie l'entête du fichier type
-    bigin.write(Big.BIG_START)
-    bigin.write(" style (Cartesian, Asteroidal, Cometary) = "+str(self.system.BigStyle)+"\n")
-    bigin.write(" epoch (in days) = "+str(self.system.epoch)+"\n")
-    bigin.write(Big.BIG_INT)
+    # The whole file is formatted in memory and written in one call
+    bigin.write(str(self))
 
-    ##########################
-    # écriture des paramètres orbitaux des planètes
-    ##########################
-    for body in self.system.big:
-      bigin.write(body.format())
-
-    bigin.close()
+    closeOutput(bigin, target)
     
   def __str__(self):
     """to overwrite the str() method"""
     
+    if (self.style == None):
+      style = self.system.BigStyle
+      bodies = self.system.big
+    else:
+      style = self.style
+      bodies = convertBodies(self.system.big, style, m_star=self.system.m_star, epoch=self.system.epoch)
+    
     string = Big.BIG_START
-    string += " style (Cartesian, Asteroidal, Cometary) = "+str(self.system.BigStyle)+"\n"
+    string += " style (Cartesian, Asteroidal, Cometary) = "+str(style)+"\n"
     string += " epoch (in days) = "+str(self.system.epoch)+"\n"
     string += Big.BIG_INT
-    for body in self.system.big:
-      string += body.format()
+    string += formatBodies(bodies)
       
     return string
     
-  def read(self):
+  def read(self, columns=False, filename="big.in"):
     """method to read properties from a 'big.in' file in the current working directory
     
     /!\ We cannot set the mass of the star in the planetary system with this method. 
     Since the mass of the star is not used by 'big.in', it is not really important, 
     but it could be if the mass was used somewhere else from the object embedded in the Big object.
-    """
-    
-    bigin = open('big.in','r')
-    
-    lines = []
-    for line in bigin:
-      if (line[0] != ")"):
-        lines.append(line)
-    bigin.close()
     
-    (key, value) = lines[0].split("=")
-    if (key.count("style") > 0):
-      BigStyle = value.split()[0]
-    else:
-      raise TypeError("'style' parameter expected at this line")
-      
-    (key, value) = lines[1].split("=")
-    if (key.count("epoch") > 0):
-      epoch = float(value.split()[0])
-    else:
-      raise TypeError("'epoch' parameter expected at this line")
+    Parameters :
+    columns=False : If True, the bodies are stored in a 'BodyTable' and self.system is an 'ArrayPlanetarySystem'
+    filename="big.in" : the path of the file to read
+    """
     
-    # We delete the two first lines
-    del(lines[0:2])
+    reader = BodyReader(filename, "big")
     
-    if (BigStyle == 'Asteroidal'):
-      body_type = BodyAst
-    elif (BigStyle == 'Cometary'):
-      body_type = BodyCom
-    elif (BigStyle == 'Cartesian'):
-      body_type = BodyCart
+    if columns:
+      self.system = ArrayPlanetarySystem(big=reader.table(), epoch=reader.epoch)
     else:
-      raise ValueError("the style of coordinate do not match with anything : "+BigStyle)
-    
-    # We merge the lines by two because all the informations of one planet are contained in two consecutive lines
-    bodies = []
-    i = 0
-    while (i < len(lines)):
-      line1 = lines[i]
-      
-      i += 1
-      # We append lines while the total number of elements is not 9
-      nb_el = 0
-      els = []
-      while (nb_el < 9):
-        els.extend(lines[i].split())
-        nb_el = len(els)
-        i += 1
-      line2 = " ".join(els)
-      
-      #~ pdb.set_trace()
-      body = body_type("big", 0, 0, 0, 0, 0, 0)
-      body.get_info([line1, line2])
-      bodies.append(body)
-    
-    self.system = PlanetarySystem(bodies=bodies, epoch=epoch)
+      self.system = PlanetarySystem(bodies=list(reader.bodies()), epoch=reader.epoch)
 
 def readBig():
   """function that return an object "Big" by reading a 'big.in' file in the current working directory
@@ -645,6 +1191,8 @@ class Small(object):
   """class that define an object equivalent to small.in, a parameter file of a mercury simulation
   Parameters:
   system : an object of type 'PlanetarySystem'
+  style=None : (Asteroidal, Cometary, Cartesian) the style of coordinates of the file. By default, the style of the 
+               small bodies is used. Else, the bodies are converted in bulk (even if they have different styles)
   """
   
   SMALL_START = ")O+_06 Small-body initial data  (WARNING: Do not delete this line!!)\n" + \
@@ -652,31 +1200,60 @@ class Small(object):
         ")---------------------------------------------------------------------\n"
   SMALL_INT = ")---------------------------------------------------------------------\n"
   
-  def __init__(self, system=None):
+  def __init__(self, system=None, style=None):
     
     self.system = system
+    self.style = style
     
-  def write(self):
-    """write all the data in a file named 'big.in' in the current working directory"""
+  def write(self, target=None):
+    """write all the data in a file named 'small.in' in the current working directory
+    
+    Parameters :
+    target=None : where to write the file. Either a directory (the file 'small.in' is written in it), a filename or a 
+                  file object (that is not closed). By default, 'small.in' is written in the current working directory
+    """
     
     #########################
     #on crée le fichier et We write the header
     #########################
-    smallin = open('small.in','w')
-
-    #on recopie l'entête du fichier type
-    smallin.write(Small.SMALL_START)
-    smallin.write(" style (Cartesian, Asteroidal, Cometary) = "+self.system.SmallStyle+"\n")
-    smallin.write(Small.SMALL_INT)
-    
+    smallin = openOutput(target, 'small.in')
 
-    ##########################
-    # écriture des paramètres orbitaux des planètes/petits corps
-    ##########################
-    for body in self.system.small:
-      smallin.write(body.format())
+    # The whole file is formatted in memory and written in one call
+    smallin.write(str(self))
 
-    smallin.close()
+    closeOutput(smallin, target)
+  
+  def __str__(self):
+    """to overwrite the str() method"""
+    
+    if (self.style == None):
+      style = self.system.SmallStyle
+      bodies = self.system.small
+    else:
+      style = self.style
+      bodies = convertBodies(self.system.small, style, m_star=self.system.m_star, epoch=self.system.epoch)
+    
+    string = Small.SMALL_START
+    string += " style (Cartesian, Asteroidal, Cometary) = "+style+"\n"
+    string += Small.SMALL_INT
+    string += formatBodies(bodies)
+    
+    return string
+  
+  def read(self, columns=False, filename="small.in"):
+    """method to read properties from a 'small.in' file in the current working directory
+    
+    Parameters :
+    columns=False : If True, the bodies are stored in a 'BodyTable' and self.system is an 'ArrayPlanetarySystem'
+    filename="small.in" : the path of the file to read
+    """
+    
+    reader = BodyReader(filename, "small")
+    
+    if columns:
+      self.system = ArrayPlanetarySystem(small=reader.table())
+    else:
+      self.system = PlanetarySystem(bodies=list(reader.bodies()))
 
 class Element(object):
   """class that define an object equivalent to element.in, a parameter file of a mercury simulation
@@ -799,11 +1376,16 @@ class Element(object):
     # if perculiar planets only are used, you must add some lines here to get the 
     # last lines of the parameters array that are not currently stored
   
-  def write(self):
-    """write all the data in a file named 'element.in' in the current working directory"""
+  def write(self, target=None):
+    """write all the data in a file named 'element.in' in the current working directory
+    
+    Parameters :
+    target=None : where to write the file. Either a directory (the file 'element.in' is written in it), a filename or a 
+                  file object (that is not closed). By default, 'element.in' is written in the current working directory
+    """
     
     ## We generate the file "element.in" with values passed in parameter.s.
-    element = open('element.in','w')
+    element = openOutput(target, 'element.in')
     ## We write the header
     element.write(Element.ELEMENT_START)
     ## On écrit dans quel système de coordonnées on veut écrire les données
@@ -820,7 +1402,7 @@ class Element(object):
     element.write(self.format_sortie + "\n")
     ## On écrit la fin du fichier et on le ferme
     element.write(Element.ELEMENT_END)
-    element.close()
+    closeOutput(element, target)
 
 class Param(object):
   """class that define an object equivalent to param.in, a parameter file of a mercury simulation
@@ -1035,9 +1617,10 @@ class Param(object):
     """write all the data in a file named 'param.in' in the current working directory
     
     Parameter
-    filename="param.in" : by default, the name is the regular name. But to continue the integration, we must define the file in param.dmp, so we must be able to specify a filename"""
+    filename="param.in" : by default, the name is the regular name. But to continue the integration, we must define the file in param.dmp, so we must be able to specify a filename. 
+                          It can also be a directory (the file 'param.in' is written in it) or a file object (that is not closed)"""
     
-    param = open(filename,'w')
+    param = openOutput(filename, 'param.in')
     param.write(Param.PARAM_START)
     param.write(" algorithm (MVS, BS, BS2, RADAU, HYBRID etc) = "+self.algorithme+"\n")
     param.write(" start time (days) = "+str(self.start_time)+"\n")
@@ -1068,7 +1651,15 @@ class Param(object):
     param.write(" Hybrid integrator changeover (Hill radii) = "+str(self.changeover)+"\n")
     param.write(" number of timesteps between data dumps = "+str(self.data_dump)+"\n")
     param.write(" number of timesteps between periodic effects = "+str(self.periodic_effect)+"\n")
-    param.close()
+    closeOutput(param, filename)
+
+def readParam(filename="param.in"):
+  """function that return an object "Param" by reading a 'param.in' file (or a 'param.dmp' file) in the current working directory
+  """
+  
+  paramin = Param(algorithme=None, start_time=None, stop_time=None, h=None)
+  paramin.read(filename)
+  return paramin
 
 class Close(object):
   """class that define an object equivalent to element.in, a parameter file of a mercury simulation
@@ -1097,11 +1688,16 @@ class Close(object):
     self.relative_time = relative_time
   
   
-  def write(self):
-    """write all the data in a file named 'element.in' in the current working directory"""
+  def write(self, target=None):
+    """write all the data in a file named 'close.in' in the current working directory
+    
+    Parameters :
+    target=None : where to write the file. Either a directory (the file 'close.in' is written in it), a filename or a 
+                  file object (that is not closed). By default, 'close.in' is written in the current working directory
+    """
     
     ## We generate the file "element.in" with values passed in parameter.s.
-    close = open('close.in','w')
+    close = openOutput(target, 'close.in')
     ## We write the header
     close.write(Close.CLOSE_START)
     ## Dans quel format on veut écrire les temps (jours ou années)
@@ -1110,7 +1706,7 @@ class Close(object):
     close.write(" express time relative to integration start time = "+str(self.relative_time)+"\n")
     ## On écrit la fin du fichier et on le ferme
     close.write(Close.CLOSE_END)
-    close.close()
+    closeOutput(close, target)
 
 class Disk(object):
   """class that define an object equivalent to disk.in, a parameter file of a mercury simulation (implemented by my user_module)
@@ -1397,11 +1993,16 @@ class Disk(object):
     
     self.write()
   
-  def write(self):
-    """write all the data in a file named 'element.in' in the current working directory"""
+  def write(self, target=None):
+    """write all the data in a file named 'disk.in' in the current working directory
+    
+    Parameters :
+    target=None : where to write the file. Either a directory (the file 'disk.in' is written in it), a filename or a 
+                  file object (that is not closed). By default, 'disk.in' is written in the current working directory
+    """
     
     ## We generate the file "disk.in" with values passed in parameter.
-    disk = open('disk.in','w')
+    disk = openOutput(target, 'disk.in')
     ## We write the header
     disk.write(Disk.DISK_START)
     
@@ -1431,7 +2032,7 @@ class Disk(object):
       else:
         disk.write(key+" = "+str(value)+"\n")
     
-    disk.close()
+    closeOutput(disk, target)
 
 
 class Message(object):
@@ -1642,12 +2243,17 @@ class Message(object):
     
     #Nothing to initialize for the moment
   
-  def write(self):
-    """Create the file 'message.in'"""
+  def write(self, target=None):
+    """Create the file 'message.in'
+    
+    Parameters :
+    target=None : where to write the file. Either a directory (the file 'message.in' is written in it), a filename or a 
+                  file object (that is not closed). By default, 'message.in' is written in the current working directory
+    """
     
-    fichier = open("message.in", "w")
+    fichier = openOutput(target, "message.in")
     fichier.write(Message.FILE)
-    fichier.close()
+    closeOutput(fichier, target)
 
 class Files(object):
   """function that creates and write the files.in parameter file, needed by mercury6"""
@@ -1669,11 +2275,16 @@ class Files(object):
     
     # Nothing to initialize for the moment
   
-  def write(self):
-    """Create the file 'files.in'"""
-    fichier = open("files.in", "w")
+  def write(self, target=None):
+    """Create the file 'files.in'
+    
+    Parameters :
+    target=None : where to write the file. Either a directory (the file 'files.in' is written in it), a filename or a 
+                  file object (that is not closed). By default, 'files.in' is written in the current working directory
+    """
+    fichier = openOutput(target, "files.in")
     fichier.write(Files.FILE)
-    fichier.close()
+    closeOutput(fichier, target)
 
 # If we launch the module as a script, we run a series of tests on the defined objects
 if __name__=='__main__':
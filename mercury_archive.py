@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""module that convert the outputs of a finished mercury simulation (the .aei files, ce.out and info.out) in one binary
+file, so that the analysis does not have to read the text files again each time.
+
+There is one dataset per body (a numpy structured array with the fields of the .aei files : time, a, e, i...), and the
+parameters of param.in and element.in are stored as attributes. If h5py is installed, the archive is an HDF5 file whose
+datasets are chunked and compressed, so that only the chunks of the time range we want are read. Else, the archive is
+a compressed numpy .npz file, where each body is decompressed only when it is accessed.
+
+Example :
+archive("simulations/00001_HYBRID")
+simulation = Archive("simulations/00001_HYBRID/simulation.h5")
+data = simulation.read("PLANET1", start=1e5, stop=2e5)
+"""
+
+__author__ = "Autiwa <autiwa@gmail.com>"
+__date__ = "2026-10-18"
+__version__ = "1.0"
+
+import os
+import glob
+import json
+import numpy as np
+from mercury import Element, readParam
+from mercury_output import iter_ce
+from mercury_utilities import read_aei, get_column_position
+
+try:
+  import h5py
+except ImportError:
+  h5py = None
+
+# Name of the archive, without extension, written in the folder of the simulation
+ARCHIVE_NAME = "simulation"
+
+# Number of outputs per chunk in the HDF5 datasets. A chunk is the smallest block read (and decompressed) at once.
+CHUNK_LENGTH = 16384
+
+# Level of the gzip compression in the HDF5 files (from 0 to 9)
+COMPRESSION_LEVEL = 4
+
+# Name of the dataset of the close encounters, and the name of the npz entry where the attributes are stored
+CLOSE_ENCOUNTERS = "close_encounters"
+METADATA = "metadata"
+INFO = "info"
+
+# Fields of the dataset of the close encounters
+CE_DTYPE = np.dtype([("time", np.float64), ("name_i", "S8"), ("name_j", "S8"), ("dmin", np.float64),
+                     ("x_i", np.float64), ("y_i", np.float64), ("z_i", np.float64),
+                     ("vx_i", np.float64), ("vy_i", np.float64), ("vz_i", np.float64),
+                     ("x_j", np.float64), ("y_j", np.float64), ("z_j", np.float64),
+                     ("vx_j", np.float64), ("vy_j", np.float64), ("vz_j", np.float64)])
+
+def _attributes(prefix, parameters):
+  """function that return a dictionnary with the attributes of an object (Param or Element), whose names are prefixed
+  by 'prefix'. Only the numbers and strings are kept (so that they can be stored as HDF5 attributes)"""
+
+  attributes = {}
+  for (key, value) in vars(parameters).items():
+    if isinstance(value, (int, float, str)):
+      attributes[prefix+key] = value
+
+  return attributes
+
+def _read_metadata(folder):
+  """function that return the attributes of the archive : the parameters of param.in and element.in, and the content of info.out"""
+
+  metadata = {}
+
+  paramin = os.path.join(folder, "param.in")
+  if os.path.exists(paramin):
+    metadata.update(_attributes("param.", readParam(paramin)))
+
+  elementin = os.path.join(folder, "element.in")
+  if os.path.exists(elementin):
+    element = Element()
+    element.read(elementin)
+    metadata.update(_attributes("element.", element))
+
+  infoout = os.path.join(folder, "info.out")
+  if os.path.exists(infoout):
+    info_file = open(infoout, 'r')
+    metadata[INFO] = info_file.read()
+    info_file.close()
+
+  return metadata
+
+def _read_close_encounters(folder):
+  """function that return the close encounters of ce.out as a structured array (see CE_DTYPE), None if there is no ce.out"""
+
+  ceout = os.path.join(folder, "ce.out")
+  if not(os.path.exists(ceout)):
+    return None
+
+  encounters = [(time, name_i, name_j, dmin) + tuple(coordinates_i) + tuple(coordinates_j)
+                for (time, name_i, name_j, dmin, coordinates_i, coordinates_j) in iter_ce(ceout)]
+
+  return np.array(encounters, dtype=CE_DTYPE)
+
+def _write_hdf5(filename, bodies, encounters, metadata):
+  """function that write the archive in an HDF5 file (see archive())"""
+
+  archive_file = h5py.File(filename, 'w')
+  try:
+    # The size of the HDF5 attributes is limited, so the content of info.out is stored in a dataset
+    for (key, value) in metadata.items():
+      if (key == INFO):
+        archive_file.create_dataset(INFO, data=value)
+      else:
+        archive_file.attrs[key] = value
+
+    group = archive_file.create_group("bodies")
+    for (name, data) in bodies.items():
+      # h5py refuse a chunk bigger than the dataset, and empty datasets can not be chunked
+      if (len(data) > 0):
+        group.create_dataset(name, data=data, chunks=(min(CHUNK_LENGTH, len(data)),), compression="gzip",
+                             compression_opts=COMPRESSION_LEVEL, shuffle=True)
+      else:
+        group.create_dataset(name, data=data)
+
+    if (encounters is not None):
+      archive_file.create_dataset(CLOSE_ENCOUNTERS, data=encounters)
+  finally:
+    archive_file.close()
+
+def _write_npz(filename, bodies, encounters, metadata):
+  """function that write the archive in a compressed .npz file (see archive())"""
+
+  arrays = {METADATA:np.array(json.dumps(metadata))}
+  for (name, data) in bodies.items():
+    arrays["bodies/"+name] = data
+  if (encounters is not None):
+    arrays[CLOSE_ENCOUNTERS] = encounters
+
+  np.savez_compressed(filename, **arrays)
+
+def archive(folder=".", filename=None, format=None):
+  """function that write all the outputs of a finished simulation in one binary file. The .aei files must be generated
+  first (by element6). The text files are not removed.
+
+  Parameters :
+  folder="." : the folder of the simulation
+  filename=None : the name of the archive. By default, ARCHIVE_NAME in the folder of the simulation, with the extension
+                  of the format ('.h5' or '.npz')
+  format=None : "hdf5" or "npz". By default, "hdf5" if h5py is installed, "npz" otherwise
+
+  Return : the name of the archive
+  """
+
+  if (format == None):
+    if (h5py != None):
+      format = "hdf5"
+    else:
+      format = "npz"
+
+  if (format not in ("hdf5", "npz")):
+    raise ValueError("The format must be 'hdf5' or 'npz' (and not '%s')" % format)
+  if ((format == "hdf5") and (h5py == None)):
+    raise ImportError("h5py is needed to write an HDF5 archive")
+
+  if (filename == None):
+    filename = os.path.join(folder, ARCHIVE_NAME + {"hdf5":".h5", "npz":".npz"}[format])
+
+  metadata = _read_metadata(folder)
+  format_sortie = metadata.get("element.format_sortie", None)
+
+  # The position of the columns are the same in all the .aei files of a simulation
+  bodies = {}
+  marks = None
+  for aei_file in sorted(glob.glob(os.path.join(folder, "*.aei"))):
+    if (marks == None):
+      marks = get_column_position(aei_file)
+    name = os.path.splitext(os.path.basename(aei_file))[0]
+    # We copy the data in memory, because the file is memory-mapped
+    bodies[name] = np.array(read_aei(aei_file, marks=marks, format_sortie=format_sortie))
+
+  encounters = _read_close_encounters(folder)
+
+  if (format == "hdf5"):
+    _write_hdf5(filename, bodies, encounters, metadata)
+  else:
+    _write_npz(filename, bodies, encounters, metadata)
+
+  return filename
+
+class Archive(object):
+  """class that read an archive written by archive(). The format (HDF5 or npz) is determined from the extension of the file.
+
+  Parameters :
+  filename : the name of the archive
+
+  Attributes :
+  self.bodies : the sorted list of the names of the bodies
+  self.attrs : dictionnary of the attributes of the archive (parameters of param.in prefixed by 'param.', those of
+               element.in prefixed by 'element.', and the content of info.out in 'info')
+
+  Example :
+  simulation = Archive("simulation.h5")
+  for name in simulation.bodies:
+    data = simulation.read(name, start=0., stop=1e6)
+    print(data['a'].mean())
+  simulation.close()
+  """
+
+  def __init__(self, filename):
+    """Initialisation of the object"""
+
+    self.filename = filename
+    self.isHDF5 = (os.path.splitext(filename)[1] != ".npz")
+
+    if self.isHDF5:
+      if (h5py == None):
+        raise ImportError("h5py is needed to read an HDF5 archive")
+      self.__file = h5py.File(filename, 'r')
+      self.bodies = sorted(self.__file["bodies"].keys())
+      self.attrs = dict(self.__file.attrs.items())
+      if (INFO in self.__file):
+        self.attrs[INFO] = self.__file[INFO][()]
+    else:
+      # The arrays of a npz file are only read when they are accessed
+      self.__file = np.load(filename)
+      self.bodies = sorted([key[len("bodies/"):] for key in self.__file.files if key.startswith("bodies/")])
+      self.attrs = json.loads(str(self.__file[METADATA]))
+
+    # The times of each body, that we keep to find quickly the indexes of a time range
+    self.__times = {}
+    # The arrays of the bodies already decompressed (npz files only)
+    self.__arrays = {}
+
+  def __dataset(self, name):
+    """Return the dataset of a body (an HDF5 dataset, read only when sliced, or a numpy array for npz files)"""
+
+    if (name not in self.bodies):
+      raise KeyError("There is no body '%s' in the archive '%s'" % (name, self.filename))
+
+    if self.isHDF5:
+      return self.__file["bodies"][name]
+
+    # A npz entry is decompressed each time it is accessed, so we keep it
+    if not(name in self.__arrays):
+      self.__arrays[name] = self.__file["bodies/"+name]
+    return self.__arrays[name]
+
+  def times(self, name):
+    """Return the times of the outputs of a body
+
+    Parameters :
+    name : the name of the body
+    """
+
+    if self.isHDF5:
+      if not(name in self.__times):
+        self.__times[name] = self.__dataset(name)["time"]
+      return self.__times[name]
+
+    return self.__dataset(name)["time"]
+
+  def read(self, name, start=None, stop=None):
+    """Return the outputs of a body between two times, as a numpy structured array (see mercury_utilities.read_aei())
+
+    Parameters :
+    name : the name of the body
+    start=None : the first time we want (the beginning of the simulation by default)
+    stop=None : the last time we want (included, the end of the simulation by default)
+    """
+
+    times = self.times(name)
+
+    if (start == None):
+      first = 0
+    else:
+      first = np.searchsorted(times, start, side='left')
+    if (stop == None):
+      last = len(times)
+    else:
+      last = np.searchsorted(times, stop, side='right')
+
+    return self.__dataset(name)[first:last]
+
+  def __getitem__(self, name):
+    """Return all the outputs of a body"""
+
+    return self.read(name)
+
+  def closeEncounters(self):
+    """Return the close encounters of the simulation (see CE_DTYPE), None if ce.out did not exist"""
+
+    if self.isHDF5:
+      if (CLOSE_ENCOUNTERS in self.__file):
+        return self.__file[CLOSE_ENCOUNTERS][:]
+    elif (CLOSE_ENCOUNTERS in self.__file.files):
+      return self.__file[CLOSE_ENCOUNTERS]
+
+    return None
+
+  def close(self):
+    """Close the archive"""
+
+    self.__file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, type, value, traceback):
+    self.close()
+
+if __name__ == '__main__':
+  import sys
+
+  # We archive the simulation whose folder is given in argument (the current one by default)
+  if (len(sys.argv) > 1):
+    folder = sys.argv[1]
+  else:
+    folder = "."
+
+  filename = archive(folder)
+  simulation = Archive(filename)
+  for name in simulation.bodies:
+    data = simulation[name]
+    print("%s : %d outputs from %g to %g" % (name, len(data), data["time"][0], data["time"][-1]))
+  simulation.close()
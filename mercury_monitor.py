@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""module that follow the progress of running mercury simulations. The output files (xv.out and info.out) are read
+incrementally : for each file, we remember the position (in bytes) where we stopped reading, and only the bytes
+appended since the last poll are read. The start and stop time of the integration are read in param.in, so that we
+can compute the fraction of the integration already done and the remaining time.
+
+Several hundreds of simulations can be followed at the same time with 'MetaMonitor', that search all the
+simulation folders under a given directory (LOCATION_DATASIMU for instance)."""
+
+__author__ = "Autiwa <autiwa@gmail.com>"
+__date__ = "2026-10-18"
+__version__ = "1.0"
+
+import os
+import time
+import numpy as np
+from mercury import readParam
+from mercury_output import c2fl, RECORD_SEPARATOR
+
+# Header of the records of xv.out that contain the positions of the bodies, followed by the time (8 characters)
+XV_RECORD = RECORD_SEPARATOR + b"6b"
+XV_RECORD_LENGTH = len(XV_RECORD) + 8
+
+# Line written by mercury in info.out at the end of the integration
+INFO_COMPLETE = b"Integration complete"
+# Words of the lines written in info.out when a body disappear
+INFO_EVENTS = (b"collided", b"ejected", b"hit the central body")
+
+class SimulationMonitor(object):
+  """class that follow the progress of one mercury simulation
+
+  Parameters :
+  folder : the folder of the simulation (must contain param.in)
+
+  Attributes :
+  self.start_time, self.stop_time : the start and stop times of the integration (days). The start time is read in 
+                                   param.in. The stop time is read in param.dmp if it exists (it is the file mercury 
+                                   read when it restart, and the one changed when a simulation is extended), in 
+                                   param.in otherwise.
+  self.current_time : the time of the last output of xv.out (days), None if there is no output yet
+  self.isComplete : True if mercury wrote in info.out that the integration is complete
+  self.nb_events : the number of collisions and ejections written in info.out
+  """
+
+  def __init__(self, folder):
+    """Initialisation of the object"""
+
+    self.folder = folder
+
+    paramin = os.path.join(folder, "param.in")
+    if os.path.exists(paramin):
+      self.start_time = readParam(paramin).start_time
+    else:
+      self.start_time = readParam(os.path.join(folder, "param.dmp")).start_time
+
+    # The date of param.dmp when we read it, to read it again only when it changed
+    self.__dump_date = None
+    self.stop_time = None
+    self.__readStopTime()
+
+    self.current_time = None
+    self.isComplete = False
+    self.nb_events = 0
+
+    # For each file, the number of bytes already read
+    self.__offsets = {"xv.out":0, "info.out":0}
+    # The end of the last block of xv.out, in case a record header is split between two polls
+    self.__xv_rest = b""
+    # The last incomplete line of info.out
+    self.__info_rest = b""
+
+    # Times (wall clock) and fractions of the first and last polls where the integration progressed, for the ETA
+    self.__first = None
+    self.__last = None
+
+  def __readStopTime(self):
+    """Read the stop time in param.dmp if it exists and changed since the last time, or in param.in"""
+
+    paramdmp = os.path.join(self.folder, "param.dmp")
+    try:
+      date = os.path.getmtime(paramdmp)
+    except OSError:
+      date = None
+
+    if (date != None):
+      if (date != self.__dump_date):
+        self.stop_time = readParam(paramdmp).stop_time
+        self.__dump_date = date
+    elif (self.stop_time == None):
+      self.stop_time = readParam(os.path.join(self.folder, "param.in")).stop_time
+
+  def __readNew(self, filename):
+    """Return the bytes appended to the file since the last call (an empty string if nothing changed)"""
+
+    path = os.path.join(self.folder, filename)
+    try:
+      size = os.path.getsize(path)
+    except OSError:
+      return b""
+
+    offset = self.__offsets[filename]
+    # The file was re-created (a new run in the same folder for instance)
+    if (size < offset):
+      offset = 0
+    if (size == offset):
+      return b""
+
+    data_file = open(path, 'rb')
+    data_file.seek(offset)
+    data = data_file.read(size - offset)
+    data_file.close()
+
+    self.__offsets[filename] = offset + len(data)
+
+    return data
+
+  def __pollXV(self):
+    """Read the new outputs of xv.out and update the current time"""
+
+    data = self.__readNew("xv.out")
+    if not(data):
+      return
+
+    data = self.__xv_rest + data
+    # We search the last record whose header (time included) is complete
+    index = data.rfind(XV_RECORD, 0, len(data) - XV_RECORD_LENGTH + 1)
+    if (index != -1):
+      header = np.frombuffer(data[index + len(XV_RECORD):index + XV_RECORD_LENGTH], dtype=np.uint8)
+      self.current_time = float(c2fl(header))
+
+    self.__xv_rest = data[-XV_RECORD_LENGTH:]
+
+  def __pollInfo(self):
+    """Read the new lines of info.out, to know if the integration is complete and count the events"""
+
+    data = self.__readNew("info.out")
+    if not(data):
+      return
+
+    lines = (self.__info_rest + data).split(b"\n")
+    self.__info_rest = lines.pop()
+
+    for line in lines:
+      if (INFO_COMPLETE in line):
+        self.isComplete = True
+      for event in INFO_EVENTS:
+        if (event in line):
+          self.nb_events += 1
+          break
+
+  @property
+  def fraction(self):
+    """The fraction (between 0 and 1) of the integration already done"""
+
+    if self.isComplete:
+      return 1.
+    if ((self.current_time == None) or (self.stop_time == self.start_time)):
+      return 0.
+
+    return min(max((self.current_time - self.start_time) / (self.stop_time - self.start_time), 0.), 1.)
+
+  @property
+  def eta(self):
+    """The estimated remaining time (in seconds) before the end of the integration, None if it can not be estimated yet"""
+
+    if self.isComplete:
+      return 0.
+    if ((self.__first == None) or (self.__last == None) or (self.__last[1] <= self.__first[1])):
+      return None
+
+    speed = (self.__last[1] - self.__first[1]) / (self.__last[0] - self.__first[0])
+
+    return (1. - self.__last[1]) / speed - (time.time() - self.__last[0])
+
+  def poll(self, progressbar=None):
+    """Read what was appended to the output files since the last poll
+
+    Parameters :
+    progressbar=None : a 'progressbar.ProgressBar' object, updated with the fraction of the integration
+
+    Return : the fraction of the integration already done
+    """
+
+    previous = self.fraction
+    self.__readStopTime()
+    self.__pollXV()
+    self.__pollInfo()
+    fraction = self.fraction
+
+    now = time.time()
+    if (self.__first == None):
+      self.__first = (now, fraction)
+    elif (fraction > previous):
+      self.__last = (now, fraction)
+
+    if (progressbar != None):
+      progressbar.update(fraction * progressbar.maxval)
+
+    return fraction
+
+  def __str__(self):
+    """Display the progress of the simulation"""
+
+    texte = "%s : %5.1f%%" % (self.folder, self.fraction * 100.)
+    if self.isComplete:
+      texte += " (complete)"
+    elif (self.eta != None):
+      texte += " (%.0fs remaining)" % self.eta
+    if (self.nb_events > 0):
+      texte += " %d events" % self.nb_events
+
+    return texte
+
+class MetaMonitor(object):
+  """class that follow the progress of all the simulations found under a directory
+
+  Parameters :
+  directory : the directory where we search the simulations (LOCATION_DATASIMU for instance). Every sub-directory
+              that contains a 'param.in' file is considered as a simulation.
+
+  Attributes :
+  self.monitors : dictionnary of 'SimulationMonitor' objects, the keys being the folders of the simulations
+  """
+
+  def __init__(self, directory):
+    """Initialisation of the object"""
+
+    self.directory = directory
+    self.monitors = {}
+
+    self.scan()
+
+  def scan(self):
+    """Search for new simulations under the directory"""
+
+    for (folder, dirs, files) in os.walk(self.directory):
+      if (("param.in" in files) and (folder not in self.monitors)):
+        self.monitors[folder] = SimulationMonitor(folder)
+
+  def poll(self, progressbar=None):
+    """Poll all the simulations. Only the bytes appended in the output files since the last poll are read.
+
+    Parameters :
+    progressbar=None : a 'progressbar.ProgressBar' object, updated with the mean fraction of all the simulations
+
+    Return : the mean fraction of the integrations already done
+    """
+
+    if not(self.monitors):
+      return 0.
+
+    fractions = [monitor.poll() for monitor in self.monitors.values()]
+    fraction = sum(fractions) / len(fractions)
+
+    if (progressbar != None):
+      progressbar.update(fraction * progressbar.maxval)
+
+    return fraction
+
+  def running(self):
+    """Return the list of the monitors of the simulations that are not complete"""
+
+    return [monitor for monitor in self.monitors.values() if not(monitor.isComplete)]
+
+  def __str__(self):
+    """Display the progress of each simulation"""
+
+    return "\n".join([str(self.monitors[folder]) for folder in sorted(self.monitors)])
+
+if __name__ == '__main__':
+  import sys
+  from progressbar import ProgressBar
+
+  # We follow all the simulations under the directory given in argument (the current one by default)
+  if (len(sys.argv) > 1):
+    directory = sys.argv[1]
+  else:
+    directory = "."
+
+  meta = MetaMonitor(directory)
+  pbar = ProgressBar(maxval=100).start()
+  while meta.running():
+    meta.poll(pbar)
+    time.sleep(5.)
+    meta.scan()
+  pbar.finish()
+  print(meta)
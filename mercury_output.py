@@ -0,0 +1,347 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""module that read the compressed output files of mercury (xv.out and ce.out) directly, without the need of element6 or
+close6. Records are decoded with numpy, one record (i.e one output time) at a time, so that we can stream over the
+history of a simulation, and positions and velocities can be converted into orbital elements in memory.
+
+The format is the one written by the subroutines mio_out and mio_ce of mercury6 :
+_ each record start with a form feed character, followed by '6a' (list of bodies with masses, spins and densities) or
+  '6b' (positions and velocities)
+_ real numbers are compressed in base 224 (characters between 32 and 255), either over a given range (mio_re2c) or as
+  a mantissa and an exponent (mio_fl2c)
+_ a '6a' record is written at the beginning of the integration and each time the number of bodies change. The '6b'
+  records only contain the index of each body, so the names are given by the last '6a' record read."""
+
+__author__ = "Autiwa <autiwa@gmail.com>"
+__date__ = "2026-10-18"
+__version__ = "1.0"
+
+import numpy as np
+from constants import G0
+from orbital_elements import cartesian_to_elements
+from mercury import AN
+
+# The character that separate each record in the compressed output files
+RECORD_SEPARATOR = b"\x0c"
+
+# Maximum value for index numbers (224**3), that are compressed over 3 characters
+INDEX_MAX = 11239423.99
+
+# Number of characters used for each compressed coordinate, given the output precision of param.in (low, medium, high)
+NB_CHARS = {1:2, 2:4, 3:7}
+
+# Size of the blocks read in the file. A record is never loaded twice, we just keep the last incomplete record of each block.
+CHUNK_SIZE = 2**20
+
+def c2re(chars, xmin, xmax):
+  """Converts compressed characters into real numbers, in the range [xmin, xmax] (equivalent of mio_c2re)
+
+  Parameters :
+  chars : numpy array of uint8 whose last dimension is the number of characters used to compress each number
+  xmin, xmax : the range used when the numbers were compressed
+
+  Return :
+  numpy array of floats, with one dimension less than 'chars'
+  """
+
+  y = np.zeros(chars.shape[:-1])
+  for j in range(chars.shape[-1] - 1, -1, -1):
+    y = (y + (chars[..., j] - 32.)) / 224.
+
+  return xmin + y * (xmax - xmin)
+
+def c2fl(chars):
+  """Converts 8 compressed characters (mantissa and exponent) into real numbers (equivalent of mio_c2fl)
+
+  Parameters :
+  chars : numpy array of uint8 whose last dimension is 8
+
+  Return :
+  numpy array of floats, with one dimension less than 'chars'
+  """
+
+  x = c2re(chars[..., 0:7], 0., 1.) * 2. - 1.
+  exponent = chars[..., 7].astype(np.int64) - 144
+
+  return x * 10.**exponent
+
+def ov2x(rcen, rmax, mu, fields):
+  """Converts the compressed variables of mercury into cartesian coordinates (equivalent of mco_ov2x)
+
+  Parameters :
+  rcen : the radius of the central body (AU)
+  rmax : the maximum distance for outputs (i.e the ejection distance, in AU)
+  mu : G * (m_central + m_body) (AU^3/day^2)
+  fields : (fr, theta, phi, fv, vtheta, vphi) the decoded variables
+
+  Return :
+  (x, y, z, vx, vy, vz) in AU and AU/day
+  """
+
+  (fr, theta, phi, fv, vtheta, vphi) = fields
+
+  r = rcen * 10.**fr
+  with np.errstate(divide='ignore'):
+    v = np.sqrt(mu / r * (1. / fv - 1.))
+
+  x = r * np.sin(theta) * np.cos(phi)
+  y = r * np.sin(theta) * np.sin(phi)
+  z = r * np.cos(theta)
+  vx = v * np.sin(vtheta) * np.cos(vphi)
+  vy = v * np.sin(vtheta) * np.sin(vphi)
+  vz = v * np.cos(vtheta)
+
+  return (x, y, z, vx, vy, vz)
+
+def _decode_coordinates(table, nb_chars, rfac):
+  """Decode the 6 compressed variables (fr, theta, phi, fv, vtheta, vphi) stored one after the other in 'table'
+
+  Parameters :
+  table : numpy array of uint8 of shape (nb_lines, 6 * nb_chars)
+  nb_chars : the number of characters for each variable
+  rfac : log10(rmax / rcen), the maximum value for 'fr'
+  """
+
+  ranges = [(0., rfac), (0., np.pi), (0., 2. * np.pi), (0., 1.), (0., np.pi), (0., 2. * np.pi)]
+
+  fields = []
+  for (i, (xmin, xmax)) in enumerate(ranges):
+    fields.append(c2re(table[:, i * nb_chars:(i + 1) * nb_chars], xmin, xmax))
+
+  return fields
+
+def _lines2array(lines, length):
+  """Return a numpy array of uint8 of shape (len(lines), length) from a list of byte strings"""
+
+  return np.frombuffer(b"".join([line[:length].ljust(length) for line in lines]), dtype=np.uint8).reshape(len(lines), length)
+
+def _read_records(filename, chunk_size=CHUNK_SIZE):
+  """generator that yield each record of a compressed mercury output file, as a list of lines (byte strings)
+  where the first line begins with '6a' or '6b'.
+
+  Only one block of 'chunk_size' bytes is in memory at a time.
+  """
+
+  output = open(filename, 'rb')
+  rest = b""
+  while True:
+    block = output.read(chunk_size)
+    if not(block):
+      break
+
+    records = (rest + block).split(RECORD_SEPARATOR)
+    # The last record may be incomplete, we keep it for the next block
+    rest = records.pop()
+    for record in records:
+      if record:
+        yield record.rstrip(b"\n").split(b"\n")
+  output.close()
+
+  if rest:
+    yield rest.rstrip(b"\n").split(b"\n")
+
+class Header(object):
+  """class that store the informations of the '6a' records of xv.out and ce.out (written once at the beginning of the
+  integration and each time the number of bodies change)
+
+  Attribute :
+  self.algorithm : the integer code of the algorithm
+  self.time : the time of the record (days)
+  self.nb_big, self.nb_small : the number of big and small bodies
+  self.m_star : the mass of the central body (solar mass)
+  self.J2, self.J4, self.J6 : the moments of the central body
+  self.rcen : the radius of the central body (AU)
+  self.rmax : the maximum distance for outputs (AU)
+  self.precision : the output precision (1, 2 or 3 for low, medium and high)
+  self.names : list of the names of the bodies
+  self.m : the masses of the bodies (solar masses)
+  self.spin : array of shape (nb_bodies, 3) the spin of the bodies (solar masses AU^2 per day)
+  self.d : the densities of the bodies (g/cm^3)
+  """
+
+  def __init__(self, lines):
+    """lines : the lines of the record. The first one begins with '6a'"""
+
+    line = lines[0]
+
+    self.algorithm = int(line[2:4])
+    header = np.frombuffer(line[4:66], dtype=np.uint8)
+    self.time = float(c2fl(header[0:8]))
+    self.nb_big = int(round(c2re(header[8:11], 0., INDEX_MAX)))
+    self.nb_small = int(round(c2re(header[11:14], 0., INDEX_MAX)))
+    (m_star, self.J2, self.J4, self.J6, self.rcen, self.rmax) = c2fl(header[14:62].reshape(6, 8))
+    # mercury writes its internal masses and spins, that are multiplied by K2 (= G0) when param.in and big.in are read. 
+    # Like element6, we divide them by K2 to get solar masses (so that G0 * mass is the GM used by mercury).
+    self.m_star = m_star / G0
+    self.precision = int(line[66:67])
+
+    bodies = lines[1:self.nb_big + self.nb_small + 1]
+    self.names = [body[3:11].decode("latin-1").strip() for body in bodies]
+    table = _lines2array(bodies, 51)
+    values = c2fl(table[:, 11:51].reshape(-1, 5, 8))
+    self.m = values[:, 0] / G0
+    self.spin = values[:, 1:4] / G0
+    self.d = values[:, 4]
+
+  @property
+  def rfac(self):
+    """maximum value for the compressed distances"""
+
+    return np.log10(self.rmax / self.rcen)
+
+class XVRecord(object):
+  """class that store one output of xv.out, that is to say the positions and velocities of all the bodies at a given time
+
+  Attribute :
+  self.time : the time of the output (days)
+  self.names : list of the names of the bodies
+  self.m : masses of the bodies (solar masses)
+  self.m_star : mass of the central body (solar masses)
+  self.x, self.y, self.z : positions (AU), relative to the central body
+  self.vx, self.vy, self.vz : velocities (AU/day)
+  """
+
+  def __init__(self, time, names, m, m_star, coordinates):
+    """Initialisation of the object"""
+
+    self.time = time
+    self.names = names
+    self.m = m
+    self.m_star = m_star
+    (self.x, self.y, self.z, self.vx, self.vy, self.vz) = coordinates
+
+  def elements(self):
+    """Return the orbital elements of the bodies as a tuple (a, e, I, g, n, M) of arrays (angles in degrees)"""
+
+    return cartesian_to_elements(self.x, self.y, self.z, self.vx, self.vy, self.vz, G0 * (self.m_star + self.m))
+
+def iter_xv(filename="xv.out", chunk_size=CHUNK_SIZE):
+  """generator that decode xv.out, output after output.
+
+  Parameters :
+  filename="xv.out" : the name of the compressed output file
+  chunk_size : the number of bytes read at once in the file
+
+  Return :
+  yield an 'XVRecord' object for each output time
+
+  Example :
+  for record in iter_xv():
+    (a, e, I, g, n, M) = record.elements()
+  """
+
+  header = None
+  for lines in _read_records(filename, chunk_size):
+    code = lines[0][0:2]
+    if (code == b"6a"):
+      header = Header(lines)
+    elif (code == b"6b"):
+      if (header == None):
+        raise ValueError("'%s' is corrupted: a '6b' record was found before the first '6a' record" % filename)
+
+      # The last record can be incomplete if the integration is still running.
+      if (len(lines[0]) < 16):
+        break
+
+      nb_bodies = int(round(c2re(np.frombuffer(lines[0][10:13], dtype=np.uint8), 0., INDEX_MAX))) + \
+                  int(round(c2re(np.frombuffer(lines[0][13:16], dtype=np.uint8), 0., INDEX_MAX)))
+      bodies = lines[1:]
+      if (len(bodies) < nb_bodies):
+        break
+
+      nb_chars = NB_CHARS[header.precision]
+      time = float(c2fl(np.frombuffer(lines[0][2:10], dtype=np.uint8)))
+      table = _lines2array(bodies[:nb_bodies], 3 + 6 * nb_chars)
+
+      index = np.rint(c2re(table[:, 0:3], 0., INDEX_MAX)).astype(np.int64)
+      m = header.m[index]
+      fields = _decode_coordinates(table[:, 3:], nb_chars, header.rfac)
+      coordinates = ov2x(header.rcen, header.rmax, G0 * (header.m_star + m), fields)
+
+      yield XVRecord(time, [header.names[i] for i in index], m, header.m_star, coordinates)
+
+def read_xv_elements(filename="xv.out", time_format="years", relative_time="yes"):
+  """function that read an entire xv.out file and return the orbital elements of each body. This replace the .aei
+  files generated by element6 (with central body coordinates).
+
+  Parameters :
+  filename="xv.out" : the name of the compressed output file
+  time_format="years" : (years, days) the unit of the time
+  relative_time="yes" : (yes/no) if the time is expressed relative to the first output
+
+  Return :
+  a dictionnary whose keys are the names of the bodies and values are numpy structured arrays with the fields
+  'time', 'a', 'e', 'i', 'g', 'n', 'l', 'm' (the same names as the .aei columns, see mercury_utilities.read_aei())
+  """
+
+  names = ("time", "a", "e", "i", "g", "n", "l", "m")
+  dtype = np.dtype([(name, np.float64) for name in names])
+
+  # For each body, a list of arrays (one per output) of shape (1, 8)
+  histories = {}
+  start_time = None
+  for record in iter_xv(filename):
+    if (start_time == None):
+      start_time = record.time
+
+    time = record.time
+    if (relative_time == "yes"):
+      time = time - start_time
+    if (time_format == "years"):
+      time = time / AN
+
+    columns = np.column_stack((np.repeat(time, len(record.names)),) + tuple(record.elements()) + (record.m,))
+    for (name, line) in zip(record.names, columns):
+      histories.setdefault(name, []).append(line)
+
+  elements = {}
+  for (name, lines) in histories.items():
+    table = np.array(lines)
+    elements[name] = np.empty(len(table), dtype=dtype)
+    for (i, field) in enumerate(names):
+      elements[name][field] = table[:, i]
+
+  return elements
+
+def iter_ce(filename="ce.out", chunk_size=CHUNK_SIZE):
+  """generator that decode ce.out, the file that store the close encounters.
+
+  Parameters :
+  filename="ce.out" : the name of the compressed output file
+  chunk_size : the number of bytes read at once in the file
+
+  Return :
+  yield a tuple (time, name_i, name_j, dmin, coordinates_i, coordinates_j) for each close encounter, where time is in
+  days, dmin is the minimum distance (AU) and coordinates are (x, y, z, vx, vy, vz) for each of the two bodies at the
+  time of the encounter.
+  """
+
+  header = None
+  for lines in _read_records(filename, chunk_size):
+    code = lines[0][0:2]
+    if (code == b"6a"):
+      header = Header(lines)
+    elif (code == b"6b"):
+      if (header == None):
+        raise ValueError("'%s' is corrupted: a '6b' record was found before the first '6a' record" % filename)
+
+      # The last encounter can be incomplete if the integration is still running.
+      if (len(lines[0]) < 72):
+        break
+
+      table = _lines2array([lines[0][2:72]], 70)
+      time = float(c2fl(table[0, 0:8]))
+      index_i = int(round(c2re(table[0, 8:11], 0., INDEX_MAX)))
+      index_j = int(round(c2re(table[0, 11:14], 0., INDEX_MAX)))
+      dmin = float(c2fl(table[0, 14:22]))
+
+      # The coordinates of the two bodies are compressed with 4 characters each
+      fields = _decode_coordinates(table[:, 22:70].reshape(2, 24), 4, header.rfac)
+      (coordinates_i, coordinates_j) = zip(*ov2x(header.rcen, header.rmax, G0 * header.m_star, fields))
+
+      yield (time, header.names[index_i], header.names[index_j], dmin, coordinates_i, coordinates_j)
+
+if __name__ == '__main__':
+  # We display the final orbital elements of each body of the simulation in the current directory
+  for (name, history) in read_xv_elements().items():
+    print("%s : a=%f e=%f I=%f" % (name, history['a'][-1], history['e'][-1], history['i'][-1]))
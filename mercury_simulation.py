@@ -13,9 +13,14 @@ __version__ = "1.0"
 # RMQ : J'ai modifié pour que print soit sous la forme print() en prévision de la v3 de python
 
 import os   # used to change directories and create folders
+import errno   # To know if a folder already exists when we try to create it
 import re   # used to determine the name of the next simulation
 import subprocess   # Usefull to run the simulation
 import time   # For the display of the running time of the simulation and the display of the current time in the logs
+import multiprocessing   # To run several simulations at the same time
+import glob   # To list the .aei files
+import shutil   # To copy the .tmp files in the .dmp ones
+import fcntl   # To clone the output files when we extend a simulation
 import pdb
 
 #import sys
@@ -23,6 +28,9 @@ import pdb
 ## in fact, no need to add because mercury.py and autiwa.py must be in the same directory. 
 # sys.path.append(LOCATION_MODULES)
 from autiwa import AutiwaObject, Temps  # We only import what interests us.
+from mercury import Element, Param, Big, Small, Files, Message, PlanetarySystem, readParam
+from mercury_supervisor import Supervisor, Run
+import mercury_archive
 
 ## CONSTANTS
 # (chemin absolu) dossier où sont situées les programmes, notamment mercury6, element6 et close6
@@ -40,6 +48,12 @@ LOCATION_PRGM="/home/autiwa/documents/travail/bin/mercury6"
 LOCATION_METASIMU="/home/autiwa/documents/travail/Tests/meta_simu"
 LOCATION_DATASIMU="/home/autiwa/documents/travail/Tests/data_meta_simu"
 
+# Regular expression that match the NaN and infinite values written by fortran in the dump files
+NAN_REGEXP = re.compile(r"\b(nan|infinity)\b", re.IGNORECASE)
+
+# ioctl request that clone a file on Linux (copy on write, see 'man ioctl_ficlone')
+FICLONE = 0x40049409
+
 
 class Simulation(AutiwaObject):
   """Class that define a mercury simulation. It allows us to create the input files (param.in, element.in, big.in) and to run the 
@@ -89,6 +103,32 @@ class Simulation(AutiwaObject):
   # list of files, without extension, that we exchance, from .tmp to .dmp in case of the .dmp are corrupted. (explained in the section (6) of the mercury manual
   LIST_EXCHANGE = ["big", "small", "element", "param", "restart"]
   
+  # list of files, without extension, where we search for NaN values to know if the dumps of a simulation are corrupted
+  LIST_CORRUPTION = ["big", "small"]
+  
+  # The possible states of a simulation, as returned by classifySimu()
+  RUN_FINISHED = "finished"   # mercury wrote that the integration is complete
+  RUN_RUNNING = "running"   # the output files were modified recently, mercury is probably still running
+  RUN_CRASHED = "crashed"   # mercury returned an error
+  RUN_CORRUPTED = "corrupted"   # the .dmp files contain NaN values
+  RUN_INCOMPLETE = "incomplete"   # mercury stopped without error before the end of the integration (killed by the queue of a server for instance)
+  
+  # Big files to which mercury (or the logs) append data, and extensions of the big files written by element6 and close6. 
+  # When we extend a simulation, they are cloned (reflink, the blocks are only copied when they are modified) if the 
+  # filesystem allows it, and copied otherwise. They are never hard linked, because element6 and close6 re-write the 
+  # .aei and .clo files in place, which would modify the files of the original simulation too.
+  CLONE_FILES = ["xv.out", "ce.out", "info.out", MERCURY_STDOUT, MERCURY_STDERR, LOG_RUNNING]
+  CLONE_EXTENSIONS = [".aei", ".clo"]
+  
+  # name of the file, stored in the simulation folder, where we write the simulations this one was extended from
+  LINEAGE_FILE = "lineage.log"
+  
+  # If True, the outputs of each simulation are archived in one binary file once the .aei are generated (see mercury_archive)
+  ARCHIVE_OUTPUTS = False
+  
+  # Time (in seconds) since the last modification of the output files after which we consider mercury is not running anymore
+  IDLE_TIME = 600
+  
   
   # The number of digits we want to have in the numerotation of the folders for simulations in a meta_simulation folder (the 9th simulation will appear as '00009' simulation if NB_DIGITS is set to 5 for example
   NB_DIGITS = 5
@@ -109,9 +149,6 @@ class Simulation(AutiwaObject):
     
     self.meta_simu = meta_simu
     
-    # We change the directory to be in the meta simu folder
-    prevDir = self.__changeDirectory(LOCATION_DATASIMU)
-    
     self.param = param
     self.element = element
     self.system = system
@@ -122,67 +159,83 @@ class Simulation(AutiwaObject):
     self.element.set_relative_time(self.param.get_relative_time())
     self.element.set_time_format(self.param.get_time_format())
     
-    # We test and create the folders if necessary
-    if not(os.path.exists(self.meta_simu)):
-      os.mkdir(self.meta_simu)
-    
-    os.chdir(self.meta_simu)
-    
-    if not(os.path.exists(Simulation.FOLDER_SIMULATIONS)):
-      os.mkdir(Simulation.FOLDER_SIMULATIONS)
+    # We test and create the folders if necessary. The current working directory is never changed, so that
+    # several simulations can be prepared and monitored from the same process.
+    if not(os.path.exists(self.__metaSimuPath())):
+      os.mkdir(self.__metaSimuPath())
     
-    # We create the parameter files that will be the same for all the simulation in the parent directory, that is to say, the meta_simu folder.
-
+    if not(os.path.exists(self.__simulationsPath())):
+      os.mkdir(self.__simulationsPath())
+  
+  def __metaSimuPath(self):
+    """method that return the path of the meta-simulation folder"""
     
-    # We return in the previous directory
-    self.__changeDirectory(prevDir)
+    return os.path.join(LOCATION_DATASIMU, self.meta_simu)
+  
+  def __simulationsPath(self):
+    """method that return the path of the folder that contains all the simulations of the meta-simulation"""
     
-  def __changeDirectory(self, directory):
-    """method that change the directory to another one.
+    return os.path.join(LOCATION_DATASIMU, self.meta_simu, Simulation.FOLDER_SIMULATIONS)
+  
+  def __simulationPath(self, folder=None):
+    """method that return the path of the folder of a simulation
     
     Parameters :
-    directory : the path, either relative or absolute where we want to be
-    
-    return : the path for the actual directory before the chdir
+    folder=None : the name of the simulation. By default, the current simulation (self.folder_simulation)
     """
     
-    precedent_directory = os.getcwd()
+    if (folder == None):
+      folder = self.folder_simulation
     
-    os.chdir(directory)
+    return os.path.join(LOCATION_DATASIMU, self.meta_simu, Simulation.FOLDER_SIMULATIONS, folder)
+  
+  def __getFolderNumbers(self):
+    """method that return the list of the numbers of the simulations that already exist in the meta-simulation"""
+    regular_expression = r"^([0-9]+)_"+self.param.algorithme
     
-    return precedent_directory
-
-  def __getFolderName(self):
-    """method that return a string that represent the name of the simulation to run. 
+    numbers = []
+    for dir in os.listdir(self.__simulationsPath()):
+      match = re.search(regular_expression, dir)
+      if (match and os.path.isdir(os.path.join(self.__simulationsPath(), dir))):
+        numbers.append(int(match.group(1)))
+    
+    return numbers
+  
+  def __createFolder(self):
+    """method that create the folder of the simulation to run, in the folder of the simulations of the meta-simulation, and return its name.
     
-    This function will search for all the names that match the regular expression we have defined for the names of the simulations and determine the next name to apply.
+    The name is determined from the names of existing simulations (the next number is taken). The folder is created
+    with os.mkdir, that fail if the folder already exists. So if several scripts launch simulations at the same time
+    in the same meta-simulation, each of them get a different folder : if the folder was created by another process
+    in between, we simply try the next number.
     
-    Return : the name of the folder to create for the next simulation as a string
+    Return : the name of the folder created for the next simulation as a string
     """
-    regular_expression = r"[0-9]+_"+self.param.algorithme
     
-    dirs = [dir for dir in os.listdir(".") if os.path.isdir(dir) and re.search(regular_expression, dir)]
-
-    numbers = []
-    for dir in dirs:
-      # We erase successively all the '0' to the left of the expression and take the left side of the expression, regardless of the character "_"
-      numbers.append(eval(dir.lstrip("0").split("_")[0]))
+    numbers = self.__getFolderNumbers()
     
     # We get the max number and increase its value by one in order to create a new folder
     if (numbers):
       number = max(numbers)+1
     else:
       number = 1
-
-    folder_name = str(number).zfill(Simulation.NB_DIGITS)+"_"+self.param.algorithme
-
-    return folder_name
-
+    
+    while True:
+      folder_name = str(number).zfill(Simulation.NB_DIGITS)+"_"+self.param.algorithme
+      try:
+        os.mkdir(os.path.join(self.__simulationsPath(), folder_name))
+      except OSError as error:
+        if (error.errno != errno.EEXIST):
+          raise
+        number += 1
+      else:
+        return folder_name
+  
   def __writeLog(self, *texts):
     """method that writes a log in a file whose name is determinated by LOG_NAME. This file will be stored in the meta_simu folder. When we write something, we must be able to identify to which simulation the line correspond. (give the name for example)
     
     Parameters
-    texts : a sequence of elements that will be converted to strings. 
+    texts : a sequence of elements that will be converted to strings.
     
     Exemple :
     self.__writeLog("mercury has returned", integer, "and nothing went wrong")
@@ -190,22 +243,18 @@ class Simulation(AutiwaObject):
     
     return : nothing for the moment"""
     
-    prevDir = self.__changeDirectory(os.path.join(LOCATION_DATASIMU, self.meta_simu))
-    
-    file_log = open(Simulation.LOG_NAME, 'a')
+    file_log = open(os.path.join(self.__metaSimuPath(), Simulation.LOG_NAME), 'a')
     temp_string = "["+str(time.strftime('%d/%m/%Y %H:%M:%S'))+"]"
     for object in texts:
       temp_string += " "+str(object)
     file_log.write(temp_string+"\n")
     file_log.close()
-    
-    self.__changeDirectory(prevDir)
-
+  
   def __writeRunning(self, *texts):
     """method that writes a log in a file whose name is determinated by LOG_NAME. This file will be stored in the simulation folder.
     
     Parameters
-    texts : a sequence of elements that will be converted to strings. 
+    texts : a sequence of elements that will be converted to strings.
     
     Exemple :
     self.__writeRunning("mercury has returned", integer, "and nothing went wrong")
@@ -213,9 +262,7 @@ class Simulation(AutiwaObject):
     
     return : nothing for the moment"""
     
-    prevDir = self.__changeDirectory(os.path.join(LOCATION_DATASIMU, self.meta_simu, Simulation.FOLDER_SIMULATIONS, self.folder_simulation))
-    
-    file_log = open(Simulation.LOG_RUNNING, 'a')
+    file_log = open(os.path.join(self.__simulationPath(), Simulation.LOG_RUNNING), 'a')
     temp_string = "["+str(time.strftime('%d/%m/%Y %H:%M:%S'))+"]"
     for object in texts:
       temp_string += " "+str(object)
@@ -223,8 +270,6 @@ class Simulation(AutiwaObject):
     file_log.close()
     
     print(temp_string)
-    
-    self.__changeDirectory(prevDir)
   
   def __extraSimu(self):
     """method that execute functions and things at the end of the simulation. Like sending en e-mail to advise the customer that the simulation has ended"""
@@ -241,18 +286,14 @@ class Simulation(AutiwaObject):
     
     Return : doesn't return anything, but write the file element.in
     """
-    # Il semble qu'en notation exponentielle, le chiffre soit le nombre 
+    # Il semble qu'en notation exponentielle, le chiffre soit le nombre
     # total de caractères, incluant les signes '-', le "E" de l'exposant et cie.
     
     if (type(element) != Element):
       self.__writeRunning("'element' must be an objet of type 'Element'")
       raise TypeError("'element' must be an objet of type 'Element'")
     
-    prevDir = self.__changeDirectory(os.path.join(LOCATION_DATASIMU, self.meta_simu, Simulation.FOLDER_SIMULATIONS, self.folder_simulation))
-
-    element.write()
-    
-    self.__changeDirectory(prevDir)
+    element.write(self.__simulationPath())
   
   def __writeParam(self, param):
     """Génère le fichier param.in avec les paramètres passés
@@ -263,21 +304,17 @@ class Simulation(AutiwaObject):
     Return : doesn't return anything, but write the file param.in
     """
     # Version 1.1
-    # Quand on définit un texte, toujours faire un retour chariot à la 
+    # Quand on définit un texte, toujours faire un retour chariot à la
     # dernière ligne. mercury est très pointilleux sur le nombre de lignes du fichiers.
     
     if (type(param) != Param):
       self.__writeRunning("'param' must be an objet of type 'Param'")
       raise TypeError("'param' must be an objet of type 'Param'")
     
-    prevDir = self.__changeDirectory(os.path.join(LOCATION_DATASIMU, self.meta_simu, Simulation.FOLDER_SIMULATIONS, self.folder_simulation))
-
-    param.write()
-    
-    self.__changeDirectory(prevDir)
+    param.write(self.__simulationPath())
   
   def __writeBig(self, big):
-    """ Génère le fichier big.in à partir des paramètres d'entrée. 
+    """ Génère le fichier big.in à partir des paramètres d'entrée.
     
     Parameters
     big : an object of the class Big that represent the file big.in
@@ -291,96 +328,244 @@ class Simulation(AutiwaObject):
       self.__writeRunning("'big' must be an objet of type 'Big'")
       raise TypeError("'big' must be an objet of type 'Big'")
     
-    prevDir = self.__changeDirectory(os.path.join(LOCATION_DATASIMU, self.meta_simu, Simulation.FOLDER_SIMULATIONS, self.folder_simulation))
-    
     # we define an 'Big' object that we write directly on a file
-    big.write()
-    
-    
-    self.__changeDirectory(prevDir)
-    
+    big.write(self.__simulationPath())
+  
   def __writeParameterFiles(self):
-    """method that writes all the needed files in the current directory"""
-    prevDir = self.__changeDirectory(os.path.join(LOCATION_DATASIMU, self.meta_simu, Simulation.FOLDER_SIMULATIONS, self.folder_simulation))
+    """method that writes all the needed files in the folder of the simulation"""
     
-    parameter_files.write_filesin()
-    parameter_files.write_messagein()
-    Small().write()
-    
-    self.__changeDirectory(prevDir)
+    Files().write(self.__simulationPath())
+    Message().write(self.__simulationPath())
+    Small(self.system).write(self.__simulationPath())
   
   def __removeParameterFiles(self):
     """method that remove all the needed files to launch the simulation, once the simulation had terminated"""
-    prevDir = self.__changeDirectory(os.path.join(LOCATION_DATASIMU, self.meta_simu, Simulation.FOLDER_SIMULATIONS, self.folder_simulation))
     
     for file in Simulation.REMOVE_FILES:
-      if os.path.exists(file):
+      path = os.path.join(self.__simulationPath(), file)
+      if os.path.exists(path):
+        os.remove(path)
+  
+  def __writeRecoveryFiles(self):
+    """method that writes the files needed to re-launch mercury in the folder of a simulation that we did not prepare 
+    ourselves (its system is not self.system). The bodies are read by mercury in the .dmp files, or in big.in and small.in 
+    if we start again from the beginning. An empty small.in is written only if it was removed at the end of the previous run."""
+    
+    Files().write(self.__simulationPath())
+    Message().write(self.__simulationPath())
+    if not(os.path.exists(os.path.join(self.__simulationPath(), "small.in"))):
+      Small(PlanetarySystem()).write(self.__simulationPath())
+  
+  def __exchangeDumps(self):
+    """method that replace the .dmp files of the current simulation by the .tmp ones, in case the .dmp are corrupted 
+    (explained in the section (6) of the mercury manual). Each .tmp is copied in a temporary file that is then renamed 
+    in .dmp, so that a .dmp is never partially written, even if the script is killed during the copy.
+    
+    Return : the list of files (without extension) that were exchanged
+    """
+    
+    path = self.__simulationPath()
+    
+    self.__writeRunning("We copy *.tmp to *.dmp in case the .dmp's are corrupted")
+    exchanged = []
+    for file in Simulation.LIST_EXCHANGE:
+      source = os.path.join(path, file+".tmp")
+      if not(os.path.exists(source)):
+        continue
+      try:
+        _atomicCopy(source, os.path.join(path, file+".dmp"))
+      except (IOError, OSError) as error:
+        self.__writeRunning("error while copying "+file+".tmp to "+file+".dmp : "+str(error))
+      else:
+        exchanged.append(file)
+    
+    return exchanged
+  
+  def __isCorrupted(self, extension):
+    """method that return True if one of the dump files of the current simulation, with the given extension, contains NaN values
+    
+    Parameters :
+    extension : "dmp" or "tmp"
+    """
+    
+    for file in Simulation.LIST_CORRUPTION:
+      path = os.path.join(self.__simulationPath(), file+"."+extension)
+      if (os.path.exists(path) and _containsNaN(path)):
+        return True
+    
+    return False
+  
+  def __cleanOutputs(self):
+    """method that remove all the dump and output files of the current simulation, to start the integration again from the beginning"""
+    
+    for pattern in ("*.dmp", "*.tmp", "*.out", "*.aei", "*.clo"):
+      for file in glob.glob(os.path.join(self.__simulationPath(), pattern)):
         os.remove(file)
+  
+  def __mercuryRun(self, mode='w'):
+    """method that return the 'Run' object (see mercury_supervisor) that launch mercury6 in the folder of the current simulation. 
+    The outputs of mercury are streamed in MERCURY_STDOUT and MERCURY_STDERR
+    
+    Parameters :
+    mode='w' : the mode used to open the stdout and stderr files ('a' to append to the existing ones)
+    """
     
-    self.__changeDirectory(prevDir)
+    return Run(LOCATION_PRGM+"/mercury6", cwd=self.__simulationPath(), stdout=Simulation.MERCURY_STDOUT, 
+               stderr=Simulation.MERCURY_STDERR, mode=mode, name=self.folder_simulation)
   
-  def startSimu(self):
-    """method that start a new simulation of the current metasimulation
+  def __mercuryEnded(self, run):
+    """method that write in the logs the result of a run of mercury
     
-    This method will search all the simulation already finished or in progress for this meta-simulation and find the closest name of directory that match the norm of name we have fixed
+    Parameters :
+    run : the 'Run' object of mercury, once finished
+    """
+    
+    if (run.returncode!=0):
+      self.__writeRunning("mercury has returned an error "+str(run.returncode))
+    else:
+      self.__writeRunning("mercury has been successfully executed (in "+str(Temps(run.duration))+").")
+  
+  def __runMercury(self, mode='w'):
+    """method that run mercury6 in the folder of the simulation and stream its stdout and stderr in MERCURY_STDOUT and MERCURY_STDERR
+    
+    Parameters :
+    mode='w' : the mode used to open the stdout and stderr files ('a' to append to the existing ones)
+    
+    Return : a tuple (returnCode, duration) with the return code of mercury and its running time in seconds
+    """
+    
+    run = self.__mercuryRun(mode)
+    supervisor = Supervisor()
+    supervisor.add(run)
+    supervisor.run()
     
-    We are in the path of the meta-simulation in the partition where we run and store the datas. We MUST still change the directory to the sub-directory for the simulation that we will run. 
+    self.__mercuryEnded(run)
+    
+    return (run.returncode, run.duration)
+  
+  def __prepareSimu(self, system=None):
+    """method that create the folder of a new simulation and write all the parameter files in it
+    
+    Parameters :
+    system=None : an object of type 'PlanetarySystem'. If given, it replace the system of the instance
+    
+    Return : the name of the folder of the simulation
     """
-    prevDir = self.__changeDirectory(os.path.join(LOCATION_DATASIMU, self.meta_simu, Simulation.FOLDER_SIMULATIONS))
+    
+    if (system != None):
+      self.system = system
     
     ## On crée un sous répertoire pour la simulation qu'on va lancer
-    self.folder_simulation = self.__getFolderName()
+    self.folder_simulation = self.__createFolder()
     self.__writeLog(self.folder_simulation, ": We create the folder")
-    os.mkdir(self.folder_simulation)  # faut créer le dossier maintenant. On est dans le bon dossier normalement
     
     self.__writeParam(self.param)
     self.__writeElement(self.element)
-    
-    # In case the system being partially random, we re-generate its values (in order to have different system if we launch several simulations with the same script. If the system is not random, then nothing will change.
-    self.system.generateOrbitals()
     self.__writeBig(Big(self.system))
     self.__writeParameterFiles()
     
-    os.chdir(self.folder_simulation)
+    return self.folder_simulation
+  
+  def __finishSimu(self, duration):
+    """method that generate the output files and clean the folder of the current simulation, once mercury is finished
+    
+    Parameters :
+    duration : the running time of mercury (in seconds)
+    """
+    
+    self.__writeRunning("we write the .aei")
+    self.generateOutputFiles(self.folder_simulation)
+    
+    # we clean the directory
+    self.__removeParameterFiles()
+    
+    
+    self.__writeLog(self.folder_simulation, ": The simulation has terminated in", Temps(duration))
+    self.__extraSimu()
+  
+  def startSimu(self, system=None):
+    """method that start a new simulation of the current metasimulation
+    
+    This method will search all the simulation already finished or in progress for this meta-simulation and find the closest name of directory that match the norm of name we have fixed
+    
+    All the files are written in the folder of the simulation, given by its absolute path, and mercury is launched 
+    in this folder. The current working directory of the process is never changed.
+    
+    Parameters :
+    system=None : an object of type 'PlanetarySystem'. If given, it replace the system of the instance (a meta-simulation is usually a set of realisations of a random system)
+    
+    Return : a tuple (folder, returnCode, duration) with the name of the folder of the simulation, the return code of mercury and the running time of mercury in seconds
+    """
+    
+    self.__prepareSimu(system)
+    
     self.__writeLog(self.folder_simulation, ": We launch the simulation")
     self.__writeRunning("We launch the simulation")
-    temps_debut = time.time()
-    process = subprocess.Popen(LOCATION_PRGM+"/mercury6", stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-    (instance_sortie, instance_erreur) = process.communicate()
-    returnCode = process.poll()
-    temps_fin = time.time()
-    temps_exec = Temps(temps_fin - temps_debut)
+    (returnCode, duration) = self.__runMercury()
     
-    if (returnCode!=0):
-      self.__writeRunning("mercury has returned an error "+str(returnCode))
-    else:
-      self.__writeRunning("mercury has been successfully executed (in "+str(temps_exec)+").")
+    self.__finishSimu(duration)
     
-    self.__writeRunning("we write stdout/stderr")
-    # On écrit un fichier dans lequel on stocke les valeurs données 
-    # par mercury. Le "f" noté devant est pour file, c'est l'objet correspondant au nom de fichier.
-    fmercury_stdout = open(Simulation.MERCURY_STDOUT, 'w')
-    for ligne in instance_sortie:
-      fmercury_stdout.write(ligne)
-    fmercury_stdout.close()
+    return (self.folder_simulation, returnCode, duration)
+  
+  def superviseSimus(self, systems, max_running=None, callback=None):
+    """method that run several simulations of the current metasimulation at the same time, from a single process. 
+    The mercury processes are supervised by one event loop (see mercury_supervisor.Supervisor) and their outputs 
+    are streamed to their files.
     
-    fmercury_stderr = open(Simulation.MERCURY_STDERR, 'w')
-    for ligne in instance_erreur:
-      fmercury_stderr.write(ligne)
-    fmercury_stderr.close()
+    Parameters :
+    systems : a list of objects of type 'PlanetarySystem', the realisations of the system we want to integrate
+    max_running=None : The maximum number of simulations that run at the same time (no limit by default)
+    callback=None : function called with the events of the supervisor (event, run), where run.name is the folder of the simulation
     
+    Return : a list of tuples (folder, returnCode, duration), one for each system (in the same order), see startSimu()
+    """
     
+    def onEvent(event, run):
+      """Function called by the supervisor for each event"""
+      
+      self.folder_simulation = run.name
+      if (event == "start"):
+        self.__writeLog(self.folder_simulation, ": We launch the simulation")
+        self.__writeRunning("We launch the simulation")
+      elif (event == "end"):
+        self.__mercuryEnded(run)
+        self.__finishSimu(run.duration)
+      
+      if (callback != None):
+        callback(event, run)
     
-    self.__writeRunning("we write the .aei")
-    self.generateOutputFiles(self.folder_simulation)
+    supervisor = Supervisor(max_running=max_running, callback=onEvent)
+    for system in systems:
+      self.__prepareSimu(system)
+      supervisor.add(self.__mercuryRun())
     
-    # we clean the directory
-    self.__removeParameterFiles()
+    return [(run.name, run.returncode, run.duration) for run in supervisor.run()]
+  
+  def startSimus(self, systems, nb_workers=None):
+    """method that run several simulations of the current metasimulation at the same time, one for each planetary system given
     
+    Parameters :
+    systems : a list of objects of type 'PlanetarySystem', the realisations of the system we want to integrate
+    nb_workers=None : The number of simulations that run at the same time. By default, the number of processors
     
-    self.__writeLog(self.folder_simulation, ": The simulation has terminated in", temps_exec)
-    self.__extraSimu()
-    self.__changeDirectory(prevDir)
+    Return : a list of tuples (folder, returnCode, duration), one for each system (in the same order), see startSimu()
+    """
+    
+    if (nb_workers == None):
+      nb_workers = multiprocessing.cpu_count()
+    
+    pool = multiprocessing.Pool(processes=nb_workers)
+    try:
+      results = pool.map(_startSimu, [(self, system) for system in systems])
+    finally:
+      pool.close()
+      pool.join()
+    
+    for (folder, returnCode, duration) in results:
+      if (returnCode != 0):
+        self.__writeLog(folder, ": mercury has returned an error", returnCode)
+    
+    return results
   
   def restartSimu(self, folder):
     """method that allow to continue an existing simulation that crashed via .dmp
@@ -389,94 +574,215 @@ class Simulation(AutiwaObject):
     """
     
     self.folder_simulation = folder
-    prevDir = self.__changeDirectory(os.path.join(LOCATION_DATASIMU, self.meta_simu, Simulation.FOLDER_SIMULATIONS, self.folder_simulation))
     
     self.__writeParameterFiles()
     
     self.__writeLog(self.folder_simulation, ": We re-launch the simulation")
     self.__writeRunning("We re-launch the simulation")
-    temps_debut = time.time()
-    process = subprocess.Popen(LOCATION_PRGM+"/mercury6", stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-    (instance_sortie, instance_erreur) = process.communicate()
-    returnCode = process.poll()
-    temps_fin = time.time()
-    temps_exec = Temps(temps_fin - temps_debut)
+    (returnCode, duration) = self.__runMercury(mode='a')
     
     if (returnCode!=0):
-      self.__writeRunning("mercury has returned an error "+str(returnCode))
       bool_exchange_dmp_tmp = True
     else:
-      self.__writeRunning("mercury has been successfully executed (in "+str(temps_exec)+").")
       bool_exchange_dmp_tmp = False
     
     if bool_exchange_dmp_tmp:
-      self.__writeRunning("We copy *.tmp to *.dmp in case the .dmp's are corrupted")
-      for file in Simulation.LIST_EXCHANGE:
-        if os.path.exists(file):
-          os.remove(file+".dmp")
-      
-      for file in Simulation.LIST_EXCHANGE:
-        process = subprocess.Popen("cp "+file+".tmp "+file+".dmp", stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        (instance_sortie, instance_erreur) = process.communicate()
-        returnCode = process.poll()
-        
-        if (returnCode!=0):
-          self.__writeRunning("cp has returned an error "+str(returnCode)+" while copying "+file+".tmp to "+file+".dmp")
-          self.__writeRunning(instance_erreur)
+      self.__exchangeDumps()
       
       self.__writeRunning("We re-launch mercury")
-      temps_debut = time.time()
-      process = subprocess.Popen(LOCATION_PRGM+"/mercury6", stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-      (instance_sortie, instance_erreur) = process.communicate()
-      returnCode = process.poll()
-      temps_fin = time.time()
-      temps_exec = Temps(temps_fin - temps_debut)
-      
-      if (returnCode!=0):
-        self.__writeRunning("mercury has returned an error "+str(returnCode))
+      (returnCode, duration) = self.__runMercury(mode='a')
+    
+    self.__finishSimu(duration)
+  
+  def listSimus(self):
+    """method that return the list of the names of all the simulations (folders) of the meta-simulation, sorted"""
+    
+    path = self.__simulationsPath()
+    
+    return sorted([folder for folder in os.listdir(path) if os.path.isdir(os.path.join(path, folder))])
+  
+  def classifySimu(self, folder):
+    """method that determine the state of a simulation from its dump files and its logs
+    
+    Parameters :
+    folder : the name of the folder of the simulation
+    
+    Return : one of Simulation.RUN_FINISHED, RUN_RUNNING, RUN_CRASHED, RUN_CORRUPTED, RUN_INCOMPLETE
+    """
+    
+    self.folder_simulation = folder
+    path = self.__simulationPath()
+    
+    info = os.path.join(path, "info.out")
+    if (os.path.exists(info) and (_lastLine(info, "Integration complete") != None)):
+      return Simulation.RUN_FINISHED
+    
+    # If mercury wrote something recently (or if the folder was just created), we do not touch the simulation
+    last_modification = os.path.getmtime(path)
+    for file in glob.glob(os.path.join(path, "*.out")) + glob.glob(os.path.join(path, "*.dmp")):
+      last_modification = max(last_modification, os.path.getmtime(file))
+    if (time.time() - last_modification < Simulation.IDLE_TIME):
+      return Simulation.RUN_RUNNING
+    
+    if self.__isCorrupted("dmp"):
+      return Simulation.RUN_CORRUPTED
+    
+    # We search the last return code of mercury written in the logs
+    running = os.path.join(path, Simulation.LOG_RUNNING)
+    stderr = os.path.join(path, Simulation.MERCURY_STDERR)
+    last_run = None
+    if os.path.exists(running):
+      last_run = _lastLine(running, "mercury has")
+    if (last_run != None):
+      if ("returned an error" in last_run):
+        return Simulation.RUN_CRASHED
+    elif (os.path.exists(stderr) and (os.path.getsize(stderr) > 0)):
+      # mercury was killed before we could write its return code in the logs
+      return Simulation.RUN_CRASHED
+    
+    return Simulation.RUN_INCOMPLETE
+  
+  def classifySimus(self):
+    """method that determine the state of all the simulations of the meta-simulation
+    
+    Return : a dictionnary whose keys are the names of the simulations and values their states (see classifySimu())
+    """
+    
+    return dict([(folder, self.classifySimu(folder)) for folder in self.listSimus()])
+  
+  def __prepareRecovery(self, folder, state):
+    """method that prepare a simulation to be re-launched, depending on its state
+    
+    Parameters :
+    folder : the name of the folder of the simulation
+    state : the state of the simulation, as returned by classifySimu()
+    
+    Return : the mode used to open the outputs of mercury ('a' to continue from the dumps, 'w' to start again from the beginning)
+    """
+    
+    self.folder_simulation = folder
+    
+    mode = 'a'
+    if (state == Simulation.RUN_CRASHED):
+      self.__exchangeDumps()
+    elif (state == Simulation.RUN_CORRUPTED):
+      if self.__isCorrupted("tmp"):
+        self.__writeRunning("The .dmp and .tmp files are corrupted, we start the simulation again from the beginning")
+        self.__cleanOutputs()
+        mode = 'w'
       else:
-        self.__writeRunning("mercury has been successfully executed (in "+str(temps_exec)+").")
+        self.__exchangeDumps()
     
-    self.__writeRunning("we write stdout/stderr")
-    # On écrit un fichier dans lequel on stocke les valeurs données 
-    # par mercury. Le "f" noté devant est pour file, c'est l'objet correspondant au nom de fichier.
-    fmercury_stdout = open(Simulation.MERCURY_STDOUT, 'a')
-    for ligne in instance_sortie:
-      fmercury_stdout.write(ligne)
-    fmercury_stdout.close()
+    self.__writeRecoveryFiles()
+    self.__writeLog(self.folder_simulation, ": We re-launch the simulation (", state, ")")
+    self.__writeRunning("We re-launch the simulation (", state, ")")
     
-    fmercury_stderr = open(Simulation.MERCURY_STDERR, 'a')
-    for ligne in instance_erreur:
-      fmercury_stderr.write(ligne)
-    fmercury_stderr.close()
+    return mode
+  
+  def recoverSimus(self, states=None, max_running=None, callback=None):
+    """method that scan all the simulations of the meta-simulation, and re-launch those that did not finish. All the 
+    simulations are supervised at the same time by one event loop (see mercury_supervisor.Supervisor).
     
+    What we do depends on the state of the simulation (see classifySimu()) :
+    RUN_INCOMPLETE : we continue the integration from the .dmp files
+    RUN_CRASHED : we replace the .dmp by the .tmp files and continue the integration
+    RUN_CORRUPTED : same as RUN_CRASHED if the .tmp are not corrupted, else we start again from the beginning
     
-    self.__writeRunning("we write the .aei")
-    self.generateOutputFiles(self.folder_simulation)
+    If mercury returns an error once re-launched, we replace the .dmp by the .tmp and try one more time, as in restartSimu().
     
-    # we clean the directory
-    self.__removeParameterFiles()
+    Parameters :
+    states=None : the list of states of the simulations we want to re-launch. By default, RUN_INCOMPLETE, RUN_CRASHED and RUN_CORRUPTED
+    max_running=None : The maximum number of simulations that run at the same time (no limit by default)
+    callback=None : function called with the events of the supervisor (event, run), where run.name is the folder of the simulation
     
+    Return : a list of tuples (folder, returnCode, duration), one for each simulation re-launched (the last run if mercury was launched twice)
+    """
     
-    self.__writeLog(self.folder_simulation, ": The simulation has terminated in", temps_exec)
-    self.__extraSimu()
-    self.__changeDirectory(prevDir)
+    if (states == None):
+      states = [Simulation.RUN_INCOMPLETE, Simulation.RUN_CRASHED, Simulation.RUN_CORRUPTED]
+    
+    # For each simulation, the last 'Run' of mercury
+    runs = {}
+    # The simulations that were already re-launched a second time after an error
+    retried = set()
+    
+    def onEvent(event, run):
+      """Function called by the supervisor for each event"""
+      
+      self.folder_simulation = run.name
+      if (event == "end"):
+        self.__mercuryEnded(run)
+        if ((run.returncode != 0) and (run.name not in retried)):
+          retried.add(run.name)
+          self.__exchangeDumps()
+          self.__writeRunning("We re-launch mercury")
+          runs[run.name] = self.__mercuryRun(mode='a')
+          supervisor.add(runs[run.name])
+        else:
+          self.__finishSimu(run.duration)
+      
+      if (callback != None):
+        callback(event, run)
+    
+    supervisor = Supervisor(max_running=max_running, callback=onEvent)
+    folders = []
+    for (folder, state) in sorted(self.classifySimus().items()):
+      if (state in states):
+        mode = self.__prepareRecovery(folder, state)
+        folders.append(folder)
+        runs[folder] = self.__mercuryRun(mode)
+        supervisor.add(runs[folder])
+    
+    supervisor.run()
+    
+    return [(folder, runs[folder].returncode, runs[folder].duration) for folder in folders]
+  
+  def __duplicateSimu(self, folder, new_folder, link=True):
+    """method that duplicate the folder of a simulation. Only the small files (dumps, parameter files) are really copied. 
+    The big output files are cloned (see CLONE_FILES and CLONE_EXTENSIONS)
+    
+    Parameters :
+    folder : the name of the simulation we want to duplicate
+    new_folder : the name of the new simulation (the folder must not exist)
+    link=True : If False, every file is copied, even if the filesystem allows clones
+    """
+    
+    source = self.__simulationPath(folder)
+    destination = self.__simulationPath(new_folder)
+    
+    os.mkdir(destination)
+    for (directory, subdirectories, files) in os.walk(source):
+      target = os.path.join(destination, os.path.relpath(directory, source))
+      for subdirectory in subdirectories:
+        os.mkdir(os.path.join(target, subdirectory))
+      
+      for file in files:
+        if not(link):
+          shutil.copy2(os.path.join(directory, file), os.path.join(target, file))
+        elif ((file in Simulation.CLONE_FILES) or (os.path.splitext(file)[1] in Simulation.CLONE_EXTENSIONS)):
+          _cloneFile(os.path.join(directory, file), os.path.join(target, file))
+        else:
+          shutil.copy2(os.path.join(directory, file), os.path.join(target, file))
   
-  def extendSimu(self, folder, suptime):
+  def extendSimu(self, folder, suptime, link=True):
     """method that re-run the simulation for a defined time in years
     
     Parameters
     folder : the name of the folder of the simulation we want to extend
     suptime : the amount of time, in years, that we want to extend the simulation
+    link=True : If True, the output files of the original simulation are cloned instead of being copied (see __duplicateSimu())
     
-    Do : will copy all the files of folder in a new one, suffixed by "_ext_by_suptime" then launch the simulation
+    Do : will duplicate the folder in a new one, suffixed by "_ext_by_suptime" then launch the simulation. The lineage of 
+    the new simulation (the simulations it was extended from) is written in LINEAGE_FILE
     """
     self.folder_simulation = folder
     
-    # We go in the folder of the simulation that interest us
-    prevDir = self.__changeDirectory(os.path.join(LOCATION_DATASIMU, self.meta_simu, Simulation.FOLDER_SIMULATIONS, self.folder_simulation))
-    # We get the existing param.in
-    paramin = readParam("param.in")
+    # We get the existing parameters. param.dmp is used if it exists, because param.in is not updated when a simulation 
+    # that was already extended is extended again
+    if os.path.exists(os.path.join(self.__simulationPath(), "param.dmp")):
+      paramin = readParam(os.path.join(self.__simulationPath(), "param.dmp"))
+    else:
+      paramin = readParam(os.path.join(self.__simulationPath(), "param.in"))
     
     # We modifie the stop_time
     paramin.set_stop_time(paramin.get_stop_time() + suptime)
@@ -484,27 +790,18 @@ class Simulation(AutiwaObject):
     
     folder_extended_simulation = self.folder_simulation+"_ext_by_"+str(suptime)
     
-    # We go back in the folder where all the simulations are contained, in order to create the new folder and copy all the data
-    self.__changeDirectory(os.path.join(LOCATION_DATASIMU, self.meta_simu, Simulation.FOLDER_SIMULATIONS))
-    
-    
-    process = subprocess.Popen("cp -R "+self.folder_simulation+" "+folder_extended_simulation, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-    (instance_sortie, instance_erreur) = process.communicate()
-    returnCode = process.poll()
+    self.__duplicateSimu(self.folder_simulation, folder_extended_simulation, link=link)
     
-    if (returnCode!=0):
-      self.__writeRunning("cp has returned an error "+str(returnCode))
-      self.__writeRunning(instance_erreur)
-    
-    # We go in the new directory to write the new param.in parameter file.
-    self.__changeDirectory(os.path.join(LOCATION_DATASIMU, self.meta_simu, Simulation.FOLDER_SIMULATIONS, folder_extended_simulation))
+    # The lineage of the original simulation was copied with the rest, we add the current extension
+    lineage = open(os.path.join(self.__simulationPath(folder_extended_simulation), Simulation.LINEAGE_FILE), 'a')
+    lineage.write("["+str(time.strftime('%d/%m/%Y %H:%M:%S'))+"] "+folder_extended_simulation+" extended from "+
+                  self.folder_simulation+" (stop_time "+str(paramin.get_stop_time())+")\n")
+    lineage.close()
+    self.__writeLog(folder_extended_simulation, ": We extend the simulation", self.folder_simulation, "by", suptime)
     
     # We write the file in this new directory (also in 'param.tmp' because if dmp are corrupted, we can erase the .dmp and rename the .tmp in .dmp)
-    paramin.write("param.dmp")
-    paramin.write("param.tmp")
-    
-    self.__changeDirectory(prevDir)
-    #prépare le dossier, modifie param.in (en le lisant?)
+    paramin.write(os.path.join(self.__simulationPath(folder_extended_simulation), "param.dmp"))
+    paramin.write(os.path.join(self.__simulationPath(folder_extended_simulation), "param.tmp"))
     
     self.restartSimu(folder_extended_simulation)
   
@@ -513,32 +810,29 @@ class Simulation(AutiwaObject):
     
     print("unitaryTests is not implemented for the moment")
   
-  def generateOutputFiles(self, folder):
-    """method that generate outputs files in the current working directory. Before generating the .aei files, the method remove all the .aei files in the current directory, if they exists.
+  def generateOutputFiles(self, folder, archive=None):
+    """method that generate outputs files in the folder of the simulation. Before generating the .aei files, the method remove all the .aei files in this folder, if they exists.
     
     Parameters :
     folder : the name of a simulation in the meta-simu directory defined for the instance
+    archive=None : If True, the outputs are also written in one binary file (see mercury_archive.archive()). By default, Simulation.ARCHIVE_OUTPUTS
     """
     
-    prevDir = self.__changeDirectory(os.path.join(LOCATION_DATASIMU, self.meta_simu, Simulation.FOLDER_SIMULATIONS, folder))
+    if (archive == None):
+      archive = Simulation.ARCHIVE_OUTPUTS
     
-    # We list the .aei files that may exists in the directory
-    process = subprocess.Popen("ls *.aei", stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-    (instance_sortie, instance_erreur) = process.communicate()
-    returnCode = process.poll()
+    path = self.__simulationPath(folder)
     
-    if (returnCode == 0):
-      list_aei = instance_sortie.split("\n")
-      for file in list_aei:
-        if os.path.exists(file):
-          os.remove(file)
+    # We remove the .aei files that may exists in the directory
+    for file in glob.glob(os.path.join(path, "*.aei")):
+      os.remove(file)
     
     temps_debut = time.time()
     
-    process = subprocess.Popen(LOCATION_PRGM+"/element6", stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
+    process = subprocess.Popen(LOCATION_PRGM+"/element6", stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, cwd=path)
     (instance_sortie, instance_erreur) = process.communicate()
     returnCode = process.poll()
-
+    
     temps_fin = time.time()
     temps_exec = Temps(temps_fin - temps_debut)
     
@@ -547,3 +841,83 @@ class Simulation(AutiwaObject):
       self.__writeRunning(instance_erreur)
     else:
       self.__writeRunning("element6 has been successfully executed (in "+str(temps_exec)+").")
+      
+      if archive:
+        self.__writeRunning("The outputs are archived in "+mercury_archive.archive(path))
+
+
+def _atomicCopy(source, destination):
+  """function that copy a file, so that the destination is replaced atomically : the content is first copied in a 
+  temporary file, in the same folder, that is then renamed (os.rename replace the destination in one operation)
+  
+  Parameters :
+  source : the path of the file to copy
+  destination : the path of the copy
+  """
+  
+  temporary = destination+".swap"
+  shutil.copyfile(source, temporary)
+  os.rename(temporary, destination)
+
+def _cloneFile(source, destination):
+  """function that clone a file : the new file share the blocks of the original one until one of them is modified 
+  (reflink, available on btrfs and xfs for instance). If the filesystem does not allow it, the file is copied.
+  
+  Parameters :
+  source : the path of the existing file
+  destination : the path of the clone
+  """
+  
+  source_file = open(source, 'rb')
+  destination_file = open(destination, 'wb')
+  try:
+    fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+  except (IOError, OSError):
+    shutil.copyfileobj(source_file, destination_file)
+  finally:
+    source_file.close()
+    destination_file.close()
+  shutil.copystat(source, destination)
+
+def _containsNaN(filename):
+  """function that return True if the file contains NaN or infinite values (as written by fortran)"""
+  
+  data_file = open(filename, 'r')
+  for line in data_file:
+    if NAN_REGEXP.search(line):
+      data_file.close()
+      return True
+  data_file.close()
+  
+  return False
+
+def _lastLine(filename, text):
+  """function that return the last line of the file that contains the text, None if no line contains it
+  
+  Parameters :
+  filename : the name of the file
+  text : the text we search
+  """
+  
+  last_line = None
+  data_file = open(filename, 'r')
+  for line in data_file:
+    if (text in line):
+      last_line = line
+  data_file.close()
+  
+  return last_line
+
+def _startSimu(arguments):
+  """function that run one simulation in a process of the pool of Simulation.startSimus(). Because the
+  function must be pickled, it can not be a method.
+  
+  Parameters :
+  arguments : a tuple (simulation, system) with an object of type 'Simulation' and the 'PlanetarySystem' to integrate
+  
+  Return : a tuple (folder, returnCode, duration), see Simulation.startSimu()
+  """
+  
+  (simulation, system) = arguments
+  
+  return simulation.startSimu(system)
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""module that run and supervise several external programs (mercury6, element6, ...) from a single event loop.
+The outputs of the processes are streamed directly to files, by blocks of limited size, instead of being stored in
+memory until the end of the process. Events (start, output, end of a process, and periodic ticks) are sent to a
+callback function, to follow the progress of the runs.
+
+The loop is based on select() on the pipes of the processes, so that it works with python 2 (asyncio is only
+available in python 3)."""
+
+__author__ = "Autiwa <autiwa@gmail.com>"
+__date__ = "2026-10-18"
+__version__ = "1.0"
+
+import os
+import select
+import subprocess
+import time
+
+# Maximum number of bytes read at once in the output of a process. This is the maximum memory used for each pipe.
+BUFFER_SIZE = 65536
+
+# Maximum time (in seconds) we wait for an output, used for the periodic 'tick' events
+TICK_INTERVAL = 1.
+
+class Run(object):
+  """class that define one process to run
+
+  Parameters :
+  command : the command to execute (run in a shell)
+  cwd=None : the working directory of the process (the current one by default)
+  stdout=None : the name of the file where the standard output of the process is written (discarded if None)
+  stderr=None : the name of the file where the error output of the process is written (discarded if None)
+  mode='w' : the mode used to open stdout and stderr files ('a' to append to existing files)
+  name=None : the name of the run, used to identify it in the events. By default, the command
+
+  Attributes :
+  self.returncode : the return code of the process (None while it is running)
+  self.start_time, self.end_time : start and end of the process (as given by time.time())
+  self.bytes_stdout, self.bytes_stderr : the number of bytes written by the process so far
+  """
+
+  def __init__(self, command, cwd=None, stdout=None, stderr=None, mode='w', name=None):
+    """Initialisation of the object"""
+
+    self.command = command
+    self.cwd = cwd
+    self.stdout = stdout
+    self.stderr = stderr
+    self.mode = mode
+
+    if (name == None):
+      self.name = command
+    else:
+      self.name = name
+
+    self.process = None
+    self.returncode = None
+    self.start_time = None
+    self.end_time = None
+    self.bytes_stdout = 0
+    self.bytes_stderr = 0
+
+    # For each file descriptor of the process, the file where we write the output
+    self.__outputs = {}
+
+  @property
+  def duration(self):
+    """The running time of the process (in seconds), up to now if it is still running"""
+
+    if (self.start_time == None):
+      return 0.
+    elif (self.end_time == None):
+      return time.time() - self.start_time
+    else:
+      return self.end_time - self.start_time
+
+  def __openOutput(self, filename):
+    """Return a file object where the output is written, from the name given in parameter"""
+
+    if (filename == None):
+      filename = os.devnull
+    elif (self.cwd != None):
+      filename = os.path.join(self.cwd, filename)
+
+    return open(filename, self.mode+'b')
+
+  def start(self):
+    """Launch the process"""
+
+    self.start_time = time.time()
+    self.process = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True,
+                                    cwd=self.cwd, close_fds=True)
+
+    self.__outputs[self.process.stdout.fileno()] = ("stdout", self.__openOutput(self.stdout))
+    self.__outputs[self.process.stderr.fileno()] = ("stderr", self.__openOutput(self.stderr))
+
+  def fileno(self):
+    """Return the list of the file descriptors still open for the process"""
+
+    return list(self.__outputs.keys())
+
+  def read(self, fd, buffer_size=BUFFER_SIZE):
+    """Read at most 'buffer_size' bytes of the output 'fd' of the process and write them in the corresponding file.
+
+    Return : the number of bytes read (0 if the pipe is closed, in which case the file is closed)
+    """
+
+    (stream, output) = self.__outputs[fd]
+    data = os.read(fd, buffer_size)
+
+    if not(data):
+      output.close()
+      del(self.__outputs[fd])
+      return 0
+
+    output.write(data)
+    output.flush()
+    if (stream == "stdout"):
+      self.bytes_stdout += len(data)
+    else:
+      self.bytes_stderr += len(data)
+
+    return len(data)
+
+  def isFinished(self):
+    """Return True if the outputs of the process are closed. In that case, we wait for the process and get its return code"""
+
+    if (self.__outputs):
+      return False
+
+    if (self.returncode == None):
+      self.returncode = self.process.wait()
+      self.process.stdout.close()
+      self.process.stderr.close()
+      self.end_time = time.time()
+
+    return True
+
+class Supervisor(object):
+  """class that run several processes ('Run' objects) at the same time, and follow their outputs in a single loop
+
+  Parameters :
+  max_running=None : The maximum number of processes that run at the same time (no limit by default)
+  callback=None : function called with two arguments (event, run) where event is one of :
+                  "start" : the process is launched
+                  "output" : the process wrote something (the number of bytes is in run.bytes_stdout and run.bytes_stderr)
+                  "end" : the process is finished (its return code is in run.returncode)
+                  "tick" : sent every 'tick_interval' seconds for each running process
+  buffer_size=BUFFER_SIZE : the maximum number of bytes read at once in an output
+  tick_interval=TICK_INTERVAL : time between two 'tick' events (seconds)
+
+  Example :
+  supervisor = Supervisor(max_running=4)
+  supervisor.add(Run("mercury6", cwd=folder, stdout="mercury_stdout.txt", stderr="mercury_stderr.txt"))
+  runs = supervisor.run()
+  """
+
+  def __init__(self, max_running=None, callback=None, buffer_size=BUFFER_SIZE, tick_interval=TICK_INTERVAL):
+    """Initialisation of the object"""
+
+    self.max_running = max_running
+    self.callback = callback
+    self.buffer_size = buffer_size
+    self.tick_interval = tick_interval
+
+    self.runs = []
+    self.__waiting = []
+    self.__running = []
+
+  def add(self, *runs):
+    """Add one or several 'Run' objects to the list of processes to run"""
+
+    for run in runs:
+      self.runs.append(run)
+      self.__waiting.append(run)
+
+  def __event(self, event, run):
+    """Send an event to the callback function, if any"""
+
+    if (self.callback != None):
+      self.callback(event, run)
+
+  def __startWaiting(self):
+    """Launch the waiting processes, within the limit of 'max_running'"""
+
+    while (self.__waiting and ((self.max_running == None) or (len(self.__running) < self.max_running))):
+      run = self.__waiting.pop(0)
+      run.start()
+      self.__running.append(run)
+      self.__event("start", run)
+
+  def run(self):
+    """Run all the processes and return when they are all finished
+
+    Return : the list of the 'Run' objects, in the order they were added
+    """
+
+    last_tick = time.time()
+    self.__startWaiting()
+
+    while self.__running:
+      # For each file descriptor, the run it belongs to
+      descriptors = {}
+      for run in self.__running:
+        for fd in run.fileno():
+          descriptors[fd] = run
+
+      if descriptors:
+        (readable, writable, exceptional) = select.select(list(descriptors.keys()), [], [], self.tick_interval)
+      else:
+        readable = []
+
+      for fd in readable:
+        run = descriptors[fd]
+        if (run.read(fd, self.buffer_size) > 0):
+          self.__event("output", run)
+
+      for run in list(self.__running):
+        if run.isFinished():
+          self.__running.remove(run)
+          self.__event("end", run)
+
+      if (time.time() - last_tick >= self.tick_interval):
+        last_tick = time.time()
+        for run in self.__running:
+          self.__event("tick", run)
+
+      self.__startWaiting()
+
+    return self.runs
+
+if __name__ == '__main__':
+  # We run several processes at the same time, displaying the events
+  def display(event, run):
+    print("[%.1fs] %s : %s (%d bytes)" % (run.duration, run.name, event, run.bytes_stdout))
+
+  supervisor = Supervisor(max_running=2, callback=display)
+  for i in range(4):
+    supervisor.add(Run("for j in 1 2 3; do echo %d $j; sleep 0.5; done" % i, name="run%d" % i))
+  for run in supervisor.run():
+    print("%s : return code %d in %.1fs" % (run.name, run.returncode, run.duration))
@@ -14,6 +14,13 @@ import autiwa
 import subprocess
 import pdb
 import os
+import numpy as np
+
+# Number of header lines at the beginning of each .aei file generated by element6
+AEI_HEADER_LINES = 4
+
+# Number of lines read at once by iter_aei()
+AEI_CHUNK_LINES = 65536
 
 #~ # Dictionnary that store, for each server, the location of the binaries for mercury (in this folder, there are mercury, element and close
 #~ BINARY_FOLDER = {'arguin.obs.u-bordeaux1.fr':"/home/cossou/bin/mercury", 
@@ -223,7 +230,7 @@ def get_column_position(filename):
   
   object_file = open(filename, 'r')
   
-  for i in range(4):
+  for i in range(AEI_HEADER_LINES):
     object_file.readline()
   
   line = object_file.readline()
@@ -243,3 +250,167 @@ def get_column_position(filename):
     marks.append(pos)
   
   return marks
+
+def get_aei_dtype(format_sortie=None, folder=None):
+  """function that return the numpy dtype of the lines of a .aei file, built from the 'format_sortie' of element.in. 
+  The first field is always 'time', then there is one field per code letter of the output format (a, e, i, g, n, l, m...)
+  
+  Parameter : 
+  format_sortie=None : the output format of element.in (for instance " a8.5 e8.6 i8.4 g8.4 n8.4 l8.4 m13e "). If nothing is 
+                       given, we read 'element.in' in 'folder', or use the default format of 'Element' if there is no 
+                       such file or no folder. The current working directory is never used.
+  folder=None : the folder of the simulation, where element.in is read if 'format_sortie' is not given
+  
+  Return : 
+  a numpy dtype whose field names are 'time' then the code letters of the format
+  """
+  
+  if (format_sortie == None):
+    elementin = mercury.Element()
+    if ((folder != None) and os.path.isfile(os.path.join(folder, "element.in"))):
+      elementin.read(os.path.join(folder, "element.in"))
+    format_sortie = elementin.format_sortie
+  
+  # The code letter is the first character of each word (for instance 'a' for 'a8.5')
+  names = ["time"] + [word[0] for word in format_sortie.split()]
+  
+  return np.dtype([(name, np.float64) for name in names])
+
+def read_aei(filename, marks=None, format_sortie=None, mmap=True):
+  """function that read an entire .aei file at once and return its content as a numpy structured array. 
+  Every line of a .aei file has the same width, so we see the data as a 2D array of characters and convert each column 
+  in one vectorized operation instead of slicing each line in python.
+  
+  Parameters : 
+  filename : the name of the .aei file to read
+  marks=None : the list of column positions, as returned by get_column_position(). They are the same for all the .aei 
+               files of a simulation, so you can compute them once and give them for all the files. If nothing is 
+               given, they are computed from 'filename'.
+  format_sortie=None : the output format of element.in, used to name the fields. By default, it is read in the 
+                       element.in of the folder of the .aei file (see get_aei_dtype())
+  mmap=True : If True, the file is memory-mapped instead of being read in memory
+  
+  Return : 
+  a numpy structured array with one element per line of data, and fields 'time', 'a', 'e', 'i'... 
+  (for instance data['a'] is the semi-major axis for each output)
+  
+  Example : 
+  marks = get_column_position("PLANET1.aei")
+  for aei_file in get_aei_files():
+    data = read_aei(aei_file, marks=marks)
+  """
+  
+  if (marks == None):
+    marks = get_column_position(filename)
+  
+  # element.in is read in the folder of the .aei file
+  dtype = get_aei_dtype(format_sortie, folder=os.path.dirname(os.path.abspath(filename)))
+  
+  if (len(dtype.names) != len(marks) - 1):
+    raise ValueError("There is %d columns in '%s' but %d names in the output format %s" % (len(marks) - 1, filename, len(dtype.names), dtype.names))
+  
+  # We get the size of the header and the width of a line (including the '\n') with the first data line
+  object_file = open(filename, 'rb')
+  offset = 0
+  for i in range(AEI_HEADER_LINES):
+    offset += len(object_file.readline())
+  line_length = len(object_file.readline())
+  object_file.close()
+  
+  data = np.empty(0, dtype=dtype)
+  if (line_length == 0):
+    return data
+  
+  if mmap:
+    raw = np.memmap(filename, dtype=np.uint8, mode='r', offset=offset)
+  else:
+    raw = np.fromfile(filename, dtype=np.uint8)[offset:]
+  
+  # The last line may not end with a '\n'
+  if ((raw.size % line_length) == (line_length - 1)):
+    raw = np.append(raw, np.uint8(ord("\n")))
+  
+  if ((raw.size % line_length) != 0):
+    raise ValueError("The lines of '%s' do not have the same width" % filename)
+  
+  table = raw.reshape(-1, line_length)
+  
+  if not(np.all(table[:, -1] == ord("\n"))):
+    raise ValueError("The lines of '%s' do not have the same width" % filename)
+  
+  return _decode_aei_table(table, dtype, marks)
+
+def _decode_aei_table(table, dtype, marks):
+  """function that convert the lines of a .aei file, seen as a 2D array of characters (one line per row), in a numpy 
+  structured array (see read_aei())"""
+  
+  data = np.empty(table.shape[0], dtype=dtype)
+  for (name, start, end) in zip(dtype.names, marks[:-1], marks[1:]):
+    # Each column is seen as an array of strings of fixed width that numpy convert directly into floats
+    column = np.ascontiguousarray(table[:, start:end])
+    data[name] = column.view("S%d" % (end - start)).ravel().astype(np.float64)
+  
+  return data
+
+def iter_aei(filename, chunk_size=AEI_CHUNK_LINES, marks=None, format_sortie=None):
+  """generator that read a .aei file by blocks of lines, so that a long history can be analysed without loading 
+  it entirely in memory. 
+  
+  Parameters : 
+  filename : the name of the .aei file to read
+  chunk_size=AEI_CHUNK_LINES : the maximum number of lines of each block
+  marks=None : the list of column positions, see read_aei()
+  format_sortie=None : the output format of element.in, see read_aei()
+  
+  Return : 
+  yield numpy structured arrays of at most 'chunk_size' elements, with the same fields as read_aei()
+  
+  Example : 
+  for data in iter_aei("PLANET1.aei"):
+    print(data['a'].max())
+  """
+  
+  if (marks == None):
+    marks = get_column_position(filename)
+  
+  # element.in is read in the folder of the .aei file
+  dtype = get_aei_dtype(format_sortie, folder=os.path.dirname(os.path.abspath(filename)))
+  
+  if (len(dtype.names) != len(marks) - 1):
+    raise ValueError("There is %d columns in '%s' but %d names in the output format %s" % (len(marks) - 1, filename, len(dtype.names), dtype.names))
+  
+  object_file = open(filename, 'rb')
+  for i in range(AEI_HEADER_LINES):
+    object_file.readline()
+  
+  # The width of a line (including the '\n') is given by the first data line
+  offset = object_file.tell()
+  line_length = len(object_file.readline())
+  object_file.seek(offset)
+  
+  if (line_length == 0):
+    object_file.close()
+    return
+  
+  while True:
+    raw = np.frombuffer(object_file.read(chunk_size * line_length), dtype=np.uint8)
+    if (raw.size == 0):
+      break
+    
+    # The last line may not end with a '\n'
+    if ((raw.size % line_length) == (line_length - 1)):
+      raw = np.append(raw, np.uint8(ord("\n")))
+    
+    if ((raw.size % line_length) != 0):
+      object_file.close()
+      raise ValueError("The lines of '%s' do not have the same width" % filename)
+    
+    table = raw.reshape(-1, line_length)
+    
+    if not(np.all(table[:, -1] == ord("\n"))):
+      object_file.close()
+      raise ValueError("The lines of '%s' do not have the same width" % filename)
+    
+    yield _decode_aei_table(table, dtype, marks)
+  
+  object_file.close()
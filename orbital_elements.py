@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""module that contains vectorized conversions between cartesian coordinates and orbital elements. Every function work
+on numpy arrays (one element per body or per output) so that we can convert whole histories or whole planetary systems
+in one call. The conventions (units, angles, special cases) are the same as the ones of mercury (Chambers, 1999)."""
+
+__author__ = "Autiwa <autiwa@gmail.com>"
+__date__ = "2026-10-18"
+__version__ = "1.0"
+
+import numpy as np
+from constants import G0, DEGTORAD, RADTODEG
+
+TWOPI = 2. * np.pi
+
+# Maximum number of iterations of the Newton-Raphson method when solving Kepler's equation
+KEPLER_MAX_ITERATIONS = 50
+KEPLER_PRECISION = 1e-14
+
+# Orbits whose eccentricity is closer to 1 than this are considered parabolic when computed from cartesian coordinates
+PARABOLA_TOLERANCE = 1e-12
+
+STYLES = ("Asteroidal", "Cometary", "Cartesian")
+
+def solve_kepler(M, e):
+  """Solves Kepler's equation for arrays of mean anomalies and eccentricities, with the Newton-Raphson method applied 
+  on all the bodies at the same time.
+  
+  Parameters :
+  M : the mean anomaly (radians)
+  e : the eccentricity
+  
+  Return :
+  The eccentric anomaly E (M = E - e sin(E)) for ellipses, the hyperbolic anomaly F (M = e sinh(F) - F) for 
+  hyperbolas and D = tan(f/2) (M = D + D^3 / 3, Barker's equation, f being the true anomaly) for parabolas, in radians
+  """
+  
+  (M, e) = np.broadcast_arrays(np.asarray(M, dtype=np.float64), np.asarray(e, dtype=np.float64))
+  M = M.copy()
+  
+  isEllipse = (e < 1.)
+  isHyperbola = (e > 1.)
+  
+  with np.errstate(divide='ignore', invalid='ignore'):
+    # Ellipse : we reduce M between -pi and pi, and start from the value given by Danby (1988)
+    M_ellipse = (M + np.pi) % TWOPI - np.pi
+    anomaly = np.where(isEllipse, M_ellipse + 0.85 * e * np.sign(np.sin(M_ellipse)), 
+                       np.sign(M) * np.log(2. * np.abs(M) / e + 1.8))
+    
+    for iteration in range(KEPLER_MAX_ITERATIONS):
+      f_ellipse = anomaly - e * np.sin(anomaly) - M_ellipse
+      df_ellipse = 1. - e * np.cos(anomaly)
+      f_hyperbola = e * np.sinh(anomaly) - anomaly - M
+      df_hyperbola = e * np.cosh(anomaly) - 1.
+      
+      delta = np.where(isEllipse, f_ellipse / df_ellipse, np.where(isHyperbola, f_hyperbola / df_hyperbola, 0.))
+      anomaly = anomaly - delta
+      
+      if not(np.any(np.abs(delta) > KEPLER_PRECISION * np.maximum(1., np.abs(anomaly)))):
+        break
+    
+    # For the ellipse, we add back the number of revolutions we removed
+    anomaly = np.where(isEllipse, anomaly + (M - M_ellipse), anomaly)
+    
+    # Parabola : analytic solution of Barker's equation
+    A = 1.5 * M
+    B = np.cbrt(A + np.sqrt(A * A + 1.))
+    anomaly = np.where(isEllipse | isHyperbola, anomaly, B - 1. / B)
+  
+  return anomaly
+
+def mean_motion(q, e, mu):
+  """Return the mean motion (radians per day) of bodies given their pericentre q (AU), eccentricity and mu (AU^3/day^2).
+  For parabolas, the convention of Barker's equation is used, i.e sqrt(mu / (2 q^3))"""
+  
+  q = np.asarray(q, dtype=np.float64)
+  e = np.asarray(e, dtype=np.float64)
+  
+  with np.errstate(divide='ignore', invalid='ignore'):
+    a = np.abs(q / (1. - e))
+    return np.where(e == 1., np.sqrt(mu / (2. * q**3)), np.sqrt(mu / a**3))
+
+def _elements_to_cartesian(q, e, I, g, n, M, mu):
+  """Calculates cartesian coordinates given the pericentre q and the other orbital elements (angles in radians).
+  This is a vectorized version of the routine mco_el2x of mercury."""
+  
+  (q, e, I, g, n, M, mu) = np.broadcast_arrays(*[np.asarray(var, dtype=np.float64) for var in (q, e, I, g, n, M, mu)])
+  
+  # Rotation matrix
+  ci, si = np.cos(I), np.sin(I)
+  cg, sg = np.cos(g), np.sin(g)
+  cn, sn = np.cos(n), np.sin(n)
+  z1 = cg * cn
+  z2 = cg * sn
+  z3 = sg * cn
+  z4 = sg * sn
+  d11 = z1 - z4 * ci
+  d12 = z2 + z3 * ci
+  d13 = sg * si
+  d21 = -z3 - z2 * ci
+  d22 = -z4 + z1 * ci
+  d23 = cg * si
+  
+  anomaly = solve_kepler(M, e)
+  
+  with np.errstate(divide='ignore', invalid='ignore'):
+    a = q / (1. - e)
+    romes = np.sqrt(np.abs(1. - e * e))
+    
+    # Ellipse
+    se, ce = np.sin(anomaly), np.cos(anomaly)
+    temp = np.sqrt(mu / a) / (1. - e * ce)
+    position = (a * (ce - e), a * romes * se)
+    velocity = (-se * temp, romes * ce * temp)
+    
+    # Hyperbola
+    she, che = np.sinh(anomaly), np.cosh(anomaly)
+    temp = np.sqrt(mu / np.abs(a)) / (e * che - 1.)
+    position_h = (a * (che - e), -a * romes * she)
+    velocity_h = (-she * temp, romes * che * temp)
+    
+    # Parabola
+    temp = np.sqrt(2. * mu / q) / (1. + anomaly * anomaly)
+    position_p = (q * (1. - anomaly * anomaly), 2. * q * anomaly)
+    velocity_p = (-anomaly * temp, temp)
+  
+  isEllipse = (e < 1.)
+  isHyperbola = (e > 1.)
+  (z1, z2, z3, z4) = [np.where(isEllipse, ell, np.where(isHyperbola, hyp, par)) for (ell, hyp, par) in 
+                      zip(position + velocity, position_h + velocity_h, position_p + velocity_p)]
+  
+  x = d11 * z1 + d21 * z2
+  y = d12 * z1 + d22 * z2
+  z = d13 * z1 + d23 * z2
+  vx = d11 * z3 + d21 * z4
+  vy = d12 * z3 + d22 * z4
+  vz = d13 * z3 + d23 * z4
+  
+  return (x, y, z, vx, vy, vz)
+
+def _cartesian_to_elements(x, y, z, vx, vy, vz, mu):
+  """Calculates (q, e, I, g, n, M) given cartesian coordinates, angles in radians. 
+  This is a vectorized version of the routine mco_x2el of mercury."""
+
+  (x, y, z, vx, vy, vz, mu) = np.broadcast_arrays(*[np.asarray(var, dtype=np.float64) for var in (x, y, z, vx, vy, vz, mu)])
+
+  with np.errstate(divide='ignore', invalid='ignore'):
+    hx = y * vz - z * vy
+    hy = z * vx - x * vz
+    hz = x * vy - y * vx
+    h2 = hx * hx + hy * hy + hz * hz
+    v2 = vx * vx + vy * vy + vz * vz
+    rv = x * vx + y * vy + z * vz
+    r = np.sqrt(x * x + y * y + z * z)
+    h = np.sqrt(h2)
+    s = h2 / mu
+
+    # Inclination and node
+    ci = hz / h
+    isInclined = (np.abs(ci) < 1.)
+    I = np.where(isInclined, np.arccos(np.clip(ci, -1., 1.)), np.where(ci < 0., np.pi, 0.))
+    n = np.where(isInclined, np.arctan2(hx, -hy) % TWOPI, 0.)
+
+    # Eccentricity and perihelion distance
+    temp = 1. + s * (v2 / mu - 2. / r)
+    e = np.sqrt(np.maximum(temp, 0.))
+    # Rounding errors prevent e to be exactly 1 for parabolic orbits
+    e = np.where(np.abs(e - 1.) < PARABOLA_TOLERANCE, 1., e)
+    q = s / (1. + e)
+
+    # True longitude
+    to = -hx / hy
+    temp = (1. - ci) * to
+    tmp2 = to * to
+    true = np.where(hy != 0.,
+                    np.arctan2(y * (1. + tmp2 * ci) - x * temp, x * (tmp2 + ci) - y * temp),
+                    np.arctan2(y * ci, x))
+    true = np.where(ci < 0., true + np.pi, true)
+
+    ce = (v2 * r - mu) / (e * mu)
+
+    # Mean anomaly for ellipse
+    bige = np.arccos(np.clip(ce, -1., 1.))
+    bige = np.where(rv < 0., TWOPI - bige, bige)
+    l_ellipse = bige - e * np.sin(bige)
+
+    # Mean anomaly for hyperbola
+    ceh = np.maximum(ce, 1.)
+    bigf = np.log(ceh + np.sqrt(ceh * ceh - 1.))
+    bigf = np.where(rv < 0., -bigf, bigf)
+    l_hyperbola = e * np.sinh(bigf) - bigf
+
+    # Longitude of perihelion
+    cf = np.clip((s - r) / (e * r), -1., 1.)
+    f = np.arccos(cf)
+    f = np.where(rv < 0., TWOPI - f, f)
+    p = (true - f + 2. * TWOPI) % TWOPI
+
+    # Mean anomaly for parabola (Barker's equation)
+    D = np.tan(f / 2.)
+    l_parabola = D + D * D * D / 3.
+
+    l = np.where(e < 1., l_ellipse, np.where(e > 1., l_hyperbola, l_parabola))
+
+    # For circular orbits, the longitude of pericentre is not defined
+    isCircular = (e < 3e-8)
+    p = np.where(isCircular, 0., p)
+    l = np.where(isCircular, true, l)
+
+    l = np.where(e < 1., l % TWOPI, l)
+
+    g = (p - n) % TWOPI
+
+  return (q, e, I, g, n, l)
+
+def cartesian_to_elements(x, y, z, vx, vy, vz, mu):
+  """Calculates the asteroidal orbital elements of bodies given their cartesian coordinates.
+  This is a vectorized version of the routine mco_x2el of mercury, used by element6.
+
+  Parameters :
+  x, y, z : the 3 components of position in AU (arrays or floats)
+  vx, vy, vz : the 3 components of velocity in AU/day
+  mu : G * (m_central + m_body), in AU^3/day^2 (i.e in solar mass multiplied by constants.G0)
+
+  Return :
+  (a, e, I, g, n, M) where a is the semi-major axis (in AU), e the eccentricity, I the inclination, g the argument of
+  pericentre, n the longitude of the ascending node and M the mean anomaly (angles in degrees between 0 and 360, except
+  for the mean anomaly of hyperbolic orbits)
+  """
+
+  (q, e, I, g, n, M) = _cartesian_to_elements(x, y, z, vx, vy, vz, mu)
+
+  with np.errstate(divide='ignore', invalid='ignore'):
+    a = q / (1. - e)
+
+  return (a, e, I * RADTODEG, g * RADTODEG, n * RADTODEG, M * RADTODEG)
+
+def asteroidal_to_cartesian(a, e, I, g, n, M, mu):
+  """Calculates cartesian coordinates of bodies given their asteroidal orbital elements (vectorized version of mco_el2x)
+
+  Parameters :
+  a, e, I, g, n, M : semi-major axis (AU), eccentricity, inclination, argument of pericentre, longitude of the ascending
+                     node and mean anomaly (angles in degrees). Parabolic orbits are not possible in asteroidal elements
+  mu : G * (m_central + m_body), in AU^3/day^2
+
+  Return :
+  (x, y, z, vx, vy, vz) in AU and AU/day
+  """
+
+  a = np.asarray(a, dtype=np.float64)
+  e = np.asarray(e, dtype=np.float64)
+
+  return _elements_to_cartesian(a * (1. - e), e, I * DEGTORAD, g * DEGTORAD, n * DEGTORAD, M * DEGTORAD, mu)
+
+def cometary_to_cartesian(q, e, I, g, n, T, mu, epoch):
+  """Calculates cartesian coordinates of bodies given their cometary orbital elements
+
+  Parameters :
+  q, e, I, g, n : pericentre (AU), eccentricity, inclination, argument of pericentre and longitude of the ascending
+                  node (angles in degrees)
+  T : epoch of pericentre (days)
+  mu : G * (m_central + m_body), in AU^3/day^2
+  epoch : the epoch (days) at which the coordinates are wanted
+
+  Return :
+  (x, y, z, vx, vy, vz) in AU and AU/day
+  """
+
+  M = (epoch - np.asarray(T, dtype=np.float64)) * mean_motion(q, e, mu)
+
+  return _elements_to_cartesian(q, e, I * DEGTORAD, g * DEGTORAD, n * DEGTORAD, M, mu)
+
+def cartesian_to_cometary(x, y, z, vx, vy, vz, mu, epoch):
+  """Calculates the cometary orbital elements of bodies given their cartesian coordinates
+
+  Parameters :
+  x, y, z : the 3 components of position in AU
+  vx, vy, vz : the 3 components of velocity in AU/day
+  mu : G * (m_central + m_body), in AU^3/day^2
+  epoch : the epoch (days) of the coordinates
+
+  Return :
+  (q, e, I, g, n, T) with angles in degrees and the epoch of pericentre T in days
+  """
+
+  (q, e, I, g, n, M) = _cartesian_to_elements(x, y, z, vx, vy, vz, mu)
+
+  # The pericentre passage used is the one in the last half of orbit for ellipses
+  M = np.where(e < 1., (M + np.pi) % TWOPI - np.pi, M)
+  T = epoch - M / mean_motion(q, e, mu)
+
+  return (q, e, I * RADTODEG, g * RADTODEG, n * RADTODEG, T)
+
+def asteroidal_to_cometary(a, e, I, g, n, M, mu, epoch):
+  """Converts asteroidal orbital elements (a, e, I, g, n, M) into cometary orbital elements (q, e, I, g, n, T). 
+  Angles are in degrees, T and epoch in days, mu in AU^3/day^2."""
+
+  a = np.asarray(a, dtype=np.float64)
+  e = np.asarray(e, dtype=np.float64)
+  q = a * (1. - e)
+
+  M = np.asarray(M, dtype=np.float64) * DEGTORAD
+  M = np.where(e < 1., (M + np.pi) % TWOPI - np.pi, M)
+  T = epoch - M / mean_motion(q, e, mu)
+
+  return (q, e, I, g, n, T)
+
+def cometary_to_asteroidal(q, e, I, g, n, T, mu, epoch):
+  """Converts cometary orbital elements (q, e, I, g, n, T) into asteroidal orbital elements (a, e, I, g, n, M). 
+  Angles are in degrees, T and epoch in days, mu in AU^3/day^2. Parabolic orbits can not be converted (a is infinite)."""
+
+  q = np.asarray(q, dtype=np.float64)
+  e = np.asarray(e, dtype=np.float64)
+
+  with np.errstate(divide='ignore', invalid='ignore'):
+    a = q / (1. - e)
+
+  M = (epoch - np.asarray(T, dtype=np.float64)) * mean_motion(q, e, mu)
+  M = np.where(e < 1., M % TWOPI, M)
+
+  return (a, e, I, g, n, M * RADTODEG)
+
+def convert(values, style_in, style_out, mu, epoch=0.):
+  """Converts the coordinates of bodies from one style of mercury to another
+
+  Parameters :
+  values : tuple of 6 arrays, the coordinates in the style 'style_in' ((a, e, I, g, n, M) for "Asteroidal", 
+           (q, e, I, g, n, T) for "Cometary", (x, y, z, vx, vy, vz) for "Cartesian")
+  style_in, style_out : (Asteroidal, Cometary, Cartesian) the styles of the input and output coordinates
+  mu : G * (m_central + m_body), in AU^3/day^2
+  epoch=0. : the epoch of the coordinates (days), used only for cometary elements
+
+  Return :
+  tuple of 6 arrays, the coordinates in the style 'style_out'
+  """
+
+  for style in (style_in, style_out):
+    if (style not in STYLES):
+      raise ValueError("the style of coordinate do not match with anything : "+str(style))
+
+  if (style_in == style_out):
+    return tuple(values)
+
+  if (style_in == "Asteroidal"):
+    if (style_out == "Cometary"):
+      return asteroidal_to_cometary(*values, mu=mu, epoch=epoch)
+    cartesian = asteroidal_to_cartesian(*values, mu=mu)
+  elif (style_in == "Cometary"):
+    if (style_out == "Asteroidal"):
+      return cometary_to_asteroidal(*values, mu=mu, epoch=epoch)
+    cartesian = cometary_to_cartesian(*values, mu=mu, epoch=epoch)
+  else:
+    cartesian = values
+
+  if (style_out == "Asteroidal"):
+    return cartesian_to_elements(*cartesian, mu=mu)
+  elif (style_out == "Cometary"):
+    return cartesian_to_cometary(*cartesian, mu=mu, epoch=epoch)
+  else:
+    return cartesian
+
+if __name__ == '__main__':
+  # The earth, on a circular orbit at 1 AU, with a small inclination
+  v_circ = np.sqrt(G0 / 1.)
+  inc = 5. * DEGTORAD
+  print(cartesian_to_elements(1., 0., 0., 0., v_circ * np.cos(inc), v_circ * np.sin(inc), G0))
@@ -9,6 +9,21 @@ __credits__ = """module to help writing svg files"""
 import pdb
 from autiwa import contrastColor
 
+# Size of the boxes of the graphs (see createGraph()), and space between two layers and between two boxes of the same layer
+BOX_WIDTH = 150
+BOX_HEIGHT = 30
+LAYER_SPACE = 50
+BOX_SPACE = 10
+
+# Number of characters kept in memory by SVGWriter before they are written in the file
+BUFFER_SIZE = 65536
+
+# Number of sweeps (alternatively from the first layer to the last, and the reverse) to reduce the crossings of the edges
+NB_SWEEPS = 4
+
+# First element of the keys of the virtual nodes of getLayers(), that can't be confused with the key of a node
+_VIRTUAL_NODE = object()
+
 SVG_HEAD = """<?xml version="1.0" encoding="UTF-8" standalone="no"?>
 <!-- Created with Inkscape (http://www.inkscape.org/) -->
 
@@ -65,91 +80,427 @@ def createSVG(filename,*boxs):
   """function that create a SVG file that contains all the boxs created previously
   """
   
-  svgfile = open(filename, 'w')
-  svgfile.write(SVG_HEAD)
+  writeSVG(filename, boxs)
+
+def writeSVG(filename, objects):
+  """function that create a SVG file that contains the given objects. The objects are written one after the other 
+  (see SVGWriter), so that 'objects' can be a generator : the objects do not need to exist all at the same time.
+  
+  Parameters :
+  filename : the name of the SVG file
+  objects : an iterable of SVG objects (with a method 'write')
+  """
+  
+  writer = SVGWriter(filename)
+  writer.write(SVG_HEAD)
+  
+  for obj in objects:
+    obj.write(writer)
+  
+  writer.write(SVG_FOOT)
+  writer.close()
+
+class SVGWriter(object):
+  """object in which the SVG objects write their code (see the method 'write' of the SVG objects). The pieces of text 
+  are kept in a buffer, and written in the file when the buffer contains more than 'buffer_size' characters, so that 
+  the memory used does not depend on the size of the document.
+  
+  The ids of the objects are given by the writer (see newId()), when they are written, so that they are unique in the 
+  document.
+  
+  Parameters :
+  output=None : the name of a file, or a file-like object (with a method 'write'). If None, the text is kept in memory, 
+                and can be retrieved with getvalue()
+  buffer_size=BUFFER_SIZE : the number of characters kept before they are written
+  
+  Example :
+  writer = SVGWriter("test.svg")
+  writer.write(SVG_HEAD)
+  TextBox("test", 2, 3).write(writer)
+  writer.write(SVG_FOOT)
+  writer.close()
+  """
+  
+  def __init__(self, output=None, buffer_size=BUFFER_SIZE):
+    
+    if (type(output) == str):
+      self.output = open(output, 'w')
+      self.isOwner = True
+    else:
+      self.output = output
+      self.isOwner = False
+    
+    self.buffer_size = buffer_size
+    self.buffer = []
+    self.length = 0
+    
+    # For each prefix of id ("rect", "text"...), the number of ids already given
+    self.ids = {}
+  
+  def newId(self, prefix):
+    """Return a new id for an object of the document, for instance 'rect12' for the prefix 'rect'"""
+    
+    number = self.ids.get(prefix, 0) + 1
+    self.ids[prefix] = number
+    
+    return prefix+str(number)
+  
+  def write(self, text):
+    """Add a piece of text at the end of the document"""
+    
+    self.buffer.append(text)
+    self.length += len(text)
+    
+    if ((self.output != None) and (self.length >= self.buffer_size)):
+      self.flush()
+  
+  def flush(self):
+    """Write the text of the buffer in the output"""
+    
+    if (self.output == None):
+      return
+    
+    self.output.write("".join(self.buffer))
+    self.buffer = []
+    self.length = 0
+  
+  def getvalue(self):
+    """Return the text written so far (only if there is no output)"""
+    
+    return "".join(self.buffer)
+  
+  def close(self):
+    """Write what remains in the buffer, and close the file if it was opened by the object"""
+    
+    self.flush()
+    if self.isOwner:
+      self.output.close()
+  
+  def __enter__(self):
+    return self
+  
+  def __exit__(self, type, value, traceback):
+    self.close()
+  
+def getLayers(nodes, edges):
+  """function that distribute the nodes of a directed graph in layers, so that every edge goes from a layer to a 
+  following one (the longest path layering), then order the nodes of each layer to reduce the crossings of the edges 
+  (barycenter heuristic), as in the method of Sugiyama. The edges that close a cycle are reversed. An edge that spans 
+  several layers goes through a virtual node in each layer between its ends, so that it can be drawn between the boxes.
+  
+  The time needed is proportional to the number of nodes plus the number of edges times their length in layers (times 
+  NB_SWEEPS)
+  
+  Parameters :
+  nodes : a list of keys, one for each node
+  edges : a list of tuples (parent, child), where parent and child are keys of 'nodes'
+  
+  Return : 
+  layers : a list of layers, each one being the ordered list of its keys, including the keys of the virtual nodes
+  routes : a list of tuples (path, isReversed), one for each edge. 'path' is the list of the keys from one end of the 
+           edge to the other, in the order of the layers. 'isReversed' is True if the edge close a cycle, 'path' going 
+           then from the child to the parent
+  """
+  
+  # The loops and the edges given several times are ignored
+  children = dict([(node, []) for node in nodes])
+  unique_edges = []
+  seen = set()
+  for (parent, child) in edges:
+    if ((child != parent) and not((parent, child) in seen)):
+      seen.add((parent, child))
+      children[parent].append(child)
+      unique_edges.append((parent, child))
+  
+  # We search a topological order with a depth-first search. The edges that go back to a node being visited close a 
+  # cycle
+  state = dict([(node, 0) for node in nodes]) # 0 : not visited, 1 : being visited, 2 : done
+  order = []
+  cycles = set()
+  for root in nodes:
+    if state[root]:
+      continue
+    state[root] = 1
+    stack = [(root, iter(children[root]))]
+    while stack:
+      (node, remaining) = stack[-1]
+      for child in remaining:
+        if (state[child] == 0):
+          state[child] = 1
+          stack.append((child, iter(children[child])))
+          break
+        elif (state[child] == 1):
+          cycles.add((node, child)) # This edge close a cycle
+      else:
+        state[node] = 2
+        order.append(node)
+        stack.pop()
+  order.reverse()
+  
+  # The edges that close a cycle are reversed, so that all the edges follow the topological order
+  forward_edges = []
+  successors = dict([(node, []) for node in nodes])
+  for (parent, child) in unique_edges:
+    if ((parent, child) in cycles):
+      forward_edges.append((child, parent, True))
+      successors[child].append(parent)
+    else:
+      forward_edges.append((parent, child, False))
+      successors[parent].append(child)
+  
+  layer = dict([(node, 0) for node in nodes])
+  for node in order:
+    for child in successors[node]:
+      layer[child] = max(layer[child], layer[node] + 1)
+  
+  if nodes:
+    layers = [[] for i in range(max(layer.values()) + 1)]
+  else:
+    layers = []
+  for node in order:
+    layers[layer[node]].append(node)
+  
+  # The edges between two consecutive layers, with the virtual nodes
+  parents = dict([(node, []) for node in nodes])
+  children = dict([(node, []) for node in nodes])
+  routes = []
+  for (index, (first, last, isReversed)) in enumerate(forward_edges):
+    path = [first]
+    for layer_index in range(layer[first] + 1, layer[last]):
+      virtual = (_VIRTUAL_NODE, index, layer_index)
+      parents[virtual] = []
+      children[virtual] = []
+      layers[layer_index].append(virtual)
+      path.append(virtual)
+    path.append(last)
+    
+    for (parent, child) in zip(path[:-1], path[1:]):
+      children[parent].append(child)
+      parents[child].append(parent)
+    
+    routes.append((path, isReversed))
+  
+  # The position of each node in its layer, between 0 and 1, so that nodes of layers of different sizes can be compared
+  position = {}
+  def setPositions(layer_nodes):
+    for (index, node) in enumerate(layer_nodes):
+      position[node] = (index + 0.5) / len(layer_nodes)
+  
+  for layer_nodes in layers:
+    setPositions(layer_nodes)
+  
+  for sweep in range(NB_SWEEPS):
+    if (sweep % 2 == 0):
+      (sweep_layers, neighbours) = (layers[1:], parents)
+    else:
+      (sweep_layers, neighbours) = (layers[-2::-1], children)
+    
+    def barycenter(node):
+      if not(neighbours[node]):
+        return position[node]
+      return sum([position[neighbour] for neighbour in neighbours[node]]) / len(neighbours[node])
+    
+    for layer_nodes in sweep_layers:
+      layer_nodes.sort(key=barycenter)
+      setPositions(layer_nodes)
+  
+  return (layers, routes)
+
+def createGraph(filename, nodes, edges, direction="leftright"):
+  """function that create a SVG file that represent a directed graph (dependencies of modules, calls of subroutines...). 
+  Each node is drawn once, in layers (see getLayers()), and all the edges that leave a node are drawn in one path, that 
+  share the same trunk. An edge that spans several layers goes between the boxes of the layers it crosses. The edges 
+  that close a cycle are drawn dashed, from the child to the parent, in the order of the layers. 
+  
+  The size of the file is proportional to the number of nodes plus the number of edges times their length in layers.
+  
+  Parameters :
+  filename : the name of the SVG file
+  nodes : a list of tuples (key, text, color), one for each node, the first being the root. 'color' is a string of 6 
+          numbers in hexadecimal, for example "ff8800"
+  edges : a list of tuples (parent, child), where parent and child are keys of 'nodes'
+  direction="leftright" : "leftright" to have the layers from left to right, or "topbottom" for top to bottom
+  """
+  
+  if (direction == "leftright"):
+    (box_length, box_middle) = (BOX_WIDTH, BOX_HEIGHT / 2.)
+    (layer_step, box_step) = (BOX_WIDTH + LAYER_SPACE, BOX_HEIGHT + BOX_SPACE)
+  elif (direction == "topbottom"):
+    (box_length, box_middle) = (BOX_HEIGHT, BOX_WIDTH / 2.)
+    (layer_step, box_step) = (BOX_HEIGHT + LAYER_SPACE, BOX_WIDTH + BOX_SPACE)
+  else:
+    raise ValueError("the 'direction' you typed do not exist. You must choose between: \n_ 'topbottom'\n_ 'leftright'")
+  
+  def point(u, v):
+    """return the coordinates (x, y) of a point, given its position 'u' along the layers and 'v' along a layer"""
+    if (direction == "leftright"):
+      return (u, v)
+    else:
+      return (v, u)
+  
+  (layers, routes) = getLayers([key for (key, text, color) in nodes], edges)
+  
+  # The position of the side of each box facing the previous layer, and of its middle. The layers are centered on the 
+  # largest one. The virtual nodes keep a place in their layer, where the edge goes through.
+  nb_max = max([len(layer) for layer in layers] + [0])
+  side = {}
+  middle = {}
+  for (layer_index, layer) in enumerate(layers):
+    offset = (nb_max - len(layer)) * box_step / 2.
+    for (index, key) in enumerate(layer):
+      side[key] = layer_index * layer_step
+      middle[key] = offset + index * box_step + box_middle
   
-  for box in boxs:
-    svgfile.write(box.getSVGcode())
+  def getLine(path):
+    """return the list of coordinates of an edge, from the middle of the space after the first box of 'path'. The edge 
+    goes through the place of each virtual node, and turns in the middle of the spaces between the layers"""
+    
+    turn = side[path[0]] + box_length + LAYER_SPACE / 2.
+    line = [point(turn, middle[path[0]])]
+    for key in path[1:-1]:
+      line += [point(turn, middle[key]), point(side[key], middle[key])]
+      turn = side[key] + box_length + LAYER_SPACE / 2.
+      line.append(point(turn, middle[key]))
+    line += [point(turn, middle[path[-1]]), point(side[path[-1]], middle[path[-1]])]
+    
+    return line
   
-  svgfile.write(SVG_FOOT)
-  svgfile.close()
+  # The edges that leave each node (in the order of the layers)
+  branches = dict([(key, []) for (key, text, color) in nodes])
+  reversed_lines = []
+  for (path, isReversed) in routes:
+    if isReversed:
+      reversed_lines.append([point(side[path[0]] + box_length, middle[path[0]])] + getLine(path))
+    else:
+      branches[path[0]].append(getLine(path))
   
+  def getObjects():
+    """generator that create the objects of the graph one after the other, as they are written"""
+    
+    for (key, text, color) in nodes:
+      if not(branches[key]):
+        continue
+      # The edges leave the parent by its side facing the next layer, and join at the middle of the space between layers
+      start = point(side[key] + box_length, middle[key])
+      yield MultiPath([start, branches[key][0][0]], *branches[key])
+    
+    if reversed_lines:
+      yield DashedMultiPath(*reversed_lines)
+    
+    for (key, text, color) in nodes:
+      (x, y) = point(side[key], middle[key] - box_middle)
+      yield TextBox(text, x, y, color=color)
+  
+  writeSVG(filename, getObjects())
+
 class SVGobject(object):
   """meta class that contains general behaviours for objects defining 
   svg objects like paths, line, circles, texts and so on
+  
+  The objects only store what is needed to write them (they have no __dict__, see __slots__), because diagrams can 
+  contain tens of thousands of objects. Their ids are given when they are written (see SVGWriter.newId())
   """
   
+  __slots__ = ()
+  
   def __init__(self):
     """initialisation of the instance"""
     
-    # For the moment, nothing is implemented. I wanted to define here 
-    # the incrementation of id, that is, I would not have to define the 
-    # variable and increment it in __init__ in each sub-class, but I 
-    # don't know how to do it, so in order to save time, I skipped.
+    pass
+  
+  def write(self, writer):
+    """write the svg code of the object in 'writer' (an SVGWriter)
+    """
+    
+    raise NotImplementedError("The method 'write' must be defined in each sub-class")
+  
+  def getSVGcode(self):
+    """return the svg code of the object as a string
+    """
+    
+    writer = SVGWriter()
+    self.write(writer)
     
+    return writer.getvalue()
 
-class TextBox(object):
+class TextBox(SVGobject):
   """
-  object that define various properties for a boxed text
+  object that define various properties for a boxed text. The rectangle and the text are only created when the box 
+  is written.
   """
-    
+  
+  __slots__ = ("text", "x", "y", "color", "height", "width")
+  
   def __init__(self,text,x,y,color="ffffff"):
     """We define the text and the position of the box
     """
-        
+    
+    SVGobject.__init__(self)
+    
     self.text = text
     self.x = x
     self.y = y
+    self.color = color
     
     self.height = 30
     self.width = 150
+  
+  @property
+  def rectangle(self):
+    """The 'Rectangle' object of the box"""
     
-    self.text_x = self.x + self.width/2.
-    self.text_y = self.y + 18.
+    rectangle = Rectangle(x=self.x, y=self.y, width=self.width, height=self.height)
+    rectangle.setColor(self.color)
     
-    self.rectangle = Rectangle(x=self.x, y=self.y, width=self.width, height=self.height)
-    self.text = Text(x=self.text_x,y=self.text_y, text=self.text)
+    return rectangle
+  
+  @property
+  def label(self):
+    """The 'Text' object of the box, whose color contrast with the color of the box"""
     
-    self.rectangle.setColor(color)
-    self.text.setColor(contrastColor(color))
-
+    label = Text(x=self.x + self.width/2., y=self.y + 18., text=self.text)
+    label.setColor(contrastColor(self.color))
     
-  def getSVGcode(self):
-    """create a svg text that is thought to represent a text in a box
+    return label
+  
+  def write(self, writer):
+    """write a svg text that is thought to represent a text in a box
     """
     
-    text = Group(self.rectangle, self.text).getSVGcode()
-    
-    return text
+    Group(self.rectangle, self.label).write(writer)
 
 class Group(SVGobject):
   """object that define a group containing the given objets
   
   parameters:
-  objects: a list of SVG object were a method 'getSVGcode' exist. 
+  objects: a list of SVG object were a method 'write' exist. 
   """
   
-  id = 0
+  __slots__ = ("objects",)
   
   def __init__(self, *objects):
     SVGobject.__init__(self)
-    Group.id += 1
-    
-    self.id = Group.id
     
     self.objects = objects
     
-  def getSVGcode(self):
-    """create a svg text that is thought to represent a group and all that he contains
+  def write(self, writer):
+    """write a svg text that is thought to represent a group and all that he contains
     """
     
-    text = "<g\n"
-    text += '  id="g'+str(self.id)+'">\n'
+    writer.write('<g\n  id="%s">\n' % writer.newId("g"))
     for obj in self.objects:
-      text += obj.getSVGcode()
-    text += '</g>\n'
-    
-    return text
+      obj.write(writer)
+    writer.write('</g>\n')
+
+def _getStyle(style, color):
+  """function that return the value of the attribute 'style' of an object, given the default style (a dictionnary) 
+  and the color of the object (a string of 6 numbers in hexadecimal, None for the default color)"""
+  
+  if (color != None):
+    style = dict(style) # The "dict()" is here to make a copy and not a pointer link
+    style["fill"] = "#"+color
+  
+  return ";".join([key+":"+value for (key, value) in style.items()])
 
 class Text(SVGobject):
   """
@@ -161,7 +512,7 @@ class Text(SVGobject):
   text : the text as a string
   """
   
-  id = 0
+  __slots__ = ("x", "y", "text", "color")
   
   STYLE = {"font-size":"14px", "font-style":"normal", "font-variant":"normal", 
   "font-weight":"normal", "font-stretch":"normal", "text-align":"center", 
@@ -170,20 +521,17 @@ class Text(SVGobject):
   "fill-opacity":"1", "stroke":"none", "font-family":"Sans", 
   "-inkscape-font-specification":"Sans"}
   
+  # The style for each color already used, because few colors are used for many objects
+  styles = {}
   
   def __init__(self, text, x, y):
     
     SVGobject.__init__(self)
     
-    Text.id += 1
-    
-    self.id = Text.id
-    
     self.x, self.y = x,y
     
-    self.style = dict(Text.STYLE) # The "dict()" is here to make a copy and not a pointer link
-    
     self.text = text
+    self.color = None
 
   def setColor(self,color):
     """Let us change the color of the Text. 
@@ -192,26 +540,18 @@ class Text(SVGobject):
     color : a string of 6 numbers in hexadecimal, for example "ff8800"
     """
     
-    self.style["fill"] = "#"+color
+    self.color = color
     
-  def getSVGcode(self):
-    """create a svg text that is thought to represent a text in a box
+  def write(self, writer):
+    """write a svg text that is thought to represent a text in a box
     """
-  
-    text = '<text\n'
-    text += '  sodipodi:linespacing="125%"\n'
-    text += '  id="text'+str(self.id)+'"\n'
-    text += '  y="'+str(self.y)+'"\n'
-    text += '  x="'+str(self.x)+'"\n'
-    text += '  style="'
-    
-    list = map(str.__add__, [k+":" for k in self.style.keys()], self.style.values())
-    text += ";".join(list)+'"\n'
     
-    text += '  xml:space="preserve">'+self.text
-    text += '</text>\n'
+    if not(self.color in Text.styles):
+      Text.styles[self.color] = _getStyle(Text.STYLE, self.color)
     
-    return text
+    writer.write('<text\n  sodipodi:linespacing="125%%"\n  id="%s"\n  y="%s"\n  x="%s"\n  style="%s"\n'
+                 '  xml:space="preserve">%s</text>\n' % (writer.newId("text"), self.y, self.x, Text.styles[self.color], 
+                                                        self.text))
     
 
 class Rectangle(SVGobject):
@@ -220,26 +560,25 @@ class Rectangle(SVGobject):
   The coordinate are those of the left top corner of the rectangle
   """
   
+  __slots__ = ("x", "y", "width", "height", "color")
+  
   STYLE = {"fill":"#ffffff", "fill-opacity":"1", "fill-rule":"evenodd", 
   "stroke":"#000000", "stroke-width":"1", "stroke-miterlimit":"4", 
   "stroke-opacity":"1", "stroke-dasharray":"none", "stroke-dashoffset":"0"}
   
-  id = 0
+  # The style for each color already used, because few colors are used for many objects
+  styles = {}
   
   def __init__(self,width,height,x,y):
     
     SVGobject.__init__(self)
     
-    Rectangle.id += 1
-    
     self.x = x
     self.y = y
     
-    self.id = Rectangle.id
-    self.style = dict(Rectangle.STYLE)
-    
     self.height = height
     self.width = width
+    self.color = None
   
   def setColor(self,color):
     """Let us change the color of the background of the rectangle. 
@@ -248,25 +587,17 @@ class Rectangle(SVGobject):
     color : a string of 6 numbers in hexadecimal, for example "ff8800"
     """
     
-    self.style["fill"] = "#"+color
+    self.color = color
 
-  def getSVGcode(self):
-    """create a svg text that is thought to represent a rectangle
+  def write(self, writer):
+    """write a svg text that is thought to represent a rectangle
     """
     
-    text = '<rect\n'
-    text += '  style="'
-    
-    list = map(str.__add__, [k+":" for k in self.style.keys()], self.style.values())
-    text += ";".join(list)+'"\n'
-    
-    text += '  id="rect'+str(self.id)+'"\n'
-    text += '  width="'+str(self.width)+'"\n'
-    text += '  height="'+str(self.height)+'"\n'
-    text += '  x="'+str(self.x)+'"\n'
-    text += '  y="'+str(self.y)+'" />\n'
+    if not(self.color in Rectangle.styles):
+      Rectangle.styles[self.color] = _getStyle(Rectangle.STYLE, self.color)
     
-    return text
+    writer.write('<rect\n  style="%s"\n  id="%s"\n  width="%s"\n  height="%s"\n  x="%s"\n  y="%s" />\n' 
+                 % (Rectangle.styles[self.color], writer.newId("rect"), self.width, self.height, self.x, self.y))
 
 class Path(SVGobject):
   """
@@ -274,9 +605,9 @@ class Path(SVGobject):
   (x1, y1), (x2, y2), (x3, y3)
   """
   
-  PATH_STYLE = '     style="fill:#ffffff;fill-opacity:1;fill-rule:evenodd;stroke:#000000;stroke-width:1;stroke-miterlimit:4;stroke-opacity:1;stroke-dasharray:none;stroke-dashoffset:0"'
+  __slots__ = ("coords",)
   
-  id = 0
+  PATH_STYLE = '     style="fill:#ffffff;fill-opacity:1;fill-rule:evenodd;stroke:#000000;stroke-width:1;stroke-miterlimit:4;stroke-opacity:1;stroke-dasharray:none;stroke-dashoffset:0"'
   
   def __init__(self,*coords):
     """We define the text and the position of the box
@@ -284,33 +615,59 @@ class Path(SVGobject):
     
     SVGobject.__init__(self)
     
-    Path.id += 1
-    
     for coord in coords:
       if ((type(coord) != tuple) or (len(coord) != 2)):
         raise TypeError("Each element must be a tuple of 2 values that represents the coordinates")
     self.coords = coords
     
-    self.id = Path.id
+  def write(self, writer):
+    """write a svg text that is thought to represent a path
+    """
     
-    self.height = 30
-    self.width = 150
+    coords = "".join([" %s,%s" % (x, y) for (x, y) in self.coords])
+    
+    writer.write('  <path\n%s\n     d="M%s"\n     id="%s"\n     inkscape:connector-curvature="0" />\n' 
+                 % (Path.PATH_STYLE, coords, writer.newId("path")))
+
+class MultiPath(SVGobject):
+  """
+  object that define several lines in one path, each line being a list of coords of the form : 
+  [(x1, y1), (x2, y2), (x3, y3)]
+  """
+  
+  __slots__ = ("lines",)
+  
+  STYLE = Path.PATH_STYLE.replace("fill:#ffffff", "fill:none")
+  
+  def __init__(self,*lines):
+    """We define the lines of the path
+    """
     
+    SVGobject.__init__(self)
     
-  def getSVGcode(self):
-    """create a svg text that is thought to represent a text in a box
+    for line in lines:
+      for coord in line:
+        if ((type(coord) != tuple) or (len(coord) != 2)):
+          raise TypeError("Each element must be a tuple of 2 values that represents the coordinates")
+    self.lines = lines
+    
+  def write(self, writer):
+    """write a svg text that is thought to represent several lines in one path
     """
     
-    text = "  <path\n"
-    text += Path.PATH_STYLE+"\n"
-    text += '     d="M'
-    for (x,y) in self.coords:
-      text += " "+str(x)+","+str(y)
-    text += '"\n'
-    text += '     id="path'+str(self.id)+'"\n'
-    text += '     inkscape:connector-curvature="0" />\n'
+    coords = " ".join(["M"+" ".join(["%s,%s" % (x, y) for (x, y) in line]) for line in self.lines])
     
-    return text
+    writer.write('  <path\n%s\n     d="%s"\n     id="%s"\n     inkscape:connector-curvature="0" />\n' 
+                 % (self.STYLE, coords, writer.newId("path")))
+
+class DashedMultiPath(MultiPath):
+  """
+  object that define several dashed lines in one path (see MultiPath)
+  """
+  
+  __slots__ = ()
+  
+  STYLE = MultiPath.STYLE.replace("stroke-dasharray:none", "stroke-dasharray:6,3")
 
 #~ def colorList(nb_colors):
   #~ """Function that return a list of colors given the number of different colors we want. 
@@ -413,12 +770,9 @@ if __name__ == '__main__':
   createSVG("test.svg",testbox, testbox2, testpath, testgroup, testbox3)
   
 
-# RMQ : If you use objects in other objects, then there is a chance 
-# you have different objects with the same ID. For exemple, if you 
-# define a path that you print, and use this path in a group that you 
-# print also, then you will have two objects Path with the same Path.id. 
-# But I think the normal behaviour is to define an object an use 
-# it only once, so I don't think it's a bug. 
+# RMQ : The ids are given by the SVGWriter when the objects are written, 
+# so they are unique in a document, even if an object is written several 
+# times. But two calls of getSVGcode() give the same ids. 
 
 # Version 1.1 : contrastColor has been added. Now the color of the text in TextBox change if the background color of the rectangle is too dark, regarding a 'tolerance' parameter than can be changed later easily
 # Version 1.2 : contrastColor (need sqrt now) now use brightness of the color to check which color he must return.